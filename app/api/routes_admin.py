@@ -0,0 +1,74 @@
+"""Maintenance endpoints."""
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import get_async_db
+from app.services.embeddings import EmbeddingProvider
+from app.services.ingestion import IngestionInProgressError
+from app.services.maintenance import collect_garbage
+from app.services.query_cache import QueryCache, index_version
+from app.services.registry import get_registry, provide_embedding_provider, provide_query_cache, provide_vector_store
+from app.services.sharded_vector_store import ShardedVectorStore
+from app.services.vector_store import VectorStore
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.post("/gc")
+async def garbage_collect(
+    reindex_missing: bool = True,
+    compact: bool = True,
+    session: AsyncSession = Depends(get_async_db),
+    embedding_provider: EmbeddingProvider = Depends(provide_embedding_provider),
+    vector_store: VectorStore = Depends(provide_vector_store),
+):
+    """Delete orphaned vectors, re-embed chunks missing from the index and compact it."""
+
+    try:
+        return await collect_garbage(
+            session, vector_store, embedding_provider, reindex_missing=reindex_missing, compact=compact
+        )
+    except IngestionInProgressError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+
+
+@router.post("/rebalance")
+async def rebalance_shards(vector_store: VectorStore = Depends(provide_vector_store)):
+    """Move vectors to the shard their key hashes to under the configured shard count; drop retired shards."""
+
+    # Unwrap the lexical index mirror, if any.
+    sharded = getattr(vector_store, "store", vector_store)
+    if not isinstance(sharded, ShardedVectorStore):
+        raise HTTPException(status_code=400, detail="The vector store is not sharded (RAG_VECTOR_SHARDS=1)")
+    return await sharded.rebalance()
+
+
+@router.get("/cache")
+async def cache_stats(
+    embedding_provider: EmbeddingProvider = Depends(provide_embedding_provider),
+    query_cache: Optional[QueryCache] = Depends(provide_query_cache),
+):
+    """Hit ratios and sizes of the query and embedding caches."""
+
+    stats = getattr(embedding_provider, "stats", None)
+    return {
+        "index_version": index_version(),
+        "query": query_cache.stats() if query_cache is not None else None,
+        "embeddings": stats() if stats is not None else None,
+    }
+
+
+@router.get("/executors")
+async def executor_stats():
+    """Queue depth, rejections, timeouts and wait/run times of the compute executors, plus event-loop lag."""
+
+    registry = get_registry()
+    return {
+        "extraction": registry.extraction_executor.stats() if registry.extraction_executor else None,
+        "inference": registry.inference_executor.stats() if registry.inference_executor else None,
+        "event_loop_lag": registry.loop_lag.stats() if registry.loop_lag else None,
+    }
@@ -1,81 +1,180 @@
 """Document endpoints."""
 from __future__ import annotations
 
-import io
-from typing import List
+import codecs
+import os
+import tempfile
+from typing import AsyncIterator, List, Optional
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
 from fastapi import status
-from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from app.core.db import get_db
+from app.config import get_settings
+from app.core.db import get_async_db
 from app.core.models import DocumentCreate, DocumentDetail, DocumentSummary
-from app.persistence import models, repositories
-from app.services.embeddings import get_embedding_provider
-from app.services.ingestion import chunks_for_document, ingest_text
-from app.services.vector_store import get_vector_store
-
-try:
-    from pypdf import PdfReader
-except Exception:  # pragma: no cover
-    PdfReader = None
+from app.persistence import async_repositories, models
+from app.services import pdf
+from app.services.embeddings import EmbeddingProvider
+from app.services.executors import ComputeExecutor
+from app.services.ingestion import chunker_for, chunks_for_document, ingest_stream
+from app.services.maintenance import delete_documents
+from app.services.registry import provide_embedding_provider, provide_extraction_executor, provide_vector_store
+from app.services.vector_store import VectorStore
 
 router = APIRouter(prefix="/documents", tags=["documents"])
+settings = get_settings()
+
+
+class DeleteResponse(BaseModel):
+    documents: int
+    chunks: int
+    vectors: int
 
 
 class DocumentCreateResponse(BaseModel):
     document_id: int
     chunks: int
+    added: Optional[int] = None
+    unchanged: Optional[int] = None
+    removed: Optional[int] = None
+
+
+def document_form(
+    title: str = Form(...),
+    source: Optional[str] = Form(default=None),
+    tags: Optional[List[str]] = Form(default=None),
+    text: Optional[str] = Form(default=None),
+    chunk_strategy: Optional[str] = Form(default=None),
+    chunk_size: Optional[int] = Form(default=None),
+    chunk_overlap: Optional[int] = Form(default=None),
+    upsert: bool = Form(default=False),
+) -> DocumentCreate:
+    """Read ``DocumentCreate`` from multipart/urlencoded form fields."""
+
+    try:
+        payload = DocumentCreate(
+            title=title,
+            source=source,
+            tags=tags,
+            text=text,
+            chunk_strategy=chunk_strategy,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            upsert=upsert,
+        )
+        # Also rejects an overlap that does not fit the strategy's default size.
+        chunker_for(strategy=chunk_strategy, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors())
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return payload
+
+
+async def _upload_pieces(file: UploadFile) -> AsyncIterator[str]:
+    """Decode a plaintext upload incrementally without holding it all in memory."""
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        data = await file.read(settings.upload_read_size)
+        if not data:
+            break
+        yield decoder.decode(data)
+    yield decoder.decode(b"", final=True)
+
+
+async def spool_upload(file: UploadFile, path: str) -> None:
+    """Copy an upload to ``path`` one read-size block at a time; opening and writing run off the event loop."""
+
+    spool = await run_in_threadpool(open, path, "wb")
+    try:
+        while data := await file.read(settings.upload_read_size):
+            await run_in_threadpool(spool.write, data)
+    finally:
+        await run_in_threadpool(spool.close)
+
+
+async def _pdf_pieces(file: UploadFile, executor: ComputeExecutor) -> AsyncIterator[str]:
+    """Yield PDF text one page at a time, parsed in page ranges on the extraction executor.
+
+    The upload is spooled to a temporary file whose path is sent to the
+    workers, so neither the server nor each task holds the whole PDF.
+    """
+
+    handle, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(handle)
+    try:
+        await spool_upload(file, path)
+        async for piece in pdf.pdf_pieces(path, executor, settings.pdf_pages_per_task):
+            yield piece
+    finally:
+        os.remove(path)
+
+
+async def _text_pieces(text: str) -> AsyncIterator[str]:
+    yield text
 
 
 @router.post("", response_model=DocumentCreateResponse, status_code=status.HTTP_201_CREATED)
 async def create_document(
-    payload: DocumentCreate = Depends(),
+    payload: DocumentCreate = Depends(document_form),
     file: UploadFile | None = File(default=None),
-    session: Session = Depends(get_db),
+    session: AsyncSession = Depends(get_async_db),
+    embedding_provider: EmbeddingProvider = Depends(provide_embedding_provider),
+    vector_store: VectorStore = Depends(provide_vector_store),
+    extraction_executor: ComputeExecutor = Depends(provide_extraction_executor),
 ):
-    embedding_provider = get_embedding_provider()
-    vector_store = get_vector_store()
-    text_content = payload.text
-
     if file:
         if file.content_type not in {"application/pdf", "text/plain"}:
             raise HTTPException(status_code=400, detail="Unsupported file type")
-        content = await file.read()
         if file.content_type == "application/pdf":
-            if not PdfReader:
+            if not pdf.PdfReader:
                 raise HTTPException(status_code=500, detail="PDF support not available")
-            reader = PdfReader(io.BytesIO(content))
-            text_content = "\n".join(page.extract_text() or "" for page in reader.pages)
+            pieces = _pdf_pieces(file, extraction_executor)
         else:
-            text_content = content.decode("utf-8")
-
-    if not text_content:
+            pieces = _upload_pieces(file)
+    elif payload.text:
+        pieces = _text_pieces(payload.text)
+    else:
         raise HTTPException(status_code=400, detail="No text provided")
 
-    result = await ingest_text(
+    result = await ingest_stream(
         title=payload.title,
         source=payload.source,
         tags=payload.tags,
-        text=text_content,
+        pieces=pieces,
         embedding_provider=embedding_provider,
         vector_store=vector_store,
         session=session,
+        chunk_strategy=payload.chunk_strategy,
+        chunk_size=payload.chunk_size,
+        chunk_overlap=payload.chunk_overlap,
+        upsert=payload.upsert,
     )
+    if not result["chunks"]:
+        # Raising rolls back the session, discarding the empty document row.
+        raise HTTPException(status_code=400, detail="No text provided")
     return DocumentCreateResponse(**result)
 
 
 @router.get("", response_model=List[DocumentSummary])
-async def list_documents(session: Session = Depends(get_db)):
-    docs = repositories.list_documents(session)
+async def list_documents(
+    limit: int = Query(default=100, ge=1, le=1000),
+    after_id: Optional[int] = Query(default=None, description="Return documents with a larger id (cursor)"),
+    session: AsyncSession = Depends(get_async_db),
+):
+    docs = await async_repositories.list_documents(session, limit=limit, after_id=after_id)
+    counts = await async_repositories.chunk_counts(session, [doc.id for doc in docs])
     summaries = [
         DocumentSummary(
             id=doc.id,
             title=doc.title,
             source=doc.source,
-            tags=doc.tags.split(",") if doc.tags else [],
-            chunk_count=repositories.chunk_count(session, doc.id),
+            tags=doc.tags,
+            chunk_count=counts.get(doc.id, 0),
         )
         for doc in docs
     ]
@@ -83,8 +182,8 @@ async def list_documents(session: Session = Depends(get_db)):
 
 
 @router.get("/{document_id}", response_model=DocumentDetail)
-async def get_document(document_id: int, session: Session = Depends(get_db)):
-    document: models.Document | None = repositories.get_document(session, document_id)
+async def get_document(document_id: int, session: AsyncSession = Depends(get_async_db)):
+    document: models.Document | None = await async_repositories.get_document(session, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     chunk_summaries = chunks_for_document(document.chunks)
@@ -92,6 +191,33 @@ async def get_document(document_id: int, session: Session = Depends(get_db)):
         id=document.id,
         title=document.title,
         source=document.source,
-        tags=document.tags.split(",") if document.tags else [],
+        tags=document.tags,
         chunks=chunk_summaries,
     )
+
+
+@router.delete("", response_model=DeleteResponse)
+async def delete_matching_documents(
+    source: Optional[str] = Query(default=None),
+    tag: Optional[str] = Query(default=None),
+    session: AsyncSession = Depends(get_async_db),
+    vector_store: VectorStore = Depends(provide_vector_store),
+):
+    """Delete every document with the given ``source`` and/or ``tag``."""
+
+    if source is None and tag is None:
+        raise HTTPException(status_code=400, detail="Pass source and/or tag to select documents")
+    document_ids = await async_repositories.find_document_ids(session, source=source, tag=tag)
+    return await delete_documents(session, vector_store, document_ids)
+
+
+@router.delete("/{document_id}", response_model=DeleteResponse)
+async def delete_document(
+    document_id: int,
+    session: AsyncSession = Depends(get_async_db),
+    vector_store: VectorStore = Depends(provide_vector_store),
+):
+    result = await delete_documents(session, vector_store, [document_id])
+    if not result["documents"]:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return result
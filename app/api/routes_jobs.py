@@ -0,0 +1,73 @@
+"""Background ingestion job endpoints."""
+from __future__ import annotations
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.api.routes_documents import document_form, spool_upload
+from app.core.db import get_async_db
+from app.core.models import DocumentCreate, JobStatus
+from app.persistence import async_repositories
+from app.services.jobs import get_job_queue, job_summary
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def _spool_text(path: str, text: str) -> None:
+    with open(path, "w", encoding="utf-8") as spool:
+        spool.write(text)
+
+
+@router.post("", response_model=JobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(
+    payload: DocumentCreate = Depends(document_form),
+    file: UploadFile | None = File(default=None),
+):
+    """Spool the upload to disk and enqueue it for ingestion, returning immediately."""
+
+    queue = get_job_queue()
+    job_id = queue.new_job_id()
+    path = queue.spool_path(job_id)
+    if file:
+        if file.content_type not in {"application/pdf", "text/plain"}:
+            raise HTTPException(status_code=400, detail="Unsupported file type")
+        content_type = file.content_type
+        await spool_upload(file, path)
+    elif payload.text:
+        content_type = "text/plain"
+        await run_in_threadpool(_spool_text, path, payload.text)
+    else:
+        raise HTTPException(status_code=400, detail="No text provided")
+
+    return await queue.submit(
+        job_id=job_id,
+        title=payload.title,
+        source=payload.source,
+        tags=payload.tags,
+        content_type=content_type,
+        chunk_strategy=payload.chunk_strategy,
+        chunk_size=payload.chunk_size,
+        chunk_overlap=payload.chunk_overlap,
+        upsert=payload.upsert,
+    )
+
+
+@router.get("", response_model=List[JobStatus])
+async def list_jobs(
+    status: Optional[str] = None, limit: int = 100, session: AsyncSession = Depends(get_async_db)
+):
+    progress = get_job_queue().progress
+    jobs = await async_repositories.list_jobs(session, status=status, limit=limit)
+    return [job_summary(job, progress.get(job.id)) for job in jobs]
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str, session: AsyncSession = Depends(get_async_db)):
+    job = await async_repositories.get_job(session, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_summary(job, get_job_queue().progress.get(job.id))
@@ -0,0 +1,16 @@
+"""Metrics endpoint."""
+from __future__ import annotations
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage and request latency summaries and counters in the Prometheus text format."""
+
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
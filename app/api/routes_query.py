@@ -1,25 +1,53 @@
-"""Query endpoint."""
+"""Query endpoints."""
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+import json
+from typing import AsyncIterator, Iterable, Optional
 
-from app.core.db import get_db
-from app.core.models import QueryRequest, QueryResponse
-from app.services.embeddings import get_embedding_provider
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import get_async_db
+from app.core.models import BatchQueryRequest, BatchQueryResponse, QueryRequest, QueryResponse
+from app.services.embeddings import EmbeddingProvider
+from app.services.lexical_index import LexicalIndex
+from app.services import retrieval
 from app.services.llm import get_llm_client
-from app.services.rag import answer_query
-from app.services.vector_store import get_vector_store
+from app.services.rag import answer_query, stream_answer
+from app.services.query_cache import QueryCache
+from app.services.reranking import Reranker
+from app.services.registry import (
+    provide_embedding_provider,
+    provide_lexical_index,
+    provide_query_cache,
+    provide_reranker,
+    provide_vector_store,
+)
+from app.services.vector_store import VectorStore
 from app.config import get_settings
 
 router = APIRouter(prefix="/query", tags=["query"])
 
 
+def _check_modes(modes: Iterable[str], lexical_index: Optional[LexicalIndex]) -> None:
+    if lexical_index is None and any(mode != "dense" for mode in modes):
+        raise HTTPException(status_code=400, detail="Lexical and hybrid retrieval are disabled")
+
+
 @router.post("", response_model=QueryResponse)
-async def query(payload: QueryRequest, session: Session = Depends(get_db)):
+async def query(
+    payload: QueryRequest,
+    response: Response,
+    session: AsyncSession = Depends(get_async_db),
+    embedding_provider: EmbeddingProvider = Depends(provide_embedding_provider),
+    vector_store: VectorStore = Depends(provide_vector_store),
+    query_cache: Optional[QueryCache] = Depends(provide_query_cache),
+    lexical_index: Optional[LexicalIndex] = Depends(provide_lexical_index),
+    reranker: Optional[Reranker] = Depends(provide_reranker),
+):
+    _check_modes([payload.mode], lexical_index)
     settings = get_settings()
-    embedding_provider = get_embedding_provider()
-    vector_store = get_vector_store()
     llm_client = get_llm_client(api_key=settings.openai_api_key, provider="dummy")
     result = await answer_query(
         query=payload.query,
@@ -28,5 +56,78 @@ async def query(payload: QueryRequest, session: Session = Depends(get_db)):
         llm_client=llm_client,
         top_k=payload.top_k,
         filters=payload.filters,
+        cache=query_cache,
+        mode=payload.mode,
+        lexical_index=lexical_index,
+        reranker=reranker,
     )
+    response.headers["X-Cache"] = result.pop("cache", "bypass").upper()
     return QueryResponse(**result)
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def query_stream(
+    payload: QueryRequest,
+    embedding_provider: EmbeddingProvider = Depends(provide_embedding_provider),
+    vector_store: VectorStore = Depends(provide_vector_store),
+    query_cache: Optional[QueryCache] = Depends(provide_query_cache),
+    lexical_index: Optional[LexicalIndex] = Depends(provide_lexical_index),
+    reranker: Optional[Reranker] = Depends(provide_reranker),
+):
+    """Server-Sent Events: a ``context`` event, one ``token`` event per answer token, then ``done``.
+
+    When the client disconnects the response task is cancelled, which closes
+    the pipeline generator and stops generation.
+    """
+
+    _check_modes([payload.mode], lexical_index)
+    settings = get_settings()
+    llm_client = get_llm_client(api_key=settings.openai_api_key, provider="dummy")
+    events = stream_answer(
+        query=payload.query,
+        embedding_provider=embedding_provider,
+        vector_store=vector_store,
+        llm_client=llm_client,
+        top_k=payload.top_k,
+        filters=payload.filters,
+        cache=query_cache,
+        mode=payload.mode,
+        lexical_index=lexical_index,
+        reranker=reranker,
+    )
+
+    async def body() -> AsyncIterator[str]:
+        try:
+            async for event, data in events:
+                yield _sse(event, data)
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.post("/batch", response_model=BatchQueryResponse)
+async def query_batch(
+    payload: BatchQueryRequest,
+    embedding_provider: EmbeddingProvider = Depends(provide_embedding_provider),
+    vector_store: VectorStore = Depends(provide_vector_store),
+    lexical_index: Optional[LexicalIndex] = Depends(provide_lexical_index),
+    reranker: Optional[Reranker] = Depends(provide_reranker),
+):
+    modes = [item.mode for item in payload.queries]
+    _check_modes(modes, lexical_index)
+    results = await retrieval.retrieve_many(
+        queries=[item.query for item in payload.queries],
+        embedding_provider=embedding_provider,
+        vector_store=vector_store,
+        top_ks=[item.top_k for item in payload.queries],
+        filters=[item.filters for item in payload.queries],
+        modes=modes,
+        lexical_index=lexical_index,
+        reranker=reranker,
+    )
+    return BatchQueryResponse(results=results)
@@ -11,11 +11,75 @@ class Settings(BaseSettings):
     app_name: str = Field(default="RAG Pipeline API")
     debug: bool = Field(default=True)
     database_url: str = Field(default="sqlite:///./rag.db")
+    db_pool_size: int = Field(default=10)
+    db_max_overflow: int = Field(default=20)
+    db_pool_timeout: float = Field(default=30.0)
+    sqlite_busy_timeout_ms: int = Field(default=5000)
     embedding_provider: Literal["local", "openai"] = Field(default="local")
-    vector_store: Literal["chroma"] = Field(default="chroma")
+    vector_store: Literal["chroma", "numpy", "ivf"] = Field(default="chroma")
+    vector_metric: Literal["cosine", "l2"] = Field(default="cosine")
 
     openai_api_key: Optional[str] = Field(default=None)
     chroma_persist_directory: Optional[str] = Field(default=None)
+    numpy_store_path: Optional[str] = Field(default=None)
+    vector_shards: int = Field(default=1)
+    vector_shard_key: str = Field(default="document_id")
+    ivf_nlist: int = Field(default=256)
+    ivf_nprobe: int = Field(default=8)
+    ivf_train_size: Optional[int] = Field(default=None)
+    vector_quantization: Literal["none", "float16", "int8", "pq"] = Field(default="none")
+    quantization_rerank: int = Field(default=4)
+    quantization_train_size: int = Field(default=10_000)
+    pq_subvector_dim: int = Field(default=8)
+    warmup_on_startup: bool = Field(default=True)
+    ingest_batch_size: int = Field(default=64)
+    chunk_strategy: Literal["fixed", "sentence", "token"] = Field(default="fixed")
+    chunk_size: Optional[int] = Field(default=None)
+    chunk_overlap: Optional[int] = Field(default=None)
+    upload_read_size: int = Field(default=1024 * 1024)
+    ingest_job_concurrency: int = Field(default=2)
+    job_spool_directory: str = Field(default="./jobs")
+
+    embedding_batch_enabled: bool = Field(default=False)
+    embedding_batch_max_size: int = Field(default=64)
+    embedding_batch_max_wait_ms: float = Field(default=5.0)
+    embedding_batch_max_queue: int = Field(default=1024)
+
+    embedding_cache_enabled: bool = Field(default=True)
+    embedding_cache_max_entries: int = Field(default=10_000)
+    embedding_cache_path: Optional[str] = Field(default=None)
+
+    lexical_index_enabled: bool = Field(default=True)
+    hybrid_candidates: int = Field(default=50)
+    rrf_k: int = Field(default=60)
+
+    # Two-stage retrieval: fetch top_k * rerank_overfetch candidates, re-score them and keep top_k by MMR.
+    # Off by default: it changes which chunks come back and adds latency to every query.
+    rerank_enabled: bool = Field(default=False)
+    rerank_overfetch: int = Field(default=4)
+    rerank_batch_size: int = Field(default=32)
+    rerank_cross_encoder: Optional[str] = Field(default=None)
+    mmr_diversity: float = Field(default=0.3)
+    mmr_duplicate_threshold: float = Field(default=0.95)
+
+    extraction_executor: Literal["process", "thread", "inline"] = Field(default="process")
+    extraction_workers: int = Field(default=2)
+    extraction_max_queue: int = Field(default=32)
+    extraction_timeout_seconds: float = Field(default=120.0)
+    pdf_pages_per_task: int = Field(default=16)
+    inference_executor: Literal["thread", "inline"] = Field(default="thread")
+    inference_workers: int = Field(default=2)
+    inference_max_queue: int = Field(default=256)
+    inference_timeout_seconds: float = Field(default=60.0)
+    loop_lag_interval_ms: float = Field(default=100.0)
+
+    query_cache_enabled: bool = Field(default=True)
+    query_cache_max_entries: int = Field(default=1024)
+    query_cache_ttl_seconds: float = Field(default=300.0)
+
+    # Requests slower than this are profiled and logged; unset disables the profiler.
+    slow_request_profile_ms: Optional[float] = Field(default=None)
+    profile_sample_interval_ms: float = Field(default=5.0)
 
     class Config:
         env_prefix = "RAG_"
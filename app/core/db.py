@@ -1,18 +1,68 @@
 """Database session management."""
-from contextlib import contextmanager
-from typing import Generator
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncGenerator, Generator
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 from app.config import get_settings
+from app.core.metrics import span
 
 settings = get_settings()
 
-engine = create_engine(settings.database_url, connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {})
+_is_sqlite = settings.database_url.startswith("sqlite")
+
+
+def _async_url(url: str) -> str:
+    """Map a synchronous database URL onto its asyncio driver."""
+
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:") :]
+    if url.startswith(("postgresql:", "postgres:")):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url
+
+
+def _pool_options() -> dict:
+    if _is_sqlite:
+        return {}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_pre_ping": True,
+    }
+
+
+def _configure_sqlite(dbapi_connection, _) -> None:
+    """WAL lets readers proceed while a writer is active; the other pragmas trade durability on power loss for speed."""
+
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
+
+engine = create_engine(
+    settings.database_url,
+    connect_args={"check_same_thread": False} if _is_sqlite else {},
+    **_pool_options(),
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+async_engine = create_async_engine(_async_url(settings.database_url), **_pool_options())
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+if _is_sqlite:
+    event.listen(engine, "connect", _configure_sqlite)
+    event.listen(async_engine.sync_engine, "connect", _configure_sqlite)
+
 
 @contextmanager
 def session_scope() -> Generator[Session, None, None]:
@@ -21,7 +71,8 @@ def session_scope() -> Generator[Session, None, None]:
     session: Session = SessionLocal()
     try:
         yield session
-        session.commit()
+        with span("db_commit"):
+            session.commit()
     except Exception:
         session.rollback()
         raise
@@ -34,3 +85,26 @@ def get_db() -> Generator[Session, None, None]:
 
     with session_scope() as session:
         yield session
+
+
+@asynccontextmanager
+async def async_session_scope() -> AsyncGenerator[AsyncSession, None]:
+    """Transactional scope for an :class:`AsyncSession` that never blocks the event loop."""
+
+    session = AsyncSessionLocal()
+    try:
+        yield session
+        with span("db_commit"):
+            await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """FastAPI dependency for an async database session."""
+
+    async with async_session_scope() as session:
+        yield session
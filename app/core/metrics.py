@@ -0,0 +1,290 @@
+"""In-process metrics: latency histograms, counters, timing spans and a slow-request profiler.
+
+Spans time a pipeline stage (chunking, embedding, search, ...). Each one is
+recorded in the ``rag_stage_seconds`` histogram and, during an HTTP request,
+added to that request's ``Server-Timing`` header. ``GET /metrics`` renders
+everything in the Prometheus text format. Histograms are summaries with
+p50/p95/p99, computed from log-spaced buckets: recording is a ``log`` and a
+list increment, with no locks or sample buffers.
+"""
+from __future__ import annotations
+
+import math
+import sys
+import threading
+import time
+from collections import Counter as Tally, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+
+from app.core.logging import logger
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Timings of the current request's spans by stage, or None outside a request.
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """Log-spaced buckets from 1µs growing by 5%, so percentiles are within 5% of the true value."""
+
+    _MIN = 1e-6
+    _LOG_GROWTH = math.log(1.05)
+    _BUCKETS = 400  # up to ~3e2 seconds; anything slower lands in the last bucket
+
+    def __init__(self) -> None:
+        self.counts: List[int] = [0] * self._BUCKETS
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        index = 0 if seconds <= self._MIN else int(math.log(seconds / self._MIN) / self._LOG_GROWTH) + 1
+        self.counts[min(index, self._BUCKETS - 1)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile (0 < q <= 1), capped at the maximum seen."""
+
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._MIN * math.exp(index * self._LOG_GROWTH), self.max)
+        return self.max
+
+
+class Counter:
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+def _labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+class Metrics:
+    """Named histograms and counters, one per distinct label set."""
+
+    def __init__(self) -> None:
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, Counter]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help: str) -> None:
+        self._help[name] = help
+
+    def histogram(self, name: str, **labels: str) -> Histogram:
+        series = self._histograms.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        return histogram
+
+    def counter(self, name: str, **labels: str) -> Counter:
+        series = self._counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        counter = series.get(key)
+        if counter is None:
+            counter = series[key] = Counter()
+        return counter
+
+    def render(self) -> str:
+        """The Prometheus text exposition format; histograms are rendered as summaries."""
+
+        lines = []
+        for name, series in sorted(self._histograms.items()):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} summary")
+            for key, histogram in sorted(series.items()):
+                for q in QUANTILES:
+                    lines.append(f"{name}{_labels(key + (('quantile', str(q)),))} {histogram.percentile(q):.6g}")
+                lines.append(f"{name}_sum{_labels(key)} {histogram.sum:.6g}")
+                lines.append(f"{name}_count{_labels(key)} {histogram.count}")
+        for name, counters in sorted(self._counters.items()):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for key, counter in sorted(counters.items()):
+                lines.append(f"{name}{_labels(key)} {counter.value:.6g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("rag_stage_seconds", "Time spent in each pipeline stage.")
+metrics.describe("rag_http_request_seconds", "HTTP request latency by handler, up to the end of the response.")
+metrics.describe("rag_http_requests_total", "HTTP requests by handler and status code.")
+metrics.describe("rag_ingested_chunks_total", "Chunks embedded and indexed.")
+metrics.describe("rag_queries_total", "Retrievals by mode.")
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the enclosed block as ``stage``; time spent suspended in ``await`` counts too."""
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.histogram("rag_stage_seconds", stage=stage).observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def server_timing(timings: Dict[str, float], total: float) -> str:
+    entries = [f"{stage};dur={1000 * seconds:.3f}" for stage, seconds in timings.items()]
+    return ", ".join(entries + [f"total;dur={1000 * total:.3f}"])
+
+
+class SlowRequestProfiler:
+    """Sample the event-loop thread's stack while requests run and report the hottest stacks of slow ones.
+
+    A daemon thread samples every ``interval`` seconds while at least one
+    request is in flight, so idle servers pay nothing. The event loop
+    interleaves requests, so a slow request's report shows everything the loop
+    ran meanwhile. That is usually what made it slow: blocking code in a
+    handler stalls every request. Reports go to ``hook`` (by default a
+    warning log line) and the most recent ones are kept in ``reports``.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        interval: float = 0.005,
+        *,
+        depth: int = 8,
+        top: int = 5,
+        hook: Optional[Callable[[dict], None]] = None,
+    ) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        self.depth = depth
+        self.top = top
+        self.hook = hook or self._log
+        self.reports: Deque[dict] = deque(maxlen=20)
+        self._samples: Deque[Tuple[float, Tuple[str, ...]]] = deque(maxlen=max(int(600 / interval), 1))
+        self._active = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._target: Optional[int] = None
+
+    def begin(self) -> float:
+        with self._lock:
+            self._active += 1
+            if self._thread is None:
+                self._target = threading.get_ident()
+                self._thread = threading.Thread(target=self._sample, name="slow-request-profiler", daemon=True)
+                self._thread.start()
+            self._wake.set()
+        return time.perf_counter()
+
+    def end(self, started: float, label: str) -> Optional[dict]:
+        ended = time.perf_counter()
+        with self._lock:
+            self._active -= 1
+            if not self._active:
+                self._wake.clear()
+        if ended - started < self.threshold:
+            return None
+        stacks = Tally(stack for at, stack in list(self._samples) if started <= at <= ended)
+        samples = sum(stacks.values())
+        report = {
+            "request": label,
+            "duration_ms": round(1000 * (ended - started), 1),
+            "samples": samples,
+            "stacks": [
+                {"share": round(count / samples, 3), "stack": list(stack)}
+                for stack, count in stacks.most_common(self.top)
+            ],
+        }
+        self.reports.append(report)
+        self.hook(report)
+        return report
+
+    def _sample(self) -> None:
+        while True:
+            self._wake.wait()
+            frame = sys._current_frames().get(self._target)
+            if frame is not None:
+                stack = []
+                while frame is not None and len(stack) < self.depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename}:{frame.f_lineno} {code.co_name}")
+                    frame = frame.f_back
+                self._samples.append((time.perf_counter(), tuple(stack)))
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _log(report: dict) -> None:
+        hottest = "; ".join(f"{entry['share']:.0%} at {entry['stack'][0]}" for entry in report["stacks"])
+        logger.warning(
+            "Slow request %s took %sms: %s", report["request"], report["duration_ms"], hottest or "no samples"
+        )
+
+
+class MetricsMiddleware:
+    """Time every HTTP request, count it by handler and status, and send its spans as ``Server-Timing``.
+
+    Plain ASGI rather than ``BaseHTTPMiddleware``, so streamed responses and
+    client disconnects pass through untouched. The header is written when the
+    response starts, so a streamed response reports the stages before its
+    first byte.
+    """
+
+    def __init__(self, app, profiler: Optional[SlowRequestProfiler] = None) -> None:
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        profiled = self.profiler.begin() if self.profiler is not None else None
+        status = 500
+
+        async def send_with_timing(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(timings, time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            elapsed = time.perf_counter() - start
+            endpoint = scope.get("endpoint")
+            handler = getattr(endpoint, "__name__", "unmatched")
+            metrics.histogram("rag_http_request_seconds", method=scope["method"], handler=handler).observe(elapsed)
+            metrics.counter(
+                "rag_http_requests_total", method=scope["method"], handler=handler, status=str(status)
+            ).inc()
+            if profiled is not None:
+                self.profiler.end(profiled, f"{scope['method']} {scope['path']}")
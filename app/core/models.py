@@ -1,7 +1,8 @@
 """Pydantic schemas for API requests and responses."""
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, root_validator
 
 
 class DocumentCreate(BaseModel):
@@ -9,6 +10,19 @@ class DocumentCreate(BaseModel):
     source: Optional[str] = None
     tags: Optional[List[str]] = None
     text: Optional[str] = None
+    chunk_strategy: Optional[Literal["fixed", "sentence", "token"]] = None
+    chunk_size: Optional[int] = Field(default=None, gt=0)
+    chunk_overlap: Optional[int] = Field(default=None, ge=0)
+    upsert: bool = False
+
+    @root_validator(skip_on_failure=True)
+    def _check_options(cls, values):
+        size, overlap = values.get("chunk_size"), values.get("chunk_overlap")
+        if size is not None and overlap is not None and overlap >= size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        if values.get("upsert") and not values.get("source"):
+            raise ValueError("upsert requires a source")
+        return values
 
 
 class DocumentSummary(BaseModel):
@@ -39,14 +53,37 @@ class QueryRequest(BaseModel):
     query: str
     top_k: int = 5
     filters: Optional[dict] = None
+    mode: Literal["dense", "lexical", "hybrid"] = "dense"
 
 
 class RetrievedChunk(BaseModel):
     text: str
     score: float
     metadata: dict
+    id: Optional[str] = None
 
 
 class QueryResponse(BaseModel):
     answer: str
     context: List[RetrievedChunk]
+
+
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest]
+
+
+class BatchQueryResponse(BaseModel):
+    results: List[List[RetrievedChunk]]
+
+
+class JobStatus(BaseModel):
+    id: str
+    status: str
+    title: str
+    document_id: Optional[int] = None
+    chunks_processed: int = 0
+    chunks_per_second: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
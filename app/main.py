@@ -1,20 +1,36 @@
 """FastAPI application entrypoint."""
 from __future__ import annotations
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from app.core.db import Base, engine
-from app.api import routes_documents, routes_query
+from app.core.db import engine
+from app.api import routes_admin, routes_documents, routes_jobs, routes_metrics, routes_query
 from app.config import get_settings
 from app.core.logging import logger
+from app.core.metrics import MetricsMiddleware, SlowRequestProfiler
+from app.persistence import migrations
+from app.services import jobs, registry
+from app.services.executors import ExecutorSaturatedError, ExecutorTimeoutError
 
 settings = get_settings()
 
-# Ensure tables exist
-Base.metadata.create_all(bind=engine)
+migrations.upgrade(engine)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    services = await registry.startup()
+    await jobs.start_job_queue(services.embedding_provider, services.vector_store, services.extraction_executor)
+    yield
+    await jobs.stop_job_queue()
+    await registry.shutdown()
 
-app = FastAPI(title=settings.app_name, debug=settings.debug)
+
+app = FastAPI(title=settings.app_name, debug=settings.debug, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,9 +39,29 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+profiler = None
+if settings.slow_request_profile_ms is not None:
+    profiler = SlowRequestProfiler(
+        settings.slow_request_profile_ms / 1000, interval=settings.profile_sample_interval_ms / 1000
+    )
+app.add_middleware(MetricsMiddleware, profiler=profiler)
+
+
+@app.exception_handler(ExecutorSaturatedError)
+async def executor_saturated(_: Request, exc: ExecutorSaturatedError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(ExecutorTimeoutError)
+async def executor_timeout(_: Request, exc: ExecutorTimeoutError):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
 
 app.include_router(routes_documents.router)
 app.include_router(routes_query.router)
+app.include_router(routes_jobs.router)
+app.include_router(routes_admin.router)
+app.include_router(routes_metrics.router)
 
 
 @app.get("/")
@@ -0,0 +1,214 @@
+"""Async counterparts of :mod:`app.persistence.repositories` for use with ``AsyncSession``."""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.persistence import models
+
+
+async def _tags_by_name(session: AsyncSession, names: Sequence[str]) -> Dict[str, models.Tag]:
+    if not names:
+        return {}
+    tags = {tag.name: tag for tag in await session.scalars(select(models.Tag).where(models.Tag.name.in_(names)))}
+    missing = [name for name in names if name not in tags]
+    if missing:
+        await session.execute(models.Tag.insert_missing(session.bind.dialect.name, missing))
+        statement = select(models.Tag).where(models.Tag.name.in_(missing))
+        tags.update((tag.name, tag) for tag in await session.scalars(statement))
+    return tags
+
+
+async def set_document_tags(
+    session: AsyncSession, document: models.Document, tags: Optional[Sequence[str]]
+) -> None:
+    names = list(dict.fromkeys(tags or []))
+    document.tag_links = models.DocumentTag.relink(document.tag_links, names, await _tags_by_name(session, names))
+
+
+async def create_document(
+    session: AsyncSession, *, title: str, source: Optional[str], tags: Optional[Sequence[str]]
+) -> models.Document:
+    document = models.Document(title=title, source=source)
+    await set_document_tags(session, document, tags)
+    session.add(document)
+    await session.flush()
+    return document
+
+
+async def create_chunks(
+    session: AsyncSession, *, document: models.Document, chunks: Iterable[dict]
+) -> List[models.Chunk]:
+    rows = [
+        {
+            "document_id": document.id,
+            "index": chunk["index"],
+            "text": chunk["text"],
+            "start_offset": chunk["start_offset"],
+            "end_offset": chunk["end_offset"],
+            "content_hash": chunk.get("content_hash"),
+            "vector_id": chunk.get("vector_id"),
+        }
+        for chunk in chunks
+    ]
+    if not rows:
+        return []
+    statement = insert(models.Chunk).returning(models.Chunk, sort_by_parameter_order=True)
+    return list(await session.scalars(statement, rows))
+
+
+async def list_documents(
+    session: AsyncSession, *, limit: Optional[int] = None, after_id: Optional[int] = None
+) -> List[models.Document]:
+    statement = select(models.Document).order_by(models.Document.id)
+    if after_id is not None:
+        statement = statement.where(models.Document.id > after_id)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return list((await session.scalars(statement)).unique())
+
+
+async def get_document(session: AsyncSession, document_id: int) -> Optional[models.Document]:
+    statement = (
+        select(models.Document)
+        .options(selectinload(models.Document.chunks))
+        .where(models.Document.id == document_id)
+    )
+    return (await session.scalars(statement)).unique().first()
+
+
+async def chunk_count(session: AsyncSession, document_id: int) -> int:
+    statement = select(func.count(models.Chunk.id)).where(models.Chunk.document_id == document_id)
+    return (await session.execute(statement)).scalar_one()
+
+
+async def chunk_counts(session: AsyncSession, document_ids: Sequence[int]) -> Dict[int, int]:
+    if not document_ids:
+        return {}
+    statement = (
+        select(models.Chunk.document_id, func.count(models.Chunk.id))
+        .where(models.Chunk.document_id.in_(document_ids))
+        .group_by(models.Chunk.document_id)
+    )
+    return dict((await session.execute(statement)).all())
+
+
+async def find_document_by_source(session: AsyncSession, source: str) -> Optional[models.Document]:
+    statement = (
+        select(models.Document).where(models.Document.source == source).order_by(models.Document.id.desc()).limit(1)
+    )
+    return (await session.scalars(statement)).unique().first()
+
+
+async def document_chunks(session: AsyncSession, document_id: int) -> List[models.Chunk]:
+    statement = select(models.Chunk).where(models.Chunk.document_id == document_id).order_by(models.Chunk.index)
+    return list(await session.scalars(statement))
+
+
+async def delete_chunks(session: AsyncSession, chunk_ids: Sequence[int]) -> None:
+    if chunk_ids:
+        await session.execute(
+            delete(models.Chunk).where(models.Chunk.id.in_(chunk_ids)).execution_options(synchronize_session=False)
+        )
+
+
+async def find_document_ids(
+    session: AsyncSession, *, source: Optional[str] = None, tag: Optional[str] = None
+) -> List[int]:
+    statement = select(models.Document.id).order_by(models.Document.id)
+    if source is not None:
+        statement = statement.where(models.Document.source == source)
+    if tag is not None:
+        statement = statement.where(models.Document.has_tag(tag))
+    return list(await session.scalars(statement))
+
+
+async def chunk_vector_ids(session: AsyncSession, document_ids: Sequence[int]) -> List[str]:
+    if not document_ids:
+        return []
+    statement = select(models.Chunk.vector_id).where(
+        models.Chunk.document_id.in_(document_ids), models.Chunk.vector_id.is_not(None)
+    )
+    return list(await session.scalars(statement))
+
+
+async def delete_documents(session: AsyncSession, document_ids: Sequence[int]) -> Tuple[int, int]:
+    if not document_ids:
+        return 0, 0
+    await session.execute(
+        delete(models.DocumentTag)
+        .where(models.DocumentTag.document_id.in_(document_ids))
+        .execution_options(synchronize_session=False)
+    )
+    chunks = await session.execute(
+        delete(models.Chunk)
+        .where(models.Chunk.document_id.in_(document_ids))
+        .execution_options(synchronize_session=False)
+    )
+    documents = await session.execute(
+        delete(models.Document)
+        .where(models.Document.id.in_(document_ids))
+        .execution_options(synchronize_session=False)
+    )
+    return documents.rowcount, chunks.rowcount
+
+
+async def chunk_vector_map(session: AsyncSession) -> List[Tuple[int, int, Optional[str]]]:
+    statement = select(models.Chunk.id, models.Chunk.document_id, models.Chunk.vector_id)
+    return [tuple(row) for row in (await session.execute(statement)).all()]
+
+
+async def get_chunks(session: AsyncSession, chunk_ids: Sequence[int]) -> List[models.Chunk]:
+    if not chunk_ids:
+        return []
+    statement = (
+        select(models.Chunk)
+        .options(selectinload(models.Chunk.document))
+        .where(models.Chunk.id.in_(chunk_ids))
+        .order_by(models.Chunk.id)
+    )
+    return list(await session.scalars(statement))
+
+
+async def indexed_chunks(session: AsyncSession, *, after_id: int = 0, limit: int = 1000) -> List[models.Chunk]:
+    """A page of chunks that have a vector id, with their documents, ordered by id."""
+
+    statement = (
+        select(models.Chunk)
+        .options(selectinload(models.Chunk.document))
+        .where(models.Chunk.id > after_id, models.Chunk.vector_id.is_not(None))
+        .order_by(models.Chunk.id)
+        .limit(limit)
+    )
+    return list(await session.scalars(statement))
+
+
+async def create_job(session: AsyncSession, **fields) -> models.IngestionJob:
+    job = models.IngestionJob(**fields)
+    session.add(job)
+    await session.flush()
+    return job
+
+
+async def get_job(session: AsyncSession, job_id: str) -> Optional[models.IngestionJob]:
+    return await session.get(models.IngestionJob, job_id)
+
+
+async def list_jobs(
+    session: AsyncSession, *, status: Optional[str] = None, limit: int = 100
+) -> List[models.IngestionJob]:
+    statement = select(models.IngestionJob)
+    if status:
+        statement = statement.where(models.IngestionJob.status == status)
+    statement = statement.order_by(models.IngestionJob.created_at.desc()).limit(limit)
+    return list(await session.scalars(statement))
+
+
+async def unfinished_jobs(session: AsyncSession) -> List[models.IngestionJob]:
+    statement = (
+        select(models.IngestionJob)
+        .where(models.IngestionJob.status.in_(("queued", "running")))
+        .order_by(models.IngestionJob.created_at)
+    )
+    return list(await session.scalars(statement))
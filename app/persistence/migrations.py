@@ -0,0 +1,82 @@
+"""Schema upgrades for databases created by earlier versions.
+
+``create_all`` only adds missing tables. :func:`upgrade` also adds columns
+introduced after their table was created and moves data out of columns that
+changed shape. Every step inspects the live schema first, so
+it is safe to run on every start.
+"""
+from __future__ import annotations
+
+from sqlalchemy import inspect, insert, literal, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.db import Base
+from app.core.logging import logger
+from app.persistence import models
+
+
+def _add_missing_columns(connection: Connection) -> None:
+    """Add model columns missing from existing tables, such as ``chunks.content_hash`` and ``chunks.vector_id``.
+
+    A NOT NULL column needs a scalar default to fill the existing rows.
+    """
+
+    inspector = inspect(connection)
+    existing = set(inspector.get_table_names())
+    quote = connection.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            ddl = (
+                f"ALTER TABLE {quote.format_table(table)} "
+                f"ADD COLUMN {quote.format_column(column)} {column.type.compile(dialect=connection.dialect)}"
+            )
+            if not column.nullable:
+                if column.default is None or not column.default.is_scalar:
+                    raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{column.name} without a default")
+                value = literal(column.default.arg, column.type).compile(
+                    dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+                )
+                ddl += f" NOT NULL DEFAULT {value}"
+            connection.execute(text(ddl))
+            logger.info("Added column %s.%s", table.name, column.name)
+
+
+def _move_document_tags(connection: Connection) -> None:
+    """Copy the comma-joined ``documents.tags`` column into ``tags``/``document_tags``, then drop it."""
+
+    if "tags" not in {column["name"] for column in inspect(connection).get_columns("documents")}:
+        return
+    rows = connection.execute(text("SELECT id, tags FROM documents WHERE tags IS NOT NULL AND tags != ''")).all()
+    tagged = {document_id: list(dict.fromkeys(name for name in tags.split(",") if name)) for document_id, tags in rows}
+    names = sorted({name for document_names in tagged.values() for name in document_names})
+    if names:
+        connection.execute(models.Tag.insert_missing(connection.dialect.name, names))
+        statement = select(models.Tag.name, models.Tag.id).where(models.Tag.name.in_(names))
+        tag_ids = dict(connection.execute(statement).all())
+        connection.execute(
+            insert(models.DocumentTag),
+            [
+                {"document_id": document_id, "tag_id": tag_ids[name], "position": position}
+                for document_id, document_names in tagged.items()
+                for position, name in enumerate(document_names)
+            ],
+        )
+    connection.execute(text("ALTER TABLE documents DROP COLUMN tags"))
+    logger.info("Moved the tags of %s documents into the tags table", len(tagged))
+
+
+def upgrade(engine: Engine) -> None:
+    """Create missing tables, migrate older schemas and add indexes created after a table was."""
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        _add_missing_columns(connection)
+        _move_document_tags(connection)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
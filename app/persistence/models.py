@@ -1,7 +1,12 @@
-"""SQLAlchemy models for documents and chunks."""
+"""SQLAlchemy models for documents, tags, chunks and ingestion jobs."""
 from __future__ import annotations
 
-from sqlalchemy import Column, ForeignKey, Integer, String, Text
+from datetime import datetime
+
+from typing import List, Sequence
+
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import relationship
 
 from app.core.db import Base
@@ -12,29 +17,110 @@ class Document(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
-    source = Column(String, nullable=True)
-    tags = Column(String, nullable=True)
+    source = Column(String, nullable=True, index=True)
+
+    chunks = relationship(
+        "Chunk", back_populates="document", cascade="all, delete-orphan", order_by="Chunk.index"
+    )
+    # Joined into every document query: AsyncSession cannot lazy load, and listing stays one statement.
+    tag_links = relationship(
+        "DocumentTag", cascade="all, delete-orphan", order_by="DocumentTag.position", lazy="joined"
+    )
+
+    @property
+    def tags(self) -> List[str]:
+        return [link.tag.name for link in self.tag_links]
+
+    @staticmethod
+    def has_tag(tag: str):
+        """SQL condition: the document carries ``tag``."""
+
+        return Document.tag_links.any(DocumentTag.tag.has(Tag.name == tag))
+
+
+class Tag(Base):
+    __tablename__ = "tags"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+
+    @staticmethod
+    def insert_missing(dialect: str, names: Sequence[str]):
+        """INSERT of tags ``names`` that skips existing ones, including those a concurrent transaction added."""
+
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        return insert(Tag).values([{"name": name} for name in names]).on_conflict_do_nothing(index_elements=["name"])
 
-    chunks = relationship("Chunk", back_populates="document", cascade="all, delete-orphan")
+
+class DocumentTag(Base):
+    """Tag assignment; ``position`` keeps tags in the order they were given."""
+
+    __tablename__ = "document_tags"
+
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True, index=True)
+    position = Column(Integer, nullable=False, default=0)
+
+    tag = relationship("Tag", lazy="joined")
+
+    @staticmethod
+    def relink(links: List["DocumentTag"], names: List[str], tags: dict) -> List["DocumentTag"]:
+        """Links for ``names`` in order, reusing ``links`` that already point at one of them."""
+
+        existing = {link.tag.name: link for link in links}
+        result = []
+        for position, name in enumerate(names):
+            link = existing.get(name) or DocumentTag(tag=tags[name])
+            link.position = position
+            result.append(link)
+        return result
 
 
 class Chunk(Base):
     __tablename__ = "chunks"
 
     id = Column(Integer, primary_key=True, index=True)
-    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
     index = Column(Integer, nullable=False)
     text = Column(Text, nullable=False)
     start_offset = Column(Integer, nullable=False)
     end_offset = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=True)
+    vector_id = Column(String, nullable=True)
 
     document = relationship("Document", back_populates="chunks")
 
-    def metadata(self) -> dict:
+    def metadata(self, document: "Document | None" = None) -> dict:
+        """Vector store metadata; pass the owning ``document`` to avoid a lazy load per chunk."""
+
+        document = document or self.document
         return {
             "document_id": self.document_id,
             "chunk_id": self.id,
             "index": self.index,
-            "title": self.document.title if self.document else None,
-            "tags": self.document.tags.split(",") if self.document and self.document.tags else [],
+            "title": document.title if document else None,
+            "source": document.source if document else None,
+            "tags": document.tags if document else [],
         }
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(String, primary_key=True)
+    status = Column(String, nullable=False, default="queued", index=True)
+    title = Column(String, nullable=False)
+    source = Column(String, nullable=True)
+    tags = Column(String, nullable=True)
+    content_type = Column(String, nullable=False)
+    payload_path = Column(String, nullable=False)
+    chunk_strategy = Column(String, nullable=True)
+    chunk_size = Column(Integer, nullable=True)
+    chunk_overlap = Column(Integer, nullable=True)
+    upsert = Column(Boolean, nullable=False, default=False)
+    document_id = Column(Integer, nullable=True)
+    chunks_processed = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -1,15 +1,36 @@
 """Repositories for database operations."""
-from typing import Iterable, List, Optional, Sequence
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, insert
+from sqlalchemy.orm import Session, selectinload
 
 from app.persistence import models
 
 
+def _tags_by_name(session: Session, names: Sequence[str]) -> Dict[str, models.Tag]:
+    """Existing tags named ``names``, creating the missing ones."""
+
+    if not names:
+        return {}
+    tags = {tag.name: tag for tag in session.query(models.Tag).filter(models.Tag.name.in_(names))}
+    missing = [name for name in names if name not in tags]
+    if missing:
+        # Another transaction may create the same tags between the select and the insert.
+        session.execute(models.Tag.insert_missing(session.get_bind().dialect.name, missing))
+        tags.update((tag.name, tag) for tag in session.query(models.Tag).filter(models.Tag.name.in_(missing)))
+    return tags
+
+
+def set_document_tags(session: Session, document: models.Document, tags: Optional[Sequence[str]]) -> None:
+    names = list(dict.fromkeys(tags or []))
+    document.tag_links = models.DocumentTag.relink(document.tag_links, names, _tags_by_name(session, names))
+
+
 def create_document(
     session: Session, *, title: str, source: Optional[str], tags: Optional[Sequence[str]]
 ) -> models.Document:
-    document = models.Document(title=title, source=source, tags=",".join(tags) if tags else None)
+    document = models.Document(title=title, source=source)
+    set_document_tags(session, document, tags)
     session.add(document)
     session.flush()
     return document
@@ -18,28 +39,188 @@ def create_document(
 def create_chunks(
     session: Session, *, document: models.Document, chunks: Iterable[dict]
 ) -> List[models.Chunk]:
-    created = []
-    for chunk in chunks:
-        chunk_model = models.Chunk(
-            document_id=document.id,
-            index=chunk["index"],
-            text=chunk["text"],
-            start_offset=chunk["start_offset"],
-            end_offset=chunk["end_offset"],
-        )
-        session.add(chunk_model)
-        created.append(chunk_model)
-    session.flush()
-    return created
+    """Insert chunks with a single executemany-style INSERT ... RETURNING."""
+
+    rows = [
+        {
+            "document_id": document.id,
+            "index": chunk["index"],
+            "text": chunk["text"],
+            "start_offset": chunk["start_offset"],
+            "end_offset": chunk["end_offset"],
+            "content_hash": chunk.get("content_hash"),
+            "vector_id": chunk.get("vector_id"),
+        }
+        for chunk in chunks
+    ]
+    if not rows:
+        return []
+    statement = insert(models.Chunk).returning(models.Chunk, sort_by_parameter_order=True)
+    return list(session.scalars(statement, rows))
+
 
+def list_documents(
+    session: Session, *, limit: Optional[int] = None, after_id: Optional[int] = None
+) -> List[models.Document]:
+    """Documents ordered by id; pass the last id seen as ``after_id`` to fetch the next page."""
 
-def list_documents(session: Session) -> List[models.Document]:
-    return session.query(models.Document).all()
+    query = session.query(models.Document).order_by(models.Document.id)
+    if after_id is not None:
+        query = query.filter(models.Document.id > after_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
 
 
 def get_document(session: Session, document_id: int) -> Optional[models.Document]:
-    return session.query(models.Document).filter(models.Document.id == document_id).first()
+    return (
+        session.query(models.Document)
+        .options(selectinload(models.Document.chunks))
+        .filter(models.Document.id == document_id)
+        .first()
+    )
 
 
 def chunk_count(session: Session, document_id: int) -> int:
     return session.query(models.Chunk).filter(models.Chunk.document_id == document_id).count()
+
+
+def chunk_counts(session: Session, document_ids: Sequence[int]) -> Dict[int, int]:
+    """Chunk counts for many documents in one GROUP BY query."""
+
+    if not document_ids:
+        return {}
+    rows = (
+        session.query(models.Chunk.document_id, func.count(models.Chunk.id))
+        .filter(models.Chunk.document_id.in_(document_ids))
+        .group_by(models.Chunk.document_id)
+        .all()
+    )
+    return dict(rows)
+
+
+def find_document_by_source(session: Session, source: str) -> Optional[models.Document]:
+    """The most recently created document with ``source``."""
+
+    return (
+        session.query(models.Document)
+        .filter(models.Document.source == source)
+        .order_by(models.Document.id.desc())
+        .first()
+    )
+
+
+def document_chunks(session: Session, document_id: int) -> List[models.Chunk]:
+    return (
+        session.query(models.Chunk)
+        .filter(models.Chunk.document_id == document_id)
+        .order_by(models.Chunk.index)
+        .all()
+    )
+
+
+def delete_chunks(session: Session, chunk_ids: Sequence[int]) -> None:
+    if chunk_ids:
+        session.execute(
+            delete(models.Chunk).where(models.Chunk.id.in_(chunk_ids)).execution_options(synchronize_session=False)
+        )
+
+
+def find_document_ids(session: Session, *, source: Optional[str] = None, tag: Optional[str] = None) -> List[int]:
+    query = session.query(models.Document.id)
+    if source is not None:
+        query = query.filter(models.Document.source == source)
+    if tag is not None:
+        query = query.filter(models.Document.has_tag(tag))
+    return [row[0] for row in query.order_by(models.Document.id)]
+
+
+def chunk_vector_ids(session: Session, document_ids: Sequence[int]) -> List[str]:
+    if not document_ids:
+        return []
+    rows = session.query(models.Chunk.vector_id).filter(
+        models.Chunk.document_id.in_(document_ids), models.Chunk.vector_id.is_not(None)
+    )
+    return [row[0] for row in rows]
+
+
+def delete_documents(session: Session, document_ids: Sequence[int]) -> Tuple[int, int]:
+    """Delete documents, their tag links and chunks with bulk DELETEs; returns (documents, chunks) removed."""
+
+    if not document_ids:
+        return 0, 0
+    session.execute(
+        delete(models.DocumentTag)
+        .where(models.DocumentTag.document_id.in_(document_ids))
+        .execution_options(synchronize_session=False)
+    )
+    chunks = session.execute(
+        delete(models.Chunk)
+        .where(models.Chunk.document_id.in_(document_ids))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    documents = session.execute(
+        delete(models.Document)
+        .where(models.Document.id.in_(document_ids))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    return documents, chunks
+
+
+def chunk_vector_map(session: Session) -> List[Tuple[int, int, Optional[str]]]:
+    """``(chunk id, document id, vector id)`` for every chunk."""
+
+    rows = session.query(models.Chunk.id, models.Chunk.document_id, models.Chunk.vector_id)
+    return [tuple(row) for row in rows]
+
+
+def get_chunks(session: Session, chunk_ids: Sequence[int]) -> List[models.Chunk]:
+    if not chunk_ids:
+        return []
+    return (
+        session.query(models.Chunk)
+        .options(selectinload(models.Chunk.document))
+        .filter(models.Chunk.id.in_(chunk_ids))
+        .order_by(models.Chunk.id)
+        .all()
+    )
+
+
+def indexed_chunks(session: Session, *, after_id: int = 0, limit: int = 1000) -> List[models.Chunk]:
+    """A page of chunks that have a vector id, with their documents, ordered by id."""
+
+    return (
+        session.query(models.Chunk)
+        .options(selectinload(models.Chunk.document))
+        .filter(models.Chunk.id > after_id, models.Chunk.vector_id.is_not(None))
+        .order_by(models.Chunk.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def create_job(session: Session, **fields) -> models.IngestionJob:
+    job = models.IngestionJob(**fields)
+    session.add(job)
+    session.flush()
+    return job
+
+
+def get_job(session: Session, job_id: str) -> Optional[models.IngestionJob]:
+    return session.get(models.IngestionJob, job_id)
+
+
+def list_jobs(session: Session, *, status: Optional[str] = None, limit: int = 100) -> List[models.IngestionJob]:
+    query = session.query(models.IngestionJob)
+    if status:
+        query = query.filter(models.IngestionJob.status == status)
+    return query.order_by(models.IngestionJob.created_at.desc()).limit(limit).all()
+
+
+def unfinished_jobs(session: Session) -> List[models.IngestionJob]:
+    return (
+        session.query(models.IngestionJob)
+        .filter(models.IngestionJob.status.in_(("queued", "running")))
+        .order_by(models.IngestionJob.created_at)
+        .all()
+    )
@@ -0,0 +1,185 @@
+"""Dynamic micro-batching in front of an embedding provider."""
+from __future__ import annotations
+
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.core.logging import logger
+from app.services.embeddings import EmbeddingProvider, as_matrix
+from app.services.executors import ComputeExecutor
+
+
+@dataclass
+class BatcherMetrics:
+    """Running counters describing batching behaviour."""
+
+    requests: int = 0
+    batches: int = 0
+    texts: int = 0
+    largest_batch: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+    def snapshot(self, queue_depth: int) -> dict:
+        return {
+            "queue_depth": queue_depth,
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "avg_wait_ms": 1000 * self.total_wait_seconds / self.requests if self.requests else 0.0,
+            "max_wait_ms": 1000 * self.max_wait_seconds,
+        }
+
+
+# (texts, caller future, enqueue timestamp)
+_Pending = Tuple[List[str], asyncio.Future, float]
+
+
+class MicroBatchingEmbeddingProvider:
+    """Merge concurrent ``embed_texts`` calls into larger model batches.
+
+    Calls are queued and a single worker task drains the queue, waiting at most
+    ``max_wait_ms`` after the first request for more to arrive, or until
+    ``max_batch_size`` texts are pending. The queue is bounded by
+    ``max_queue_size`` requests so callers block instead of piling up work.
+    Model batches run on ``executor`` when given, else on Starlette's threadpool.
+    """
+
+    def __init__(
+        self,
+        provider: EmbeddingProvider,
+        *,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        max_queue_size: int = 1024,
+        executor: Optional[ComputeExecutor] = None,
+    ) -> None:
+        self.provider = provider
+        self.executor = executor
+        self.model_id = provider.model_id
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.metrics = BatcherMetrics()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._carry: Optional[_Pending] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> dict:
+        return self.metrics.snapshot(self.queue_depth)
+
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return as_matrix([])
+        queue = self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await queue.put((list(texts), future, time.perf_counter()))
+        return await future
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._carry = None
+            self._worker = loop.create_task(self._run())
+        return self._queue
+
+    async def _collect(self) -> List[_Pending]:
+        """Block for the first request, then gather more until the batch is full or the wait expires."""
+
+        assert self._queue is not None
+        first = self._carry or await self._queue.get()
+        self._carry = None
+        batch = [first]
+        size = len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if size + len(item[0]) > self.max_batch_size:
+                self._carry = item
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    async def _encode(self, texts: List[str]) -> np.ndarray:
+        encode = getattr(self.provider, "encode", None)
+        if encode is not None:
+            if self.executor is not None:
+                return as_matrix(await self.executor.run(encode, texts))
+            return as_matrix(await run_in_threadpool(encode, texts))
+        return as_matrix(await self.provider.embed_texts(texts))
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            dispatched = time.perf_counter()
+            texts = [text for item in batch for text in item[0]]
+            for _, _, enqueued in batch:
+                waited = dispatched - enqueued
+                self.metrics.total_wait_seconds += waited
+                self.metrics.max_wait_seconds = max(self.metrics.max_wait_seconds, waited)
+            self.metrics.requests += len(batch)
+            self.metrics.batches += 1
+            self.metrics.texts += len(texts)
+            self.metrics.largest_batch = max(self.metrics.largest_batch, len(texts))
+
+            try:
+                parts = [
+                    await self._encode(texts[start : start + self.max_batch_size])
+                    for start in range(0, len(texts), self.max_batch_size)
+                ]
+                vectors = parts[0] if len(parts) == 1 else np.concatenate(parts)
+            except Exception as exc:  # scatter the failure to every waiting caller
+                logger.exception("Embedding batch of %s texts failed", len(texts))
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            # Callers get row slices: views of the batch matrix, not copies.
+            offset = 0
+            for item_texts, future, _ in batch:
+                if not future.done():
+                    future.set_result(vectors[offset : offset + len(item_texts)])
+                offset += len(item_texts)
+
+    async def close(self) -> None:
+        if self._worker is not None and self._loop is asyncio.get_running_loop():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+        pending = [self._carry] if self._carry else []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future, _ in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Embedding batcher closed"))
+        close = getattr(self.provider, "close", None)
+        if close is not None:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
@@ -1,5 +1,28 @@
-"""Chunking utilities."""
-from typing import List
+"""Chunking utilities.
+
+Three strategies are available: ``fixed`` character windows, ``sentence``
+packing of whole sentences up to a character budget, and ``token`` packing of
+sentences up to a token budget measured with the embedding model's tokenizer.
+The packing strategies find every boundary in one regex pass per buffer and
+choose chunk ends with ``numpy.searchsorted`` over cumulative offsets.
+"""
+import re
+import zlib
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+STRATEGIES = ("fixed", "sentence", "token")
+# (chunk_size, overlap) per strategy; token sizes are in tokens, the others in characters.
+DEFAULT_SIZES = {"fixed": (1000, 200), "sentence": (1000, 100), "token": (256, 32)}
+
+# On average one unit in this many is an anchor that always ends a chunk (see PackingChunker).
+_ANCHOR_PERIOD = 8
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+")
+_WORD = re.compile(r"\S+")
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+TokenStarts = Callable[[str], np.ndarray]
 
 
 def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[dict]:
@@ -24,3 +47,306 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[di
             break
         start = end - overlap
     return chunks
+
+
+class StreamNormalizer:
+    """Incremental equivalent of ``" ".join(text.split())`` over text pieces.
+
+    Each piece is emitted as soon as it arrives. A word cut by a piece
+    boundary is continued without a space, so nothing is carried over and
+    text without whitespace (base64, minified blobs) costs linear time.
+    """
+
+    def __init__(self) -> None:
+        self._emitted = False
+        self._in_word = False
+
+    def feed(self, piece: str) -> str:
+        words = piece.split()
+        if not words:
+            self._in_word = self._in_word and not piece
+            return ""
+        continues = self._in_word and not piece[0].isspace()
+        out = " ".join(words)
+        if self._emitted and not continues:
+            out = " " + out
+        self._emitted = True
+        self._in_word = not piece[-1].isspace()
+        return out
+
+    def finish(self) -> str:
+        return ""
+
+
+class StreamChunker:
+    """Incremental equivalent of :func:`chunk_text` over normalized text pieces.
+
+    Only ``chunk_size`` plus one piece of text is buffered; offsets stay
+    absolute across buffer boundaries.
+    """
+
+    def __init__(self, chunk_size: int = 1000, overlap: int = 200) -> None:
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self._buffer = ""
+        self._buffer_start = 0
+        self._index = 0
+
+    def _chunk(self, start: int, end: int) -> dict:
+        chunk = {
+            "index": self._index,
+            "text": self._buffer[start:end],
+            "start_offset": self._buffer_start + start,
+            "end_offset": self._buffer_start + end,
+        }
+        self._index += 1
+        return chunk
+
+    def feed(self, text: str) -> List[dict]:
+        self._buffer += text
+        chunks = []
+        start = 0
+        # A window is only final once we know more text follows it.
+        while len(self._buffer) - start > self.chunk_size:
+            chunks.append(self._chunk(start, start + self.chunk_size))
+            start += self.chunk_size - self.overlap
+        self._buffer = self._buffer[start:]
+        self._buffer_start += start
+        return chunks
+
+    def finish(self) -> List[dict]:
+        chunks = [
+            {
+                **chunk,
+                "index": self._index + chunk["index"],
+                "start_offset": self._buffer_start + chunk["start_offset"],
+                "end_offset": self._buffer_start + chunk["end_offset"],
+            }
+            for chunk in chunk_text(self._buffer, self.chunk_size, self.overlap)
+        ]
+        self._index += len(chunks)
+        self._buffer_start += len(self._buffer)
+        self._buffer = ""
+        return chunks
+
+
+def _starts(pattern: "re.Pattern[str]", text: str, first: bool = False) -> np.ndarray:
+    positions = (match.end() if first else match.start() for match in pattern.finditer(text))
+    if first:
+        return np.fromiter((0, *positions), dtype=np.int64)
+    return np.fromiter(positions, dtype=np.int64)
+
+
+def _terminator_start(text: str, end: int) -> int:
+    """Start of the sentence terminator (see ``_SENTENCE_END``) that ``end`` falls inside, else ``end``."""
+
+    start = end
+    while start and text[start - 1].isspace():
+        start -= 1
+    while start and text[start - 1] in "\"')]":
+        start -= 1
+    # One mark is enough for the pattern to match through to the same end.
+    return start - 1 if start and text[start - 1] in ".!?" else end
+
+
+def regex_token_starts(text: str) -> np.ndarray:
+    """Start offsets of word and punctuation tokens; used when no model tokenizer is available."""
+
+    return _starts(_TOKEN, text)
+
+
+def tokenizer_token_starts(tokenizer) -> TokenStarts:
+    """Adapt a Hugging Face fast tokenizer into a token start offset function."""
+
+    def token_starts(text: str) -> np.ndarray:
+        encoded = tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True, truncation=False, verbose=False
+        )
+        return np.fromiter((start for start, _ in encoded["offset_mapping"]), dtype=np.int64)
+
+    return token_starts
+
+
+class PackingChunker:
+    """Streams chunks made of whole sentences packed up to a budget.
+
+    Sizes are cumulative at each boundary offset: the offset itself for
+    character budgets, or the number of tokens before it. Sentences larger than the budget
+    fall back to word boundaries, and for character budgets words larger than
+    the budget to fixed windows, so every unit fits. Consecutive chunks share
+    the trailing units that fit in ``overlap``.
+
+    Units whose text hashes to 0 modulo ``_ANCHOR_PERIOD`` end a chunk once it
+    is at least half full. These content-defined cut points make packing
+    resynchronize shortly after an edit, so re-ingesting a revised document
+    reproduces most chunks exactly.
+
+    Chunks do not depend on how the text is split into pieces: the last unit
+    of the buffer is held back until more text confirms where it ends, and a
+    buffer cut inside a split sentence or word remembers that it was split.
+    """
+
+    def __init__(self, chunk_size: int, overlap: int, token_starts: Optional[TokenStarts] = None) -> None:
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.token_starts = token_starts
+        self._buffer = ""
+        self._buffer_start = 0
+        self._index = 0
+        self._scanned = 0
+        # Packing resumes at buffer offset ``_skip``; the text before it is kept only so a
+        # sentence end split by a fixed-window cut is still recognized.
+        self._skip = 0
+        # How finely the unit that packing resumes inside was split (see ``_edges`` levels).
+        self._split_depth = 0
+
+    def _measure(self, text: str) -> Callable[[np.ndarray], np.ndarray]:
+        if self.token_starts is None:
+            return lambda edges: edges
+        tokens = self.token_starts(text)
+        return lambda edges: np.searchsorted(tokens, edges, side="left")
+
+    def _edges(self, text: str, measure: Callable[[np.ndarray], np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Unit boundaries in ``text`` and the level each comes from: 0 sentence, 1 word, 2 fixed window."""
+
+        edges = _starts(_SENTENCE_END, text, first=True)
+        edges = np.concatenate([[self._skip], edges[(edges > self._skip) & (edges < len(text))], [len(text)]])
+        levels = np.zeros(len(edges), dtype=np.int8)
+        levels[0] = self._split_depth
+        finer = [lambda: _starts(_WORD, text)]
+        if self.token_starts is None:
+            first = -self._buffer_start % self.chunk_size
+            finer.append(lambda: np.arange(first, len(text), self.chunk_size, dtype=np.int64))
+        for level, candidates in enumerate(finer, start=1):
+            oversize = np.diff(measure(edges)) > self.chunk_size
+            # The buffer may start inside a unit that was split at this level before it was cut.
+            oversize[:1] |= self._split_depth >= level
+            oversize = np.flatnonzero(oversize)
+            if not oversize.size:
+                break
+            positions = candidates()
+            span = np.searchsorted(edges[oversize], positions, side="right") - 1
+            inside = (span >= 0) & (positions < edges[oversize + 1][np.maximum(span, 0)])
+            # np.unique keeps the first occurrence, so existing edges keep their coarser level.
+            edges, first_seen = np.unique(np.concatenate([edges, positions[inside]]), return_index=True)
+            levels = np.concatenate([levels, np.full(int(inside.sum()), level, dtype=np.int8)])[first_seen]
+        return edges, levels
+
+    def _pack(self, final: bool) -> List[dict]:
+        text = self._buffer
+        if not text:
+            return []
+        measure = self._measure(text)
+        edges, levels = self._edges(text, measure)
+        if not final:
+            # The last unit may continue in the next piece; never pack it yet.
+            edges = edges[:-1]
+        sizes = measure(edges)
+        units = len(edges) - 1
+        bounds = edges.tolist()
+        anchored = np.fromiter(
+            (
+                zlib.crc32(text[bounds[k] : bounds[k + 1]].rstrip().encode("utf-8")) % _ANCHOR_PERIOD == 0
+                for k in range(units)
+            ),
+            dtype=bool,
+            count=units,
+        )
+        anchors = np.flatnonzero(anchored) + 1
+        spans: List[Tuple[int, int]] = []
+        start = 0
+        while start < units:
+            end = max(int(np.searchsorted(sizes, sizes[start] + self.chunk_size, side="right")) - 1, start + 1)
+            # Cut at the first anchor past half the budget so chunks stay reasonably full.
+            half = int(np.searchsorted(sizes, sizes[start] + self.chunk_size // 2, side="left"))
+            anchor = int(np.searchsorted(anchors, max(half, start + 1), side="left"))
+            if anchor < len(anchors) and anchors[anchor] < end:
+                end = int(anchors[anchor])
+            if end >= units and not final:
+                break
+            spans.append((start, end))
+            if end >= units:
+                start = units
+                break
+            overlap_start = int(np.searchsorted(sizes, sizes[end] - self.overlap, side="left"))
+            start = overlap_start if start < overlap_start < end else end
+
+        chunks = []
+        for first, last in spans:
+            chunk = text[edges[first] : edges[last]].rstrip()
+            offset = self._buffer_start + int(edges[first])
+            chunks.append(
+                {"index": self._index, "text": chunk, "start_offset": offset, "end_offset": offset + len(chunk)}
+            )
+            self._index += 1
+        resume = len(text) if final else int(edges[start])
+        self._split_depth = 0 if final else int(levels[start])
+        consumed = _terminator_start(text, resume) if self._split_depth == 2 else resume
+        self._skip = resume - consumed
+        self._buffer = text[consumed:]
+        self._buffer_start += consumed
+        self._scanned = len(self._buffer)
+        return chunks
+
+    def feed(self, text: str) -> List[dict]:
+        self._buffer += text
+        # Rescan only once the buffer has doubled so small pieces stay linear overall.
+        if len(self._buffer) < 2 * self._scanned:
+            return []
+        return self._pack(final=False)
+
+    def finish(self) -> List[dict]:
+        return self._pack(final=True)
+
+
+def make_chunker(
+    strategy: str = "fixed",
+    chunk_size: Optional[int] = None,
+    overlap: Optional[int] = None,
+    token_starts: Optional[TokenStarts] = None,
+):
+    """Build a streaming chunker; sizes default per strategy (see ``DEFAULT_SIZES``)."""
+
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown chunking strategy {strategy!r}; expected one of {', '.join(STRATEGIES)}")
+    default_size, default_overlap = DEFAULT_SIZES[strategy]
+    chunk_size = chunk_size or default_size
+    if overlap is None:
+        # Keep the default overlap ratio when only the size is overridden.
+        overlap = chunk_size * default_overlap // default_size
+    if overlap >= chunk_size:
+        raise ValueError("chunk overlap must be smaller than the chunk size")
+    if strategy == "fixed":
+        return StreamChunker(chunk_size, overlap)
+    if strategy == "token":
+        return PackingChunker(chunk_size, overlap, token_starts or regex_token_starts)
+    return PackingChunker(chunk_size, overlap)
+
+
+class TextChunker:
+    """Normalizes raw text pieces and chunks them as they arrive with ``chunker``."""
+
+    def __init__(self, chunker) -> None:
+        self.chunker = chunker
+        self._normalizer = StreamNormalizer()
+
+    def feed(self, piece: str) -> List[dict]:
+        return self.chunker.feed(self._normalizer.feed(piece))
+
+    def finish(self) -> List[dict]:
+        return self.chunker.feed(self._normalizer.finish()) + self.chunker.finish()
+
+
+def chunk_stream(
+    pieces: Iterable[str],
+    chunk_size: Optional[int] = None,
+    overlap: Optional[int] = None,
+    strategy: str = "fixed",
+    token_starts: Optional[TokenStarts] = None,
+) -> Iterator[dict]:
+    """Normalize and chunk an iterable of raw text pieces lazily."""
+
+    chunker = TextChunker(make_chunker(strategy, chunk_size, overlap, token_starts))
+    for piece in pieces:
+        yield from chunker.feed(piece)
+    yield from chunker.finish()
@@ -0,0 +1,160 @@
+"""Content-addressed caching in front of an embedding provider."""
+from __future__ import annotations
+
+import hashlib
+import inspect
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.services.embeddings import EmbeddingProvider, as_matrix
+
+
+def cache_key(model_id: str, text: str) -> str:
+    """Key a text by model and whitespace-normalized content."""
+
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{model_id}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    def snapshot(self, size: int) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "size": size,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+class SQLiteEmbeddingStore:
+    """Persistent tier storing vectors as float32 blobs keyed by content hash."""
+
+    def __init__(self, path: str) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit.
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                placeholders = ",".join("?" for _ in batch)
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, vector.tobytes()) for key, vector in items.items()],
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddingProvider:
+    """Serve repeated texts from an in-memory LRU and optional SQLite tier.
+
+    Lookups are batched: only texts missing from both tiers are sent to the
+    wrapped provider, and duplicates within a call are embedded once.
+    """
+
+    def __init__(
+        self,
+        provider: EmbeddingProvider,
+        *,
+        model_id: Optional[str] = None,
+        max_entries: int = 10_000,
+        disk_path: Optional[str] = None,
+    ) -> None:
+        self.provider = provider
+        self.model_id = model_id or provider.model_id
+        self.max_entries = max_entries
+        self.stats_counters = CacheStats()
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._disk = SQLiteEmbeddingStore(disk_path) if disk_path else None
+
+    def stats(self) -> dict:
+        return self.stats_counters.snapshot(len(self._memory))
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats_counters.evictions += 1
+
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        keys = [cache_key(self.model_id, text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        for key in keys:
+            if key in found:
+                continue
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                found[key] = vector
+                self.stats_counters.memory_hits += 1
+
+        if self._disk is not None:
+            pending = list({key for key in keys if key not in found})
+            if pending:
+                from_disk = await run_in_threadpool(self._disk.get_many, pending)
+                for key, vector in from_disk.items():
+                    self._remember(key, vector)
+                found.update(from_disk)
+                self.stats_counters.disk_hits += len(from_disk)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            self.stats_counters.misses += len(missing)
+            vectors = as_matrix(await self.provider.embed_texts(list(missing.values())))
+            # Copy rows out so a cached entry does not pin the provider's whole batch.
+            computed = {key: np.array(vector) for key, vector in zip(missing.keys(), vectors)}
+            for key, vector in computed.items():
+                self._remember(key, vector)
+            found.update(computed)
+            if self._disk is not None:
+                await run_in_threadpool(self._disk.put_many, computed)
+
+        if not keys:
+            return as_matrix([])
+        return np.stack([found[key] for key in keys])
+
+    async def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+        close = getattr(self.provider, "close", None)
+        if close is not None:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
@@ -1,8 +1,15 @@
-"""Embedding provider interfaces and implementations."""
+"""Embedding provider interfaces and implementations.
+
+Embeddings travel as one C-contiguous ``(len(texts), dim)`` float32 ndarray
+from the model to the vector store; they become Python lists only where an
+external API (JSON, Chroma) requires them.
+"""
 from __future__ import annotations
 
 import hashlib
-from typing import List, Protocol
+from typing import Any, List, Optional, Protocol, Sequence, Union
+
+import numpy as np
 
 try:
     from sentence_transformers import SentenceTransformer  # type: ignore
@@ -10,49 +17,90 @@ except Exception:  # pragma: no cover - optional dependency
     SentenceTransformer = None
 
 from app.config import get_settings
+from app.services.executors import ComputeExecutor
 
 settings = get_settings()
 
 
+def as_matrix(embeddings: Union[np.ndarray, Sequence[Sequence[float]]]) -> np.ndarray:
+    """``embeddings`` as a C-contiguous float32 matrix; float32 arrays pass through without a copy."""
+
+    matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if matrix.size == 0:
+        return matrix.reshape(len(matrix), matrix.shape[1] if matrix.ndim == 2 else 0)
+    return matrix
+
+
 class EmbeddingProvider(Protocol):
-    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+    model_id: str
+
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Embed ``texts`` as a ``(len(texts), dim)`` float32 matrix."""
         ...
 
 
 class LocalEmbeddingProvider:
-    """Deterministic embedding using sentence-transformers if available, otherwise hashing."""
+    """Deterministic embedding using sentence-transformers if available, otherwise hashing.
+
+    With an ``executor``, ``embed_texts`` runs ``encode`` on its threads, which
+    share the one model, instead of on the event loop.
+    """
 
-    def __init__(self) -> None:
+    def __init__(self, executor: Optional[ComputeExecutor] = None) -> None:
+        self.executor = executor
         if SentenceTransformer:
             self.model = SentenceTransformer("all-MiniLM-L6-v2")
+            self.model_id = "sentence-transformers/all-MiniLM-L6-v2"
+            self.tokenizer = self.model.tokenizer
         else:
             self.model = None
+            self.model_id = "local-sha256-8"
+            self.tokenizer = None
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Synchronous encoding, suitable for running in a worker thread."""
 
-    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
         if self.model:
-            return self.model.encode(texts, convert_to_numpy=True).tolist()
-        embeddings: List[List[float]] = []
-        for text in texts:
-            digest = hashlib.sha256(text.encode("utf-8")).digest()
-            vector = [float(int.from_bytes(digest[i : i + 4], "big") % 1000) for i in range(0, 32, 4)]
-            embeddings.append(vector)
-        return embeddings
+            return as_matrix(self.model.encode(texts, convert_to_numpy=True))
+        # Each vector is the digest read as eight big-endian uint32 words, mod 1000.
+        digests = b"".join(hashlib.sha256(text.encode("utf-8")).digest() for text in texts)
+        words = np.frombuffer(digests, dtype=">u4").reshape(len(texts), 8)
+        return (words % 1000).astype(np.float32)
+
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        if self.executor is not None:
+            return await self.executor.run(self.encode, texts)
+        return self.encode(texts)
 
 
 class OpenAIEmbeddingProvider:
     """Placeholder for OpenAI embeddings."""
 
+    model_id = "openai-stub"
+
     def __init__(self, api_key: str | None) -> None:
         self.api_key = api_key
 
-    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
         if not self.api_key:
             raise RuntimeError("OPENAI_API_KEY is required for OpenAIEmbeddingProvider")
         # Stub implementation to avoid external calls during tests.
-        return [[float(len(text)) for _ in range(8)] for text in texts]
+        lengths = np.fromiter((len(text) for text in texts), dtype=np.float32, count=len(texts))
+        return np.repeat(lengths[:, None], 8, axis=1)
+
+
+def get_tokenizer(provider: Any) -> Optional[Any]:
+    """Return the model tokenizer behind ``provider``, looking through caching/batching wrappers."""
+
+    while provider is not None:
+        tokenizer = getattr(provider, "tokenizer", None)
+        if tokenizer is not None:
+            return tokenizer
+        provider = getattr(provider, "provider", None)
+    return None
 
 
-def get_embedding_provider() -> EmbeddingProvider:
+def get_embedding_provider(executor: Optional[ComputeExecutor] = None) -> EmbeddingProvider:
     if settings.embedding_provider == "openai":
         return OpenAIEmbeddingProvider(settings.openai_api_key)
-    return LocalEmbeddingProvider()
+    return LocalEmbeddingProvider(executor=executor)
@@ -0,0 +1,221 @@
+"""Bounded executors for blocking compute, and an event-loop lag monitor.
+
+CPU-heavy extraction (PDF parsing) runs in a process pool so it does not hold
+the GIL; model inference runs in a thread pool sharing the one loaded model.
+Each executor admits at most ``max_workers + max_queue`` tasks at a time and
+rejects the rest with :class:`ExecutorSaturatedError`; each task has a
+timeout after which the caller gets :class:`ExecutorTimeoutError`. A task
+that is already running cannot be interrupted, so it still occupies its
+worker until it finishes.
+"""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Optional, Tuple
+
+import numpy as np
+
+from app.core.logging import logger
+
+KINDS = ("process", "thread", "inline")
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Every worker is busy and the executor's queue is full."""
+
+
+class ExecutorTimeoutError(TimeoutError):
+    """A task did not finish within its timeout."""
+
+
+def _timed_call(fn: Callable, *args: Any) -> Tuple[Any, float, float]:
+    # time.monotonic is system-wide on Linux, so worker processes share the caller's clock.
+    started = time.monotonic()
+    result = fn(*args)
+    return result, started, time.monotonic()
+
+
+@dataclass
+class ExecutorStats:
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    rejected: int = 0
+    timed_out: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    total_run_seconds: float = 0.0
+    max_run_seconds: float = 0.0
+
+    def snapshot(self, in_flight: int) -> dict:
+        return {
+            "in_flight": in_flight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": 1000 * self.total_wait_seconds / self.completed if self.completed else 0.0,
+            "max_wait_ms": 1000 * self.max_wait_seconds,
+            "avg_run_ms": 1000 * self.total_run_seconds / self.completed if self.completed else 0.0,
+            "max_run_ms": 1000 * self.max_run_seconds,
+        }
+
+
+class ComputeExecutor:
+    """Run blocking callables off the event loop on a bounded pool.
+
+    ``kind`` is ``process`` (callables and arguments must pickle), ``thread``,
+    or ``inline`` (run on the event loop; for debugging and tests). Pools are
+    started on first use; process workers are spawned rather than forked so
+    they never inherit the server's threads or open connections.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        kind: str = "thread",
+        max_workers: int = 2,
+        max_queue: int = 32,
+        timeout: Optional[float] = None,
+    ) -> None:
+        if kind not in KINDS:
+            raise ValueError(f"Unknown executor kind {kind!r}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.metrics = ExecutorStats()
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._pool: Optional[Executor] = None
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            **self.metrics.snapshot(self._in_flight),
+        }
+
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                context = multiprocessing.get_context("spawn")
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._pool
+
+    def _release(self, _=None) -> None:
+        # Runs on a pool thread when a task finishes, possibly after its caller timed out.
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    async def run(self, fn: Callable, *args: Any, timeout: Optional[float] = None) -> Any:
+        """Run ``fn(*args)`` on the pool and return its result.
+
+        A task counts as in flight until its worker is done with it, not until
+        the caller stops waiting, so timed-out tasks still count toward the limit.
+        """
+
+        with self._in_flight_lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.metrics.rejected += 1
+                raise ExecutorSaturatedError(f"{self.name} executor is saturated ({self._in_flight} tasks in flight)")
+            self._in_flight += 1
+        self.metrics.submitted += 1
+        submitted = time.monotonic()
+        try:
+            if self.kind == "inline":
+                try:
+                    result, started, finished = _timed_call(fn, *args)
+                finally:
+                    self._release()
+            else:
+                try:
+                    future = self._executor().submit(_timed_call, fn, *args)
+                except BaseException:
+                    self._release()
+                    raise
+                # Cancelling a queued task on timeout also fires the callback.
+                future.add_done_callback(self._release)
+                result, started, finished = await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.metrics.timed_out += 1
+            self.metrics.failed += 1
+            raise ExecutorTimeoutError(f"{self.name} task exceeded {timeout or self.timeout}s") from None
+        except BrokenProcessPool:
+            logger.exception("%s process pool died; it will be restarted", self.name)
+            self._pool = None
+            self.metrics.failed += 1
+            raise
+        except BaseException:
+            self.metrics.failed += 1
+            raise
+        self.metrics.completed += 1
+        waited, ran = started - submitted, finished - started
+        self.metrics.total_wait_seconds += waited
+        self.metrics.max_wait_seconds = max(self.metrics.max_wait_seconds, waited)
+        self.metrics.total_run_seconds += ran
+        self.metrics.max_run_seconds = max(self.metrics.max_run_seconds, ran)
+        return result
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+class LoopLagMonitor:
+    """Measure how late the event loop wakes a task that sleeps ``interval`` seconds.
+
+    Lag is time the loop spent running something else, typically blocking
+    code in a coroutine. Statistics cover the most recent ``window`` samples.
+    """
+
+    def __init__(self, interval: float = 0.1, window: int = 600) -> None:
+        self.interval = interval
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._max = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(time.monotonic() - start - self.interval, 0.0)
+            self._samples.append(lag)
+            self._max = max(self._max, lag)
+
+    def stats(self) -> dict:
+        samples = np.asarray(self._samples) * 1000
+        return {
+            "interval_ms": 1000 * self.interval,
+            "samples": len(samples),
+            "mean_ms": float(samples.mean()) if len(samples) else 0.0,
+            "p99_ms": float(np.percentile(samples, 99)) if len(samples) else 0.0,
+            "max_ms": 1000 * self._max,
+        }
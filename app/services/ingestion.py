@@ -1,15 +1,354 @@
 """Document ingestion pipeline."""
 from __future__ import annotations
 
-import uuid
-from typing import Iterable, List, Optional, Sequence
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
 from app.core.logging import logger
-from app.persistence import models, repositories
-from app.services.chunking import chunk_text
-from app.services.embeddings import EmbeddingProvider
+from app.core.metrics import metrics, span
+from app.persistence import async_repositories, models, repositories
+from app.services.chunking import TextChunker, make_chunker, tokenizer_token_starts
+from app.services.embeddings import EmbeddingProvider, get_tokenizer
+from app.services.query_cache import bump_index_version
 from app.services.vector_store import VectorStore
 
+settings = get_settings()
+
+
+class IngestionInProgressError(RuntimeError):
+    """Garbage collection was requested while documents are being ingested."""
+
+
+class _IngestionGate:
+    """Ingestions in this process share the gate; garbage collection holds it exclusively.
+
+    Collection must not overlap ingestion: it would delete the vectors of
+    chunks that are not committed yet, or copy a collection mid-write.
+    """
+
+    def __init__(self) -> None:
+        self.active = 0
+        self.collecting = False
+        self._changed = asyncio.Condition()
+
+    @asynccontextmanager
+    async def ingest(self) -> AsyncIterator[None]:
+        """Wait for a running collection to finish, then hold the gate shared."""
+
+        async with self._changed:
+            await self._changed.wait_for(lambda: not self.collecting)
+            self.active += 1
+        try:
+            yield
+        finally:
+            async with self._changed:
+                self.active -= 1
+
+    @asynccontextmanager
+    async def collect(self) -> AsyncIterator[None]:
+        """Hold the gate exclusively; raises :class:`IngestionInProgressError` if ingests are running."""
+
+        if self.active or self.collecting:
+            raise IngestionInProgressError("Ingestion in progress; retry when it has finished")
+        self.collecting = True
+        try:
+            yield
+        finally:
+            async with self._changed:
+                self.collecting = False
+                self._changed.notify_all()
+
+
+ingestion_gate = _IngestionGate()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class VectorIds:
+    """Deterministic vector ids ``<document id>-<chunk hash prefix>``, suffixed to stay unique per document."""
+
+    def __init__(self, document_id: int, used: Iterable[str] = ()) -> None:
+        self.document_id = document_id
+        self.used = set(used)
+
+    def assign(self, digest: str) -> str:
+        base = vector_id = f"{self.document_id}-{digest[:32]}"
+        repeat = 0
+        while vector_id in self.used:
+            repeat += 1
+            vector_id = f"{base}-{repeat}"
+        self.used.add(vector_id)
+        return vector_id
+
+
+async def _repo(session, name: str, *args, **kwargs):
+    """Call repository function ``name`` from the sync or async module matching ``session``."""
+
+    if isinstance(session, AsyncSession):
+        return await getattr(async_repositories, name)(session, *args, **kwargs)
+    return getattr(repositories, name)(session, *args, **kwargs)
+
+
+async def _end_transaction(session, method: str) -> None:
+    """``commit`` or ``rollback`` a sync or async ``session``."""
+
+    result = getattr(session, method)()
+    if isinstance(session, AsyncSession):
+        await result
+
+
+async def _index_batch(
+    *,
+    session,
+    document: models.Document,
+    chunks: List[dict],
+    embedding_provider: EmbeddingProvider,
+    vector_store: VectorStore,
+    vector_ids: VectorIds,
+    indexed: List[str],
+) -> int:
+    """Persist, embed and index one batch of chunks, then release the ORM objects.
+
+    The batch's vector ids are appended to ``indexed`` before indexing starts,
+    so a failure part-way through can still remove them.
+    """
+
+    for chunk in chunks:
+        chunk["content_hash"] = chunk.get("content_hash") or content_hash(chunk["text"])
+        chunk["vector_id"] = vector_ids.assign(chunk["content_hash"])
+    with span("db_write"):
+        chunk_models = await _repo(session, "create_chunks", document=document, chunks=chunks)
+    texts = [chunk.text for chunk in chunk_models]
+    with span("embed"):
+        embeddings = await embedding_provider.embed_texts(texts)
+    metadata_entries = [chunk.metadata(document) for chunk in chunk_models]
+    ids = [chunk.vector_id for chunk in chunk_models]
+    indexed.extend(ids)
+    with span("index"):
+        await vector_store.index_embeddings(embeddings, metadata_entries, ids, texts)
+    for chunk in chunk_models:
+        session.expunge(chunk)
+    metrics.counter("rag_ingested_chunks_total").inc(len(chunk_models))
+    return len(chunk_models)
+
+
+async def _ingest_chunks(
+    *,
+    title: str,
+    source: Optional[str],
+    tags: Optional[Sequence[str]],
+    chunks: AsyncIterable[dict],
+    embedding_provider: EmbeddingProvider,
+    vector_store: VectorStore,
+    session,
+    batch_size: int,
+    indexed: List[str],
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> dict:
+    with span("db_write"):
+        document = await _repo(session, "create_document", title=title, source=source, tags=tags)
+    vector_ids = VectorIds(document.id)
+    total = 0
+    batch: List[dict] = []
+    async for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            total += await _index_batch(
+                session=session,
+                document=document,
+                chunks=batch,
+                embedding_provider=embedding_provider,
+                vector_store=vector_store,
+                vector_ids=vector_ids,
+                indexed=indexed,
+            )
+            batch = []
+            if on_progress:
+                on_progress(total)
+    if batch:
+        total += await _index_batch(
+            session=session,
+            document=document,
+            chunks=batch,
+            embedding_provider=embedding_provider,
+            vector_store=vector_store,
+            vector_ids=vector_ids,
+            indexed=indexed,
+        )
+        if on_progress:
+            on_progress(total)
+    logger.info("Ingested document %s with %s chunks", document.id, total)
+    return {"document_id": document.id, "chunks": total}
+
+
+async def _upsert_chunks(
+    *,
+    title: str,
+    source: str,
+    tags: Optional[Sequence[str]],
+    chunks: AsyncIterable[dict],
+    embedding_provider: EmbeddingProvider,
+    vector_store: VectorStore,
+    session,
+    batch_size: int,
+    indexed: List[str],
+    stale: List[str],
+    moved_metadata: List[Tuple[List[str], List[dict]]],
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> dict:
+    """Diff ``chunks`` against the stored document with ``source`` by content hash.
+
+    Unchanged chunks keep their rows and vectors, new chunks are embedded and
+    indexed, and chunks that no longer appear are deleted from the database.
+    Nothing already in the store is touched before the commit: the vector ids
+    of removed chunks are added to ``stale``, and ``(ids, metadatas)`` batches
+    for kept chunks whose position or labels changed to ``moved_metadata``.
+    """
+
+    document = await _repo(session, "find_document_by_source", source)
+    if document is None:
+        result = await _ingest_chunks(
+            title=title,
+            source=source,
+            tags=tags,
+            chunks=chunks,
+            embedding_provider=embedding_provider,
+            vector_store=vector_store,
+            session=session,
+            batch_size=batch_size,
+            indexed=indexed,
+            on_progress=on_progress,
+        )
+        return {**result, "added": result["chunks"], "unchanged": 0, "removed": 0}
+
+    relabelled = (document.title, document.tags) != (title, list(dict.fromkeys(tags or [])))
+    document.title = title
+    if relabelled:
+        await _repo(session, "set_document_tags", document, tags)
+    existing = await _repo(session, "document_chunks", document.id)
+    stored: Dict[str, List[models.Chunk]] = {}
+    for chunk in existing:
+        if chunk.vector_id:  # rows written before vector ids were recorded cannot be matched
+            stored.setdefault(chunk.content_hash or content_hash(chunk.text), []).append(chunk)
+    vector_ids = VectorIds(document.id, used=(chunk.vector_id for chunk in existing if chunk.vector_id))
+
+    total = added = unchanged = 0
+    pending: List[dict] = []
+    moved: List[models.Chunk] = []
+
+    def flush_moved() -> None:
+        moved_metadata.append(([chunk.vector_id for chunk in moved], [chunk.metadata(document) for chunk in moved]))
+        moved.clear()
+
+    async for chunk in chunks:
+        total += 1
+        digest = content_hash(chunk["text"])
+        matches = stored.get(digest)
+        if matches:
+            kept = matches.pop(0)
+            unchanged += 1
+            position = (chunk["index"], chunk["start_offset"], chunk["end_offset"])
+            if relabelled or (kept.index, kept.start_offset, kept.end_offset) != position:
+                kept.index, kept.start_offset, kept.end_offset = position
+                moved.append(kept)
+        else:
+            pending.append({**chunk, "content_hash": digest})
+        if len(pending) >= batch_size:
+            added += await _index_batch(
+                session=session,
+                document=document,
+                chunks=pending,
+                embedding_provider=embedding_provider,
+                vector_store=vector_store,
+                vector_ids=vector_ids,
+                indexed=indexed,
+            )
+            pending = []
+            if on_progress:
+                on_progress(total)
+        if len(moved) >= batch_size:
+            flush_moved()
+    if not total:
+        # Leave the stored document alone; the caller rejects empty input.
+        return {"document_id": document.id, "chunks": 0, "added": 0, "unchanged": 0, "removed": 0}
+    if pending:
+        added += await _index_batch(
+            session=session,
+            document=document,
+            chunks=pending,
+            embedding_provider=embedding_provider,
+            vector_store=vector_store,
+            vector_ids=vector_ids,
+            indexed=indexed,
+        )
+    if moved:
+        flush_moved()
+
+    leftover = {id(chunk) for unmatched in stored.values() for chunk in unmatched}
+    removed = [chunk for chunk in existing if not chunk.vector_id or id(chunk) in leftover]
+    with span("db_write"):
+        await _repo(session, "delete_chunks", [chunk.id for chunk in removed])
+    stale.extend(chunk.vector_id for chunk in removed if chunk.vector_id)
+    for chunk in removed:
+        session.expunge(chunk)
+    if on_progress:
+        on_progress(total)
+    logger.info(
+        "Upserted document %s: %s added, %s unchanged, %s removed", document.id, added, unchanged, len(removed)
+    )
+    return {
+        "document_id": document.id,
+        "chunks": total,
+        "added": added,
+        "unchanged": unchanged,
+        "removed": len(removed),
+    }
+
+
+async def _iterate(items: Iterable) -> AsyncIterator:
+    for item in items:
+        yield item
+
+
+def chunker_for(
+    embedding_provider: Optional[EmbeddingProvider] = None,
+    *,
+    strategy: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+):
+    """Build a chunker from per-request options, falling back to the configured defaults.
+
+    Token budgets are measured with the embedding model's tokenizer when it has one.
+    """
+
+    tokenizer = get_tokenizer(embedding_provider)
+    return make_chunker(
+        strategy or settings.chunk_strategy,
+        chunk_size or settings.chunk_size,
+        chunk_overlap if chunk_overlap is not None else settings.chunk_overlap,
+        tokenizer_token_starts(tokenizer) if tokenizer is not None else None,
+    )
+
+
+async def _chunk_pieces(pieces: AsyncIterable[str], chunker: TextChunker) -> AsyncIterator[dict]:
+    async for piece in pieces:
+        with span("chunk"):
+            chunks = chunker.feed(piece)
+        for chunk in chunks:
+            yield chunk
+    with span("chunk"):
+        chunks = chunker.finish()
+    for chunk in chunks:
+        yield chunk
+
 
 async def ingest_text(
     *,
@@ -20,22 +359,99 @@ async def ingest_text(
     embedding_provider: EmbeddingProvider,
     vector_store: VectorStore,
     session,
+    **options,
+) -> dict:
+    """Ingest raw text into the system; ``options`` are those of :func:`ingest_stream`."""
+
+    return await ingest_stream(
+        title=title,
+        source=source,
+        tags=tags,
+        pieces=_iterate([text]),
+        embedding_provider=embedding_provider,
+        vector_store=vector_store,
+        session=session,
+        **options,
+    )
+
+
+async def ingest_stream(
+    *,
+    title: str,
+    source: Optional[str],
+    tags: Optional[Sequence[str]],
+    pieces: AsyncIterable[str],
+    embedding_provider: EmbeddingProvider,
+    vector_store: VectorStore,
+    session,
+    batch_size: Optional[int] = None,
+    on_progress: Optional[Callable[[int], None]] = None,
+    chunk_strategy: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+    upsert: bool = False,
 ) -> dict:
-    """Ingest raw text into the system."""
+    """Ingest text arriving in pieces with memory bounded by the batch size, not the document size.
 
-    normalized = " ".join(text.split())
-    logger.info("Chunking document '%s'", title)
-    chunks = chunk_text(normalized)
-    document = repositories.create_document(session, title=title, source=source, tags=tags)
-    chunk_models: List[models.Chunk] = repositories.create_chunks(session, document=document, chunks=chunks)
+    Chunks, rows and vectors are written one batch at a time as the text is read;
+    ``on_progress`` receives the running chunk count after each batch. With
+    ``upsert`` the latest document with the same ``source`` is updated in place
+    and only new or changed chunks are embedded.
 
-    embeddings = await embedding_provider.embed_texts([chunk.text for chunk in chunk_models])
-    metadata_entries = [chunk.metadata() for chunk in chunk_models]
-    ids = [str(uuid.uuid4()) for _ in chunk_models]
-    await vector_store.index_embeddings(embeddings, metadata_entries, ids)
+    A non-empty ingest commits ``session`` itself. If it fails, the session is
+    rolled back and the vectors indexed so far are deleted, so none are left
+    under ids that a later document could reuse. Vectors of removed chunks are
+    only deleted, and metadata of moved chunks only updated, once the upsert
+    has committed.
+    """
 
-    logger.info("Ingested document %s with %s chunks", document.id, len(chunk_models))
-    return {"document_id": document.id, "chunks": len(chunk_models)}
+    if upsert and not source:
+        raise ValueError("upsert requires a source")
+    logger.info("Streaming document '%s'", title)
+    chunker = chunker_for(
+        embedding_provider, strategy=chunk_strategy, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+    indexed: List[str] = []
+    stale: List[str] = []
+    moved_metadata: List[Tuple[List[str], List[dict]]] = []
+    # Only an upsert changes existing chunks, so only it defers store updates to after the commit.
+    ingest, extra = _ingest_chunks, {}
+    if upsert:
+        ingest, extra = _upsert_chunks, {"stale": stale, "moved_metadata": moved_metadata}
+    async with ingestion_gate.ingest():
+        try:
+            try:
+                result = await ingest(
+                    title=title,
+                    source=source,
+                    tags=tags,
+                    chunks=_chunk_pieces(pieces, TextChunker(chunker)),
+                    embedding_provider=embedding_provider,
+                    vector_store=vector_store,
+                    session=session,
+                    batch_size=batch_size or settings.ingest_batch_size,
+                    indexed=indexed,
+                    on_progress=on_progress,
+                    **extra,
+                )
+                if result["chunks"]:
+                    with span("db_commit"):
+                        await _end_transaction(session, "commit")
+            except BaseException:  # also a cancelled upload
+                await _end_transaction(session, "rollback")
+                with span("index"):
+                    await vector_store.delete(indexed)
+                raise
+            for ids, metadatas in moved_metadata:
+                with span("index"):
+                    await vector_store.update_metadata(ids, metadatas)
+            if stale:
+                with span("index"):
+                    await vector_store.delete(stale)
+        finally:
+            # Also on failure: the store may have changed even though the ingest did not.
+            bump_index_version()
+    return result
 
 
 def chunks_for_document(chunks: Iterable[models.Chunk]) -> List[dict]:
@@ -0,0 +1,243 @@
+"""Inverted-file (IVF) approximate nearest-neighbour index."""
+from __future__ import annotations
+
+import itertools
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.core.logging import logger
+from app.services.numpy_vector_store import NumpyVectorStore, select_top_k
+from app.services.quantization import Quantizer, kmeans, nearest_centroid
+
+
+class IVFVectorStore(NumpyVectorStore):
+    """Coarse-quantized index that only scans the ``nprobe`` closest inverted lists.
+
+    Until ``train_size`` vectors (at least ``nlist``) have been inserted the
+    store behaves like the exact :class:`NumpyVectorStore`. It then trains ``nlist`` centroids with
+    k-means on a sample; later inserts are assigned to their nearest centroid
+    incrementally. Raise ``nprobe`` for recall, lower it for speed.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        metric: str = "cosine",
+        *,
+        nlist: int = 256,
+        nprobe: int = 8,
+        train_size: Optional[int] = None,
+        quantizer: Optional[Quantizer] = None,
+        rerank: int = 4,
+        quantizer_train_size: int = 10_000,
+    ) -> None:
+        self.nlist = nlist
+        self.nprobe = nprobe
+        # k-means needs a sample of at least one vector per list.
+        self.train_size = max(train_size or 39 * nlist, nlist)
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._lists: List[List[int]] = []
+        self._list_arrays: Dict[int, np.ndarray] = {}
+        super().__init__(
+            path=path,
+            metric=metric,
+            quantizer=quantizer,
+            rerank=rerank,
+            quantizer_train_size=quantizer_train_size,
+        )
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    # -- training & assignment -------------------------------------------------------
+
+    def train(self) -> None:
+        """(Re)train the coarse quantizer on the current vectors and rebuild every list.
+
+        k-means runs on a sample outside the store lock; the rows are assigned
+        to the new lists under it.
+        """
+
+        with self._training:
+            with self._lock:
+                if self._size < self.nlist:
+                    raise ValueError(f"Need at least {self.nlist} vectors to train, have {self._size}")
+                start = time.perf_counter()
+                sample_size = min(self._size, 256 * self.nlist)
+                sample = np.array(
+                    self._full(np.random.default_rng(0).choice(self._size, size=sample_size, replace=False))
+                )
+            centroids = kmeans(sample, self.nlist)
+            with self._lock:
+                self._centroids = centroids
+                self._assignments = np.full(len(self._norms), -1, dtype=np.int32)
+                self._lists = [[] for _ in range(self.nlist)]
+                self._list_arrays.clear()
+                self._assign(np.arange(self._size))
+            logger.info("Trained IVF index with %s lists in %.2fs", self.nlist, time.perf_counter() - start)
+
+    def _assign(self, positions: np.ndarray) -> None:
+        if len(self._assignments) < len(self._norms):
+            grown = np.full(len(self._norms), -1, dtype=np.int32)
+            grown[: len(self._assignments)] = self._assignments
+            self._assignments = grown
+        lists = itertools.chain.from_iterable(
+            nearest_centroid(vectors, self._centroids).tolist() for _, vectors in self._full_blocks(positions)
+        )
+        list_ids = np.fromiter(lists, dtype=np.int32, count=len(positions))
+        previous = self._assignments[positions]
+        moved = previous != list_ids
+        positions, list_ids, previous = positions[moved], list_ids[moved], previous[moved]
+        self._assignments[positions] = list_ids
+        # Filter each list that lost rows once instead of removing rows one by one.
+        for list_id in np.unique(previous[previous >= 0]).tolist():
+            rows = np.asarray(self._lists[list_id], dtype=np.int64)
+            self._lists[list_id] = rows[self._assignments[rows] == list_id].tolist()
+            self._list_arrays.pop(list_id, None)
+        for position, list_id in zip(positions.tolist(), list_ids.tolist()):
+            self._lists[list_id].append(position)
+        for list_id in np.unique(list_ids).tolist():
+            self._list_arrays.pop(list_id, None)
+
+    def _rows_changed(self, positions: np.ndarray) -> None:
+        super()._rows_changed(positions)
+        if self.trained:
+            self._assign(positions)
+
+    def _train_due(self) -> None:
+        super()._train_due()
+        self._train_once(lambda: not self.trained and self._size >= self.train_size, self.train)
+
+    def _rows_removed(self, keep: np.ndarray) -> None:
+        super()._rows_removed(keep)
+        if self.trained:
+            self._assignments = self._assignments[: len(keep)][keep]
+            self._rebuild_lists()
+
+    def _rebuild_lists(self) -> None:
+        self._lists = [[] for _ in range(len(self._centroids))]
+        self._list_arrays.clear()
+        for position, list_id in enumerate(self._assignments[: self._size].tolist()):
+            if list_id >= 0:
+                self._lists[list_id].append(position)
+
+    def _compact(self) -> None:
+        """Retrain the coarse quantizer so lists stay balanced after deletions, then persist."""
+
+        with self._training:
+            if self._size >= self.nlist and (self.trained or self._size >= self.train_size):
+                self.train()
+            super()._compact()
+
+    def _list_rows(self, list_ids: Iterable[int]) -> np.ndarray:
+        arrays = []
+        for list_id in list_ids:
+            array = self._list_arrays.get(list_id)
+            if array is None:
+                array = np.asarray(self._lists[list_id], dtype=np.int64)
+                self._list_arrays[list_id] = array
+            arrays.append(array)
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+
+    # -- search ----------------------------------------------------------------------
+
+    def _scan_exactly(self, allowed: Optional[np.ndarray]) -> bool:
+        # A selective filter leaves fewer rows than the probed lists would hold:
+        # scoring them exactly is cheaper and cannot come up short of top_k.
+        if not self.trained:
+            return True
+        return allowed is not None and len(allowed) * self.nlist <= self._size * min(self.nprobe, self.nlist)
+
+    def _candidates(self, query: np.ndarray, allowed: Optional[np.ndarray]) -> tuple:
+        if self._scan_exactly(allowed):
+            return super()._candidates(query, allowed)
+        nprobe = min(self.nprobe, self.nlist)
+        centroid_distances = np.einsum("ij,ij->i", self._centroids, self._centroids) - 2 * self._centroids @ query
+        probes = np.argpartition(centroid_distances, nprobe - 1)[:nprobe]
+        rows = self._list_rows(probes.tolist())
+        if allowed is not None:
+            rows = rows[np.isin(rows, allowed, assume_unique=True)]
+        return rows, self._distances(query, rows)
+
+    def _top_rows_many(self, queries: np.ndarray, top_k: int, allowed: Optional[np.ndarray]) -> List[tuple]:
+        if self._scan_exactly(allowed):
+            return super()._top_rows_many(queries, top_k, allowed)
+        # Each query probes different lists, so candidate sets cannot share one matrix product.
+        return [select_top_k(*self._candidates(query, allowed), top_k) for query in queries]
+
+    # -- persistence -----------------------------------------------------------------
+
+    FILES = NumpyVectorStore.FILES + ("ivf.npz",)
+
+    def _load(self, path: str) -> None:
+        super()._load(path)
+        ivf_path = os.path.join(path, "ivf.npz")
+        if os.path.exists(ivf_path):
+            state = np.load(ivf_path)
+            self._centroids = state["centroids"]
+            self._assignments = np.array(state["assignments"])
+            if len(self._assignments) != self._size:
+                # Killed between saving the vectors and the lists: assign every row again.
+                self._assignments = np.full(self._size, -1, dtype=np.int32)
+                self._lists = [[] for _ in range(len(self._centroids))]
+                self._assign(np.arange(self._size))
+            self._rebuild_lists()
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            super().save(path)
+            if self.trained:
+                tmp_path = os.path.join(path, "ivf.tmp.npz")
+                np.savez(tmp_path, centroids=self._centroids, assignments=self._assignments[: self._size])
+                os.replace(tmp_path, os.path.join(path, "ivf.npz"))
+
+
+def recall_report(
+    index: IVFVectorStore,
+    queries: np.ndarray,
+    *,
+    top_k: int = 10,
+    nprobes: Iterable[int] = (1, 2, 4, 8, 16, 32),
+) -> List[dict]:
+    """Compare ``index`` against exact search for several ``nprobe`` settings.
+
+    Exact results come from probing every list. Returns one row per setting
+    with mean recall@k and latency percentiles, so ``nprobe`` can be chosen
+    from measurements rather than guesswork.
+    """
+
+    queries = index._prepare(queries)
+    original = index.nprobe
+    rows = []
+    with index._lock:
+        try:
+            index.nprobe = index.nlist
+            truth = [set(index._top_rows(query, top_k, None)[0].tolist()) for query in queries]
+            for nprobe in nprobes:
+                index.nprobe = nprobe
+                latencies, recalls = [], []
+                for query, expected in zip(queries, truth):
+                    start = time.perf_counter()
+                    found = index._top_rows(query, top_k, None)[0]
+                    latencies.append(time.perf_counter() - start)
+                    recalls.append(len(expected.intersection(found.tolist())) / max(len(expected), 1))
+                latency_ms = np.asarray(latencies) * 1000
+                rows.append(
+                    {
+                        "nprobe": nprobe,
+                        "recall": float(np.mean(recalls)),
+                        "p50_ms": float(np.percentile(latency_ms, 50)),
+                        "p95_ms": float(np.percentile(latency_ms, 95)),
+                    }
+                )
+        finally:
+            index.nprobe = original
+    return rows
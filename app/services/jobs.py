@@ -0,0 +1,262 @@
+"""Background ingestion job queue."""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.core.db import async_session_scope
+from app.core.logging import logger
+from app.persistence import async_repositories, models
+from app.services.embeddings import EmbeddingProvider
+from app.services.executors import ComputeExecutor
+from app.services.ingestion import ingest_stream
+from app.services.pdf import pdf_pieces
+from app.services.vector_store import VectorStore
+
+settings = get_settings()
+
+
+async def _spooled_text_pieces(path: str) -> AsyncIterator[str]:
+    """Read a spooled text payload one read-size piece at a time, off the event loop."""
+
+    handle = await run_in_threadpool(open, path, encoding="utf-8")
+    try:
+        while piece := await run_in_threadpool(handle.read, settings.upload_read_size):
+            yield piece
+    finally:
+        await run_in_threadpool(handle.close)
+
+
+def job_summary(job: models.IngestionJob, live_chunks: Optional[int] = None) -> dict:
+    """Serialize a job row, overlaying live progress for jobs still running."""
+
+    chunks = live_chunks if live_chunks is not None else job.chunks_processed
+    elapsed = None
+    if job.started_at:
+        elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+    return {
+        "id": job.id,
+        "status": job.status,
+        "title": job.title,
+        "document_id": job.document_id,
+        "chunks_processed": chunks,
+        "chunks_per_second": chunks / elapsed if elapsed else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+class IngestionJobQueue:
+    """Runs ingestion jobs on ``concurrency`` asyncio workers.
+
+    Job state lives in the ``ingestion_jobs`` table and payloads are spooled to
+    ``spool_directory``, so queued and interrupted jobs are picked up again on
+    the next start. Progress of running jobs is tracked in memory to avoid
+    competing with the ingestion transaction for SQLite's write lock.
+    """
+
+    def __init__(
+        self,
+        *,
+        embedding_provider: EmbeddingProvider,
+        vector_store: VectorStore,
+        concurrency: int = 2,
+        spool_directory: str = "./jobs",
+        extraction_executor: Optional[ComputeExecutor] = None,
+    ) -> None:
+        self.embedding_provider = embedding_provider
+        self.vector_store = vector_store
+        self.extraction_executor = extraction_executor or ComputeExecutor("extraction", kind="inline")
+        self.concurrency = concurrency
+        self.spool_directory = spool_directory
+        self.progress: Dict[str, int] = {}
+        # SQLite allows one writer and the ingestion transaction spans awaits, so
+        # concurrent jobs would stall each other on the lock; run them one at a time.
+        self._write_lock = asyncio.Lock() if settings.database_url.startswith("sqlite") else None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        os.makedirs(self.spool_directory, exist_ok=True)
+        self._queue = asyncio.Queue()
+        async with async_session_scope() as session:
+            pending = await async_repositories.unfinished_jobs(session)
+            for job in pending:
+                job.status = "queued"
+                self._queue.put_nowait(job.id)
+        if pending:
+            logger.info("Re-queued %s unfinished ingestion jobs", len(pending))
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def drain(self) -> None:
+        """Wait until every queued job has finished."""
+
+        if self._queue is not None:
+            await self._queue.join()
+
+    def spool_path(self, job_id: str) -> str:
+        return os.path.join(self.spool_directory, job_id)
+
+    async def submit(
+        self,
+        *,
+        job_id: str,
+        title: str,
+        source: Optional[str],
+        tags: Optional[Sequence[str]],
+        content_type: str,
+        chunk_strategy: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        upsert: bool = False,
+    ) -> dict:
+        """Record a job whose payload is already spooled at ``spool_path(job_id)`` and enqueue it."""
+
+        if self._queue is None:
+            raise RuntimeError("Ingestion job queue is not running")
+        # Commit before enqueueing so a worker never picks up a job it cannot see yet.
+        async with async_session_scope() as session:
+            job = await async_repositories.create_job(
+                session,
+                id=job_id,
+                status="queued",
+                title=title,
+                source=source,
+                tags=",".join(tags) if tags else None,
+                content_type=content_type,
+                payload_path=self.spool_path(job_id),
+                chunk_strategy=chunk_strategy,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                upsert=upsert,
+            )
+            summary = job_summary(job)
+        self._queue.put_nowait(job_id)
+        return summary
+
+    @staticmethod
+    def new_job_id() -> str:
+        return uuid.uuid4().hex
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        while True:
+            job_id = await self._queue.get()
+            try:
+                if self._write_lock is not None:
+                    async with self._write_lock:
+                        await self._run(job_id)
+                else:
+                    await self._run(job_id)
+            except Exception:  # the job row records the failure; keep the worker alive
+                logger.exception("Ingestion job %s failed", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _finish(self, job_id: str, **fields) -> None:
+        async with async_session_scope() as session:
+            job = await async_repositories.get_job(session, job_id)
+            for key, value in fields.items():
+                setattr(job, key, value)
+            job.finished_at = datetime.utcnow()
+
+    async def _run(self, job_id: str) -> None:
+        async with async_session_scope() as session:
+            job = await async_repositories.get_job(session, job_id)
+            if job is None or job.status not in ("queued", "running"):
+                return
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+            job.chunks_processed = 0
+            title, source, content_type, path = job.title, job.source, job.content_type, job.payload_path
+            tags = job.tags.split(",") if job.tags else None
+            options = {
+                "chunk_strategy": job.chunk_strategy,
+                "chunk_size": job.chunk_size,
+                "chunk_overlap": job.chunk_overlap,
+                "upsert": job.upsert,
+            }
+
+        start = time.perf_counter()
+        self.progress[job_id] = 0
+        try:
+            if content_type == "application/pdf":
+                pieces = pdf_pieces(path, self.extraction_executor, settings.pdf_pages_per_task)
+            else:
+                pieces = _spooled_text_pieces(path)
+            async with async_session_scope() as session:
+                result = await ingest_stream(
+                    title=title,
+                    source=source,
+                    tags=tags,
+                    pieces=pieces,
+                    embedding_provider=self.embedding_provider,
+                    vector_store=self.vector_store,
+                    session=session,
+                    on_progress=lambda count: self.progress.__setitem__(job_id, count),
+                    **options,
+                )
+                if not result["chunks"]:
+                    raise ValueError("No text provided")
+        except Exception as exc:
+            await self._finish(
+                job_id, status="failed", error=str(exc), chunks_processed=self.progress.pop(job_id, 0)
+            )
+            raise
+        self.progress.pop(job_id, None)
+        await self._finish(
+            job_id, status="succeeded", document_id=result["document_id"], chunks_processed=result["chunks"]
+        )
+        if os.path.exists(path):
+            os.remove(path)
+        logger.info(
+            "Job %s ingested %s chunks in %.2fs", job_id, result["chunks"], time.perf_counter() - start
+        )
+
+
+_job_queue: Optional[IngestionJobQueue] = None
+
+
+def get_job_queue() -> IngestionJobQueue:
+    if _job_queue is None:
+        raise RuntimeError("Ingestion job queue is not running")
+    return _job_queue
+
+
+async def start_job_queue(
+    embedding_provider: EmbeddingProvider,
+    vector_store: VectorStore,
+    extraction_executor: Optional[ComputeExecutor] = None,
+) -> IngestionJobQueue:
+    global _job_queue
+    _job_queue = IngestionJobQueue(
+        embedding_provider=embedding_provider,
+        vector_store=vector_store,
+        extraction_executor=extraction_executor,
+        concurrency=settings.ingest_job_concurrency,
+        spool_directory=settings.job_spool_directory,
+    )
+    await _job_queue.start()
+    return _job_queue
+
+
+async def stop_job_queue() -> None:
+    global _job_queue
+    if _job_queue is not None:
+        await _job_queue.stop()
+        _job_queue = None
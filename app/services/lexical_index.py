@@ -0,0 +1,243 @@
+"""In-process BM25 index over chunk text, kept in step with the vector store."""
+from __future__ import annotations
+
+import inspect
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core.logging import logger
+from app.core.models import RetrievedChunk
+from app.persistence import async_repositories
+from app.services.metadata_index import MetadataIndex
+from app.services.numpy_vector_store import select_top_k
+from app.services.vector_store import VectorStore
+
+# Words, plus identifiers joined by - . _ / such as error codes and SKUs ("ERR-404", "sku_12.b").
+_TERM = re.compile(r"\w+(?:[-./]\w+)*")
+_PART = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased terms; compound identifiers are indexed whole and by their parts."""
+
+    terms = []
+    for match in _TERM.finditer(text.lower()):
+        term = match.group()
+        terms.append(term)
+        parts = _PART.findall(term)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+class LexicalIndex:
+    """Inverted index with BM25 scoring.
+
+    Each term maps to two compact ``array`` postings lists (row numbers and
+    term frequencies) that only ever grow by appending, so indexing a batch
+    touches just the batch's terms. Removed rows are tombstoned and dropped
+    from the postings once they make up half of the index. Scores are negated
+    BM25 so that, like vector distances, lower is better.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._ids: List[Optional[str]] = []
+        self._positions: Dict[str, int] = {}
+        self._texts: List[Optional[str]] = []
+        self._lengths = array("I")
+        self._live = array("b")
+        self._live_count = 0
+        self._live_length = 0
+        self._metadata = MetadataIndex()
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    # -- updates ---------------------------------------------------------------------
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[dict]) -> None:
+        with self._lock:
+            self._remove([vector_id for vector_id in ids if vector_id in self._positions])
+            for vector_id, text in zip(ids, texts):
+                row = len(self._ids)
+                terms = tokenize(text)
+                for term, frequency in Counter(terms).items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array("I"), array("I"))
+                    postings[0].append(row)
+                    postings[1].append(frequency)
+                self._ids.append(vector_id)
+                self._positions[vector_id] = row
+                self._texts.append(text)
+                self._lengths.append(len(terms))
+                self._live.append(1)
+                self._live_count += 1
+                self._live_length += len(terms)
+            self._metadata.append(metadatas)
+
+    def remove(self, ids: List[str]) -> None:
+        with self._lock:
+            self._remove(ids)
+            if len(self._ids) > 1024 and self._live_count < len(self._ids) // 2:
+                self._compact()
+
+    def _remove(self, ids: List[str]) -> None:
+        for vector_id in ids:
+            row = self._positions.pop(vector_id, None)
+            if row is None:
+                continue
+            self._live[row] = 0
+            self._ids[row] = self._texts[row] = None
+            self._live_count -= 1
+            self._live_length -= self._lengths[row]
+
+    def update_metadata(self, ids: List[str], metadatas: List[dict]) -> None:
+        with self._lock:
+            for vector_id, metadata in zip(ids, metadatas):
+                row = self._positions.get(vector_id)
+                if row is not None:
+                    self._metadata.set_row(row, metadata)
+
+    def _compact(self) -> None:
+        live = np.frombuffer(self._live, dtype=np.int8).astype(bool)
+        remap = np.cumsum(live, dtype=np.int64) - 1
+        postings: Dict[str, Tuple[array, array]] = {}
+        for term, (rows, frequencies) in self._postings.items():
+            rows_np = np.frombuffer(rows, dtype=np.uint32)
+            kept = live[rows_np]
+            if kept.any():
+                postings[term] = (
+                    array("I", remap[rows_np[kept]].astype(np.uint32).tobytes()),
+                    array("I", np.frombuffer(frequencies, dtype=np.uint32)[kept].tobytes()),
+                )
+        kept_rows = np.flatnonzero(live).tolist()
+        self._postings = postings
+        self._ids = [self._ids[row] for row in kept_rows]
+        self._texts = [self._texts[row] for row in kept_rows]
+        self._positions = {vector_id: row for row, vector_id in enumerate(self._ids)}
+        self._lengths = array("I", np.frombuffer(self._lengths, dtype=np.uint32)[live].tobytes())
+        self._live = array("b", [1]) * len(kept_rows)
+        self._metadata.keep(live)
+        logger.info("Compacted lexical index to %s chunks and %s terms", len(kept_rows), len(postings))
+
+    async def load(self, session: AsyncSession, page_size: int = 1000) -> None:
+        """Index every chunk row that has a vector id."""
+
+        after_id, total = 0, 0
+        while True:
+            chunks = await async_repositories.indexed_chunks(session, after_id=after_id, limit=page_size)
+            if not chunks:
+                break
+            await run_in_threadpool(
+                self.add,
+                [chunk.vector_id for chunk in chunks],
+                [chunk.text for chunk in chunks],
+                [chunk.metadata(chunk.document) for chunk in chunks],
+            )
+            after_id = chunks[-1].id
+            total += len(chunks)
+        logger.info("Loaded %s chunks into the lexical index", total)
+
+    # -- search ----------------------------------------------------------------------
+
+    def search(self, query: str, top_k: int, filters: Optional[dict] = None) -> List[RetrievedChunk]:
+        with self._lock:
+            size = len(self._ids)
+            if not size or not self._live_count:
+                return []
+            live = np.frombuffer(self._live, dtype=np.int8).astype(bool)
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32)
+            average_length = self._live_length / self._live_count or 1.0
+            scores = np.zeros(size, dtype=np.float32)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                rows = np.frombuffer(postings[0], dtype=np.uint32)
+                frequencies = np.frombuffer(postings[1], dtype=np.uint32).astype(np.float32)
+                document_frequency = int(live[rows].sum())
+                if not document_frequency:
+                    continue
+                idf = np.log1p((self._live_count - document_frequency + 0.5) / (document_frequency + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[rows] / average_length)
+                scores[rows] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+            rows = np.flatnonzero(live & (scores > 0))
+            allowed = self._metadata.select(filters)
+            if allowed is not None:
+                rows = np.intersect1d(rows, allowed, assume_unique=True)
+            rows, distances = select_top_k(rows, -scores[rows], top_k)
+            return [
+                RetrievedChunk(
+                    id=self._ids[row],
+                    text=self._texts[row],
+                    score=float(distance),
+                    metadata=self._metadata.row(row),
+                )
+                for row, distance in zip(rows.tolist(), distances.tolist())
+            ]
+
+    async def query(self, query: str, top_k: int, filters: Optional[dict] = None) -> List[RetrievedChunk]:
+        return await run_in_threadpool(self.search, query, top_k, filters)
+
+
+class LexicallyIndexedVectorStore:
+    """Vector store wrapper that mirrors every write into a :class:`LexicalIndex`."""
+
+    def __init__(self, store: VectorStore, index: LexicalIndex) -> None:
+        self.store = store
+        self.index = index
+
+    async def index_embeddings(
+        self,
+        embeddings: np.ndarray,
+        metadatas: List[dict],
+        ids: List[str],
+        documents: List[str] | None = None,
+    ) -> None:
+        await self.store.index_embeddings(embeddings, metadatas, ids, documents)
+        if documents is not None:
+            await run_in_threadpool(self.index.add, ids, documents, metadatas)
+
+    async def delete(self, ids: List[str]) -> None:
+        await self.store.delete(ids)
+        await run_in_threadpool(self.index.remove, ids)
+
+    async def update_metadata(self, ids: List[str], metadatas: List[dict]) -> None:
+        await self.store.update_metadata(ids, metadatas)
+        await run_in_threadpool(self.index.update_metadata, ids, metadatas)
+
+    async def list_ids(self) -> List[str]:
+        return await self.store.list_ids()
+
+    async def fetch(self, ids: List[str]) -> tuple:
+        return await self.store.fetch(ids)
+
+    async def compact(self) -> None:
+        await self.store.compact()
+
+    async def query(self, embedding: np.ndarray, top_k: int, filters: dict | None = None) -> List[RetrievedChunk]:
+        return await self.store.query(embedding, top_k, filters)
+
+    async def query_many(
+        self, embeddings: np.ndarray, top_ks: List[int], filters: List[dict | None]
+    ) -> List[List[RetrievedChunk]]:
+        return await self.store.query_many(embeddings, top_ks, filters)
+
+    async def close(self) -> None:
+        close = getattr(self.store, "close", None)
+        if close is not None:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
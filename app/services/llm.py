@@ -1,25 +1,51 @@
 """LLM client interfaces and implementations."""
 from __future__ import annotations
 
-from typing import List, Protocol
+import asyncio
+import re
+from typing import AsyncIterator, List, Protocol
+
+_TOKEN = re.compile(r"\s*\S+|\s+$")
 
 
 class LLMClient(Protocol):
+    model_id: str
+
     async def generate_answer(self, query: str, context: List[str]) -> str:
         ...
 
+    def stream_answer(self, query: str, context: List[str]) -> AsyncIterator[str]:
+        """Yield the answer in pieces as it is generated; joined, they equal ``generate_answer``."""
+        ...
+
+
+async def _stream_tokens(text: str) -> AsyncIterator[str]:
+    """Yield ``text`` one whitespace-prefixed word at a time, giving other tasks a turn in between."""
+
+    for match in _TOKEN.finditer(text):
+        yield match.group()
+        await asyncio.sleep(0)
+
 
 class DummyLLMClient:
     """Simple LLM that echoes query and context."""
 
+    model_id = "dummy"
+
     async def generate_answer(self, query: str, context: List[str]) -> str:
         context_preview = "\n".join(context)
         return f"Answer to: {query}\nContext:\n{context_preview}"
 
+    async def stream_answer(self, query: str, context: List[str]) -> AsyncIterator[str]:
+        async for token in _stream_tokens(await self.generate_answer(query, context)):
+            yield token
+
 
 class OpenAILLMClient:
     """Placeholder for OpenAI chat completions."""
 
+    model_id = "openai-stub"
+
     def __init__(self, api_key: str | None) -> None:
         self.api_key = api_key
 
@@ -29,6 +55,10 @@ class OpenAILLMClient:
         context_preview = " ".join(context)[:2000]
         return f"[OpenAI simulated] {query} | context: {context_preview}"
 
+    async def stream_answer(self, query: str, context: List[str]) -> AsyncIterator[str]:
+        async for token in _stream_tokens(await self.generate_answer(query, context)):
+            yield token
+
 
 def get_llm_client(api_key: str | None = None, provider: str = "dummy") -> LLMClient:
     if provider == "openai":
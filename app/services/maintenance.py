@@ -0,0 +1,125 @@
+"""Document deletion and vector store garbage collection."""
+from __future__ import annotations
+
+import time
+from typing import Dict, List, Sequence, Set
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logging import logger
+from app.core.metrics import span
+from app.persistence import async_repositories
+from app.services.embeddings import EmbeddingProvider
+from app.services.ingestion import VectorIds, content_hash, ingestion_gate
+from app.services.query_cache import bump_index_version
+from app.services.vector_store import VectorStore
+
+
+async def delete_documents(
+    session: AsyncSession, vector_store: VectorStore, document_ids: Sequence[int]
+) -> Dict[str, int]:
+    """Delete documents, their chunks and their vectors.
+
+    Commits ``session`` after deleting the rows and only then deletes the
+    vectors, so a failed commit leaves both in place. Vectors left behind when
+    the vector store call fails are removed by :func:`collect_garbage`.
+    """
+
+    vector_ids = await async_repositories.chunk_vector_ids(session, document_ids)
+    documents, chunks = await async_repositories.delete_documents(session, document_ids)
+    with span("db_commit"):
+        await session.commit()
+    with span("index"):
+        await vector_store.delete(vector_ids)
+    bump_index_version()
+    logger.info("Deleted %s documents, %s chunks and %s vectors", documents, chunks, len(vector_ids))
+    return {"documents": documents, "chunks": chunks, "vectors": len(vector_ids)}
+
+
+async def collect_garbage(
+    session: AsyncSession,
+    vector_store: VectorStore,
+    embedding_provider: EmbeddingProvider,
+    *,
+    reindex_missing: bool = True,
+    compact: bool = True,
+    batch_size: int = 256,
+) -> Dict[str, float]:
+    """Reconcile the vector store with the ``chunks`` table.
+
+    Vectors whose id no chunk references are deleted. Chunks whose vector is
+    missing, including rows written before vector ids were recorded, are
+    re-embedded under a deterministic id when ``reindex_missing`` is set.
+    Finally the store is compacted. Ingestion in this process waits until
+    collection has finished; :class:`~app.services.ingestion.IngestionInProgressError`
+    is raised if documents are being ingested when it starts.
+    """
+
+    async with ingestion_gate.collect():
+        return await _collect_garbage(
+            session,
+            vector_store,
+            embedding_provider,
+            reindex_missing=reindex_missing,
+            compact=compact,
+            batch_size=batch_size,
+        )
+
+
+async def _collect_garbage(
+    session: AsyncSession,
+    vector_store: VectorStore,
+    embedding_provider: EmbeddingProvider,
+    *,
+    reindex_missing: bool,
+    compact: bool,
+    batch_size: int,
+) -> Dict[str, float]:
+    start = time.perf_counter()
+    stored: Set[str] = set(await vector_store.list_ids())
+    rows = await async_repositories.chunk_vector_map(session)
+    referenced = {vector_id for _, _, vector_id in rows if vector_id}
+
+    orphans = sorted(stored - referenced)
+    await vector_store.delete(orphans)
+
+    missing: List[int] = [chunk_id for chunk_id, _, vector_id in rows if vector_id not in stored]
+    reindexed = 0
+    if reindex_missing and missing:
+        allocators: Dict[int, VectorIds] = {}
+        for _, document_id, vector_id in rows:
+            allocator = allocators.setdefault(document_id, VectorIds(document_id))
+            if vector_id:
+                allocator.used.add(vector_id)
+        for offset in range(0, len(missing), batch_size):
+            chunks = await async_repositories.get_chunks(session, missing[offset : offset + batch_size])
+            for chunk in chunks:
+                chunk.content_hash = chunk.content_hash or content_hash(chunk.text)
+                if not chunk.vector_id:
+                    chunk.vector_id = allocators[chunk.document_id].assign(chunk.content_hash)
+            texts = [chunk.text for chunk in chunks]
+            embeddings = await embedding_provider.embed_texts(texts)
+            await vector_store.index_embeddings(
+                embeddings,
+                [chunk.metadata(chunk.document) for chunk in chunks],
+                [chunk.vector_id for chunk in chunks],
+                texts,
+            )
+            await session.flush()
+            reindexed += len(chunks)
+
+    if compact:
+        await vector_store.compact()
+    if orphans or reindexed:
+        bump_index_version()
+    report = {
+        "vectors_scanned": len(stored),
+        "chunks_scanned": len(rows),
+        "orphaned_vectors_deleted": len(orphans),
+        "chunks_missing_vectors": len(missing),
+        "chunks_reindexed": reindexed,
+        "compacted": compact,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    logger.info("Garbage collection: %s", report)
+    return report
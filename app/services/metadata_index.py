@@ -0,0 +1,244 @@
+"""Metadata filtering: column storage plus posting-list indexes for pre-filtered search.
+
+Filters follow Chroma's ``where`` syntax. :class:`MetadataIndex` resolves them
+to the sorted row positions allowed *before* any vector is scored, so a
+selective filter shrinks the search instead of discarding most of its results.
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Fields with posting lists; other fields are filtered by scanning their column.
+INDEXED_FIELDS = ("document_id", "source", "title", "tags")
+
+_COMPARATORS = {
+    "$eq": lambda column, value: column == value,
+    "$ne": lambda column, value: column != value,
+    "$gt": lambda column, value: column > value,
+    "$gte": lambda column, value: column >= value,
+    "$lt": lambda column, value: column < value,
+    "$lte": lambda column, value: column <= value,
+}
+
+
+class MetadataColumns:
+    """Column-oriented metadata store evaluated as boolean masks.
+
+    Filters follow Chroma's ``where`` syntax: ``{"key": value}``,
+    ``{"key": {"$in": [...]}}`` and ``{"$and"/"$or": [...]}``. List-valued
+    metadata (e.g. tags) matches when any element matches.
+    """
+
+    def __init__(self, columns: Optional[Dict[str, List[Any]]] = None, size: int = 0) -> None:
+        self._columns: Dict[str, List[Any]] = columns or {}
+        self._size = size
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, rows: List[dict]) -> None:
+        for key in {key for row in rows for key in row}:
+            self._columns.setdefault(key, [None] * self._size)
+        for column_name, column in self._columns.items():
+            column.extend(row.get(column_name) for row in rows)
+        self._size += len(rows)
+        self._arrays.clear()
+
+    def set_row(self, position: int, row: dict) -> None:
+        for key in row:
+            self._columns.setdefault(key, [None] * self._size)
+        for column_name, column in self._columns.items():
+            column[position] = row.get(column_name)
+        self._arrays.clear()
+
+    def row(self, position: int) -> dict:
+        return {
+            name: column[position] for name, column in self._columns.items() if column[position] is not None
+        }
+
+    def keep(self, mask: np.ndarray) -> None:
+        """Drop the rows where ``mask`` is False."""
+
+        kept = np.flatnonzero(mask).tolist()
+        self._columns = {name: [column[i] for i in kept] for name, column in self._columns.items()}
+        self._size = len(kept)
+        self._arrays.clear()
+
+    def to_dict(self) -> Dict[str, List[Any]]:
+        return self._columns
+
+    def _array(self, key: str) -> np.ndarray:
+        array = self._arrays.get(key)
+        if array is None:
+            values = self._columns.get(key, [None] * self._size)
+            array = np.empty(self._size, dtype=object)
+            array[:] = values
+            self._arrays[key] = array
+        return array
+
+    def _match(self, key: str, op: str, value: Any) -> np.ndarray:
+        column = self._array(key)
+        if op == "$in":
+            allowed = set(value)
+            return np.fromiter(
+                (bool(allowed.intersection(v)) if isinstance(v, list) else v in allowed for v in column),
+                dtype=bool,
+                count=self._size,
+            )
+        if op == "$nin":
+            return ~self._match(key, "$in", value)
+        if op in ("$eq", "$ne"):
+            matched = np.fromiter(
+                (value in v if isinstance(v, list) else v == value for v in column), dtype=bool, count=self._size
+            )
+            return matched if op == "$eq" else ~matched
+        if op not in _COMPARATORS:
+            raise ValueError(f"Unsupported filter operator {op!r}")
+        present = np.fromiter((v is not None for v in column), dtype=bool, count=self._size)
+        result = np.zeros(self._size, dtype=bool)
+        result[present] = _COMPARATORS[op](column[present], value).astype(bool)
+        return result
+
+    def mask(self, filters: Optional[dict]) -> Optional[np.ndarray]:
+        """Boolean mask of rows matching ``filters``, or ``None`` when unfiltered."""
+
+        if not filters:
+            return None
+        result = np.ones(self._size, dtype=bool)
+        for key, condition in filters.items():
+            if key == "$and":
+                for clause in condition:
+                    result &= self.mask(clause)
+            elif key == "$or":
+                any_match = np.zeros(self._size, dtype=bool)
+                for clause in condition:
+                    any_match |= self.mask(clause)
+                result &= any_match
+            elif isinstance(condition, dict):
+                for op, value in condition.items():
+                    result &= self._match(key, op, value)
+            else:
+                result &= self._match(key, "$eq", condition)
+        return result
+
+
+def _keys(value: Any) -> Iterable[Any]:
+    if value is None:
+        return ()
+    if isinstance(value, list):
+        return dict.fromkeys(value)
+    return (value,)
+
+
+class MetadataIndex(MetadataColumns):
+    """:class:`MetadataColumns` with a sorted row-position posting list per value of each indexed field.
+
+    ``$eq``/``$in`` on an indexed field read postings directly, ``$and``
+    intersects from the smallest operand up and ``$or`` unions, so the cost
+    follows the size of the result rather than of the index. Operators and
+    fields without postings fall back to a column scan.
+    """
+
+    def __init__(
+        self,
+        columns: Optional[Dict[str, List[Any]]] = None,
+        size: int = 0,
+        fields: Sequence[str] = INDEXED_FIELDS,
+    ) -> None:
+        super().__init__(columns, size)
+        self.fields = tuple(fields)
+        self._postings: Dict[str, Dict[Any, array]] = {field: {} for field in self.fields}
+        for field in self.fields:
+            for position, value in enumerate(self._columns.get(field, ())):
+                self._post(field, value, position)
+
+    def _post(self, field: str, value: Any, position: int) -> None:
+        postings = self._postings[field]
+        for key in _keys(value):
+            rows = postings.get(key)
+            if rows is None:
+                rows = postings[key] = array("q")
+            rows.append(position)
+
+    def append(self, rows: List[dict]) -> None:
+        start = self._size
+        super().append(rows)
+        for offset, row in enumerate(rows):
+            for field in self.fields:
+                self._post(field, row.get(field), start + offset)
+
+    def set_row(self, position: int, row: dict) -> None:
+        for field in self.fields:
+            column = self._columns.get(field)
+            old = column[position] if column is not None else None
+            for key in _keys(old):
+                rows = self._postings[field][key]
+                del rows[int(np.searchsorted(np.frombuffer(rows, dtype=np.int64), position))]
+                if not rows:
+                    del self._postings[field][key]
+            for key in _keys(row.get(field)):
+                rows = self._postings[field].setdefault(key, array("q"))
+                rows.insert(int(np.searchsorted(np.frombuffer(rows, dtype=np.int64), position)), position)
+        super().set_row(position, row)
+
+    def keep(self, mask: np.ndarray) -> None:
+        super().keep(mask)
+        remap = np.cumsum(mask, dtype=np.int64) - 1
+        for field, postings in self._postings.items():
+            remapped = {}
+            for key, rows in postings.items():
+                positions = np.frombuffer(rows, dtype=np.int64)
+                kept = remap[positions[mask[positions]]]
+                if len(kept):
+                    remapped[key] = array("q", kept.tobytes())
+            self._postings[field] = remapped
+
+    def _rows(self, field: str, keys: Iterable[Any]) -> np.ndarray:
+        postings = self._postings[field]
+        found = [np.frombuffer(postings[key], dtype=np.int64) for key in keys if key in postings]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        if len(found) == 1:
+            return found[0].copy()
+        return np.unique(np.concatenate(found))
+
+    def _condition(self, key: str, op: str, value: Any) -> np.ndarray:
+        if key in self._postings and op in ("$eq", "$ne", "$in", "$nin"):
+            rows = self._rows(key, value if op in ("$in", "$nin") else [value])
+            if op in ("$eq", "$in"):
+                return rows
+            return np.setdiff1d(np.arange(self._size), rows, assume_unique=True)
+        return np.flatnonzero(self._match(key, op, value))
+
+    def _select(self, filters: dict) -> np.ndarray:
+        parts = []
+        for key, condition in filters.items():
+            if key == "$and":
+                parts.extend(self._select(clause) for clause in condition)
+            elif key == "$or":
+                clauses = [self._select(clause) for clause in condition]
+                parts.append(np.unique(np.concatenate(clauses)) if clauses else np.empty(0, dtype=np.int64))
+            elif isinstance(condition, dict):
+                parts.extend(self._condition(key, op, value) for op, value in condition.items())
+            else:
+                parts.append(self._condition(key, "$eq", condition))
+        if not parts:
+            return np.arange(self._size)
+        parts.sort(key=len)
+        result = parts[0]
+        for part in parts[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, part, assume_unique=True)
+        return result
+
+    def select(self, filters: Optional[dict]) -> Optional[np.ndarray]:
+        """Sorted row positions matching ``filters``, or ``None`` when unfiltered."""
+
+        if not filters:
+            return None
+        return self._select(filters)
@@ -0,0 +1,796 @@
+"""In-process vector store backed by a contiguous NumPy matrix."""
+from __future__ import annotations
+
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.core.logging import logger
+from app.core.models import RetrievedChunk
+from app.services.embeddings import as_matrix
+from app.services.metadata_index import MetadataIndex
+from app.services.quantization import Quantizer
+
+_BATCH_DISTANCE_ELEMENTS = 16_000_000
+_QUANTIZER_SAMPLE = 65_536
+# Rows read from (or copied between) row files at a time.
+_READ_BLOCK = 65_536
+
+
+def select_top_k(rows: np.ndarray, distances: np.ndarray, top_k: int) -> tuple:
+    """The ``top_k`` smallest distances and their rows, sorted best first."""
+
+    k = min(top_k, len(rows))
+    if k <= 0:
+        return rows[:0], distances[:0]
+    best = np.argpartition(distances, k - 1)[:k]
+    best = best[np.argsort(distances[best], kind="stable")]
+    return rows[best], distances[best]
+
+
+def _grown(array: np.ndarray, capacity: int, size: int) -> np.ndarray:
+    grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:size] = array[:size]
+    return grown
+
+
+class RowFile:
+    """Append-only float32 rows in an unlinked temporary file, memory-mapped for reads.
+
+    Rows are never modified once written, so a copy made in one pass stays
+    valid while more rows are appended. Reading rows pulls in only their pages.
+    ``base`` (such as a memory-mapped saved snapshot) supplies the first rows
+    in place, so opening a saved store copies nothing.
+    """
+
+    def __init__(self, dim: int, directory: Optional[str] = None, base: Optional[np.ndarray] = None) -> None:
+        self.dim = dim
+        self.directory = directory
+        self.base = base if base is not None else np.empty((0, dim), dtype=np.float32)
+        self.rows = len(self.base)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._handle = tempfile.TemporaryFile(dir=directory)
+        self._map: Optional[np.memmap] = None
+
+    def read(self, start: int, stop: int) -> np.ndarray:
+        """Rows ``start:stop``; a view unless the range spans the base and the appended rows."""
+
+        based = len(self.base)
+        if stop <= based:
+            return self.base[start:stop]
+        if start >= based:
+            return self._map[start - based : stop - based]
+        return np.concatenate([self.base[start:], self._map[: stop - based]])
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        """The rows at positions ``rows``, in order."""
+
+        based = len(self.base)
+        if self._map is None:
+            return self.base[rows]
+        if not based:
+            return self._map[rows]
+        in_base = rows < based
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        out[in_base] = self.base[rows[in_base]]
+        out[~in_base] = self._map[rows[~in_base] - based]
+        return out
+
+    def append(self, matrix: np.ndarray) -> np.ndarray:
+        """Append ``matrix`` and return the row numbers it was written to."""
+
+        start = self.rows
+        if len(matrix):
+            self._handle.seek(0, os.SEEK_END)
+            self._handle.write(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+            self._handle.flush()
+            self.rows += len(matrix)
+            shape = (self.rows - len(self.base), self.dim)
+            self._map = np.memmap(self._handle, dtype=np.float32, mode="r", shape=shape)
+        return np.arange(start, self.rows)
+
+    def copy(self, rows: np.ndarray) -> RowFile:
+        """A new file holding ``rows`` in order, copied block by block."""
+
+        fresh = RowFile(self.dim, self.directory)
+        for start in range(0, len(rows), _READ_BLOCK):
+            fresh.append(self.take(rows[start : start + _READ_BLOCK]))
+        return fresh
+
+    def close(self) -> None:
+        self._map = None
+        self.base = np.empty((0, self.dim), dtype=np.float32)
+        self._handle.close()
+
+
+class Journal:
+    """Write-ahead log of the changes made since the last snapshot.
+
+    Each change is one JSON line in ``journal.jsonl``; the vectors of an add
+    go to ``journal.f32`` first and the line records their byte offset. Writes
+    are flushed to the OS, so they survive the process being killed. Replaying
+    a change twice is harmless: adds are upserts by id and deletes skip
+    missing ids. A torn last line (a crash mid-write) is dropped on open.
+    """
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        self.records_path = os.path.join(path, "journal.jsonl")
+        self.vectors_path = os.path.join(path, "journal.f32")
+        self.rows = 0
+        self._records = open(self.records_path, "ab")
+        self._vectors = open(self.vectors_path, "ab")
+
+    def replay(self) -> Iterator[dict]:
+        """Changes in the order they were made, each add with its ``vectors``; then truncates a torn tail."""
+
+        with open(self.records_path, "rb") as handle:
+            lines = handle.read().split(b"\n")
+        complete = lines[:-1]  # everything after the last newline was torn
+        vectors = None
+        if os.path.getsize(self.vectors_path):
+            vectors = np.memmap(self.vectors_path, dtype=np.uint8, mode="r")
+        for line in complete:
+            record = json.loads(line)
+            if record["op"] == "add":
+                count, dim = len(record["ids"]), record["dim"]
+                raw = vectors[record["offset"] : record["offset"] + count * dim * 4]
+                record["vectors"] = np.frombuffer(raw.tobytes(), dtype=np.float32).reshape(count, dim)
+                self.rows += count
+            yield record
+        if lines[-1]:
+            self._records.truncate(sum(len(line) + 1 for line in complete))
+
+    def _write(self, record: dict) -> None:
+        self._records.write(json.dumps(record).encode("utf-8") + b"\n")
+        self._records.flush()
+
+    def add(self, matrix: np.ndarray, metadatas: List[dict], ids: List[str], documents: List[Optional[str]]) -> None:
+        self._vectors.seek(0, os.SEEK_END)
+        offset = self._vectors.tell()
+        self._vectors.write(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+        self._vectors.flush()
+        self.rows += len(matrix)
+        record = {"op": "add", "ids": ids, "metadatas": metadatas, "texts": documents, "dim": matrix.shape[1]}
+        self._write({**record, "offset": offset})
+
+    def delete(self, ids: List[str]) -> None:
+        self._write({"op": "delete", "ids": ids})
+
+    def update_metadata(self, ids: List[str], metadatas: List[dict]) -> None:
+        self._write({"op": "update_metadata", "ids": ids, "metadatas": metadatas})
+
+    def reset(self) -> None:
+        """Forget every change; call once they are all in a snapshot."""
+
+        self._records.truncate(0)
+        self._vectors.truncate(0)
+        self.rows = 0
+
+    def close(self) -> None:
+        self._records.close()
+        self._vectors.close()
+
+
+class NumpyVectorStore:
+    """Brute-force vector index over a growable float32 matrix.
+
+    Vectors are L2-normalized on insert when ``metric="cosine"`` so search is a
+    single matrix-vector product followed by ``argpartition``. Scores are
+    distances (lower is better) to match Chroma: ``1 - cosine`` or squared L2.
+    When ``path`` is set every write is also appended to a :class:`Journal`,
+    which is replayed on startup on top of the last snapshot. A snapshot is
+    saved on close and compaction, and whenever the journal holds as many rows
+    as the snapshot; startup memory-maps it and loads the saved norms.
+
+    With a ``quantizer`` the search scores compact codes instead of the
+    float32 matrix. The full-precision vectors are appended to a
+    :class:`RowFile` (in ``path``, else the temp directory) and read back only
+    for exact re-ranking of the best ``top_k * rerank`` candidates
+    (``rerank=0`` returns approximate distances) and for fetches. Memory then
+    holds the codes plus a norm and a file row per vector. Updates and deletes
+    leave dead rows in the file until :meth:`compact`. Trainable quantizers
+    start encoding once ``quantizer_train_size`` vectors are stored; until then
+    search is exact, reading the file. Training runs outside the store lock.
+    """
+
+    # Files this store owns under ``path``; other stores (such as shards) may share the directory.
+    FILES = ("store.json", "vectors.npy", "norms.npy", "codes.npy", "quantizer.npz", "journal.jsonl", "journal.f32")
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        metric: str = "cosine",
+        *,
+        quantizer: Optional[Quantizer] = None,
+        rerank: int = 4,
+        quantizer_train_size: int = 10_000,
+    ) -> None:
+        if metric not in ("cosine", "l2"):
+            raise ValueError(f"Unsupported metric {metric!r}")
+        self.path = path
+        self.metric = metric
+        self.quantizer = quantizer
+        self.rerank = rerank
+        self.quantizer_train_size = quantizer_train_size
+        self._codes: Optional[np.ndarray] = None
+        self._lock = threading.RLock()
+        # Serializes training and compaction, which run mostly outside ``_lock``; take it before ``_lock``.
+        self._training = threading.RLock()
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        # With a quantizer the vectors live in ``_file`` instead, at rows ``_slots``.
+        self._file: Optional[RowFile] = None
+        self._slots = np.empty(0, dtype=np.int64)
+        self._norms = np.empty(0, dtype=np.float32)
+        self._size = 0
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._texts: List[Optional[str]] = []
+        self._metadata = MetadataIndex()
+        self._journal: Optional[Journal] = None
+        # Rows in the last snapshot; the journal is folded into a new one once it holds as many.
+        self._snapshot_rows = 0
+        if path and os.path.exists(os.path.join(path, "store.json")):
+            self._load(path)
+        if path:
+            self._replay(path)
+
+    def __len__(self) -> int:
+        return self._size
+
+    # -- persistence -----------------------------------------------------------------
+
+    def _load(self, path: str) -> None:
+        with open(os.path.join(path, "store.json")) as handle:
+            state = json.load(handle)
+        if state["metric"] != self.metric:
+            raise ValueError(f"Index at {path} was built with metric {state['metric']!r}")
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self._size = self._snapshot_rows = len(state["ids"])
+        if self.quantizer is None:
+            self._vectors = vectors
+        else:
+            # The snapshot is the start of the row file; rows appended later go to a temporary file.
+            self._file = RowFile(vectors.shape[1], path, base=vectors)
+            self._slots = np.arange(self._size)
+        self._norms = self._load_norms(path, vectors)
+        self._ids = state["ids"]
+        self._positions = {vector_id: i for i, vector_id in enumerate(self._ids)}
+        self._texts = state["texts"]
+        self._metadata = MetadataIndex(state["metadata"], self._size)
+        if self.quantizer is not None:
+            self._load_codes(path)
+        logger.info("Loaded %s vectors from %s", self._size, path)
+
+    def _load_norms(self, path: str, vectors: np.ndarray) -> np.ndarray:
+        norms_path = os.path.join(path, "norms.npy")
+        if os.path.exists(norms_path):
+            norms = np.load(norms_path)
+            if len(norms) == self._size:
+                return norms
+        # Saved before norms were: reading every row once is unavoidable.
+        norms = np.empty(self._size, dtype=np.float32)
+        for start in range(0, self._size, _READ_BLOCK):
+            block = np.asarray(vectors[start : start + _READ_BLOCK])
+            norms[start : start + len(block)] = np.einsum("ij,ij->i", block, block)
+        return norms
+
+    def _replay(self, path: str) -> None:
+        journal = Journal(path)
+        changes = 0
+        for record in journal.replay():
+            if record["op"] == "add":
+                self._insert(record["vectors"], record["metadatas"], record["ids"], record["texts"])
+            elif record["op"] == "delete":
+                self._delete(record["ids"])
+            else:
+                self._update_metadata(record["ids"], record["metadatas"])
+            changes += 1
+        # Attached only now, so replayed changes are not journaled again.
+        self._journal = journal
+        if changes:
+            logger.info("Replayed %s journaled changes from %s", changes, path)
+            self._train_due()
+
+    def _load_codes(self, path: str) -> None:
+        codes_path = os.path.join(path, "codes.npy")
+        state_path = os.path.join(path, "quantizer.npz")
+        if os.path.exists(codes_path) and os.path.exists(state_path):
+            state = dict(np.load(state_path))
+            codes = np.load(codes_path)
+            if str(state.pop("kind")) == self.quantizer.kind and len(codes) == self._size:
+                self.quantizer.load_state(state)
+                self._codes = codes
+                return
+        # Saved without (or with a different) quantizer: encode from the full-precision vectors.
+        if self.quantizer.trained or self._size >= self.quantizer_train_size:
+            self.train_quantizer()
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if not path:
+            return
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            self._save_vectors(os.path.join(path, "vectors.tmp.npy"))
+            state = {
+                "metric": self.metric,
+                "ids": self._ids,
+                "texts": self._texts,
+                "metadata": self._metadata.to_dict(),
+            }
+            with open(os.path.join(path, "store.tmp.json"), "w") as handle:
+                json.dump(state, handle)
+            np.save(os.path.join(path, "norms.tmp.npy"), self._norms[: self._size])
+            if self._codes is not None:
+                np.save(os.path.join(path, "codes.tmp.npy"), self._codes[: self._size])
+                np.savez(os.path.join(path, "quantizer.tmp.npz"), kind=self.quantizer.kind, **self.quantizer.state())
+                os.replace(os.path.join(path, "codes.tmp.npy"), os.path.join(path, "codes.npy"))
+                os.replace(os.path.join(path, "quantizer.tmp.npz"), os.path.join(path, "quantizer.npz"))
+            os.replace(os.path.join(path, "vectors.tmp.npy"), os.path.join(path, "vectors.npy"))
+            os.replace(os.path.join(path, "norms.tmp.npy"), os.path.join(path, "norms.npy"))
+            os.replace(os.path.join(path, "store.tmp.json"), os.path.join(path, "store.json"))
+            if self._journal is not None and path == self.path:
+                # A crash before this line replays changes the snapshot already holds, which is harmless.
+                self._journal.reset()
+                self._snapshot_rows = self._size
+
+    def _save_vectors(self, target: str) -> None:
+        if self.quantizer is None:
+            # Copy first: the live matrix may itself be a memory map of vectors.npy.
+            np.save(target, np.array(self._vectors[: self._size]))
+            return
+        out = np.lib.format.open_memmap(target, mode="w+", dtype=np.float32, shape=(self._size, self._dim))
+        for block, vectors in self._full_blocks(np.arange(self._size)):
+            out[block] = vectors
+        out.flush()
+        del out
+
+    def close(self) -> None:
+        self.save()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    # -- writes ----------------------------------------------------------------------
+
+    def _prepare(self, embeddings: np.ndarray) -> np.ndarray:
+        matrix = as_matrix(embeddings)
+        if matrix.ndim != 2:
+            raise ValueError("Embeddings must be a 2D array")
+        if self.metric == "cosine":
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1, norms)
+        return matrix
+
+    @property
+    def _dim(self) -> int:
+        if self.quantizer is None:
+            return self._vectors.shape[1]
+        return self._file.dim if self._file is not None else 0
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        if self._size == 0 and self._dim != dim:
+            capacity = max(rows, 1024)
+            if self.quantizer is None:
+                self._vectors = np.empty((capacity, dim), dtype=np.float32)
+            else:
+                if self._file is not None:
+                    self._file.close()
+                self._file = RowFile(dim, self.path)
+                self._slots = np.empty(capacity, dtype=np.int64)
+            self._norms = np.empty(capacity, dtype=np.float32)
+            self._codes = None
+        if self._dim != dim:
+            raise ValueError(f"Expected {self._dim}-dimensional embeddings, got {dim}")
+        needed = self._size + rows
+        if self.quantizer is None and (needed > len(self._vectors) or not self._vectors.flags.writeable):
+            self._vectors = _grown(self._vectors, max(needed, 2 * len(self._vectors), 1024), self._size)
+        if needed > len(self._norms):
+            capacity = max(needed, 2 * len(self._norms), 1024)
+            self._norms = _grown(self._norms, capacity, self._size)
+            if self.quantizer is not None:
+                self._slots = _grown(self._slots, capacity, self._size)
+
+    def _add(self, embeddings: np.ndarray, metadatas: List[dict], ids: List[str], documents) -> None:
+        self._insert(self._prepare(embeddings), metadatas, ids, documents)
+        self._train_due()
+        if self._journal is not None and self._journal.rows >= max(self._snapshot_rows, _READ_BLOCK):
+            self.save()
+
+    def _insert(self, matrix: np.ndarray, metadatas: List[dict], ids: List[str], documents) -> None:
+        documents = documents or [None] * len(ids)
+        with self._lock:
+            self._reserve(len(matrix), matrix.shape[1])
+            new_meta, touched = [], []
+            for vector_id, metadata, text in zip(ids, metadatas, documents):
+                position = self._positions.get(vector_id)
+                if position is None:
+                    position = self._size + len(new_meta)
+                    new_meta.append(metadata)
+                    self._ids.append(vector_id)
+                    self._texts.append(text)
+                    self._positions[vector_id] = position
+                elif position >= self._size:  # repeated id within this batch
+                    new_meta[position - self._size] = metadata
+                    self._texts[position] = text
+                else:
+                    self._texts[position] = text
+                    self._metadata.set_row(position, metadata)
+                touched.append(position)
+            # Copy rows in one step; for a repeated id the last row of the batch wins.
+            positions, last = np.unique(np.asarray(touched, dtype=np.int64)[::-1], return_index=True)
+            rows = matrix[len(touched) - 1 - last]
+            if self.quantizer is None:
+                self._vectors[positions] = rows
+            else:
+                self._slots[positions] = self._file.append(rows)
+            self._norms[positions] = np.einsum("ij,ij->i", rows, rows)
+            self._metadata.append(new_meta)
+            self._size += len(new_meta)
+            self._rows_changed(positions)
+            if self._journal is not None:
+                self._journal.add(matrix, list(metadatas), list(ids), list(documents))
+
+    def _rows_changed(self, positions: np.ndarray) -> None:
+        """Hook for index structures layered on the matrix; called under the lock after writes."""
+
+        if self.quantizer is not None and self.quantizer.trained:
+            self._encode(positions)
+
+    def _quantizer_due(self) -> bool:
+        return self.quantizer is not None and not self.quantizer.trained and self._size >= self.quantizer_train_size
+
+    def _train_due(self) -> None:
+        """Hook called without the lock after writes; trains structures that now have enough rows."""
+
+        self._train_once(self._quantizer_due, self.train_quantizer)
+
+    def _train_once(self, due, train) -> None:
+        # Writers arriving while another thread trains carry on; their rows are picked up by that training.
+        if due() and self._training.acquire(blocking=False):
+            try:
+                if due():
+                    train()
+            finally:
+                self._training.release()
+
+    def train_quantizer(self) -> None:
+        """(Re)train the quantizer on a sample of the stored vectors and re-encode every row.
+
+        Only the sample is read under the lock. A copy of the quantizer is
+        trained, and the rows written so far are encoded, outside it; rows
+        written meanwhile are encoded when the new codes are swapped in.
+        """
+
+        with self._training:
+            with self._lock:
+                if self._size == 0:
+                    return
+                start = time.perf_counter()
+                rows = np.arange(self._size)
+                if len(rows) > _QUANTIZER_SAMPLE:
+                    rows = np.sort(np.random.default_rng(0).choice(len(rows), _QUANTIZER_SAMPLE, replace=False))
+                sample = np.array(self._full(rows))
+                # Compaction waits for ``_training``, so the file and its first ``written`` rows stay put.
+                file, written = self._file, self._file.rows
+            quantizer = copy.copy(self.quantizer)
+            quantizer.train(sample)
+            by_row = np.concatenate(
+                [
+                    quantizer.encode(np.asarray(file.read(begin, min(begin + _READ_BLOCK, written))))
+                    for begin in range(0, written, _READ_BLOCK)
+                ]
+            )
+            with self._lock:
+                slots = self._slots[: self._size]
+                codes = np.empty((len(self._norms),) + by_row.shape[1:], dtype=by_row.dtype)
+                done = slots < written
+                codes[: self._size][done] = by_row[slots[done]]
+                self.quantizer, self._codes = quantizer, codes
+                self._encode(np.flatnonzero(~done))
+            logger.info("Trained %s quantizer in %.2fs", quantizer.kind, time.perf_counter() - start)
+
+    def _encode(self, positions: np.ndarray) -> None:
+        capacity = len(self._norms)
+        if self._codes is None or len(self._codes) < capacity:
+            template = self.quantizer.encode(np.empty((0, self._dim), dtype=np.float32))
+            grown = np.empty((capacity,) + template.shape[1:], dtype=template.dtype)
+            if self._codes is not None:
+                grown[: len(self._codes)] = self._codes
+            self._codes = grown
+        for block, vectors in self._full_blocks(positions):
+            self._codes[block] = self.quantizer.encode(vectors)
+
+    def _delete(self, ids: List[str]) -> int:
+        with self._lock:
+            positions = [self._positions[vector_id] for vector_id in ids if vector_id in self._positions]
+            if not positions:
+                return 0
+            keep = np.ones(self._size, dtype=bool)
+            keep[positions] = False
+            # Compact in place of tombstones so every read path stays a dense matrix scan.
+            if self.quantizer is None:
+                self._vectors = self._vectors[: self._size][keep]
+            else:
+                self._slots = self._slots[: self._size][keep]
+            self._norms = self._norms[: self._size][keep]
+            kept = np.flatnonzero(keep).tolist()
+            self._ids = [self._ids[i] for i in kept]
+            self._texts = [self._texts[i] for i in kept]
+            self._positions = {vector_id: i for i, vector_id in enumerate(self._ids)}
+            self._metadata.keep(keep)
+            self._size = len(kept)
+            self._rows_removed(keep)
+            if self._journal is not None:
+                self._journal.delete(list(ids))
+            return len(positions)
+
+    def _rows_removed(self, keep: np.ndarray) -> None:
+        """Hook called under the lock after rows where ``keep`` is False were compacted away."""
+
+        if self._codes is not None:
+            self._codes = self._codes[: len(keep)][keep]
+
+    def _update_metadata(self, ids: List[str], metadatas: List[dict]) -> None:
+        with self._lock:
+            for vector_id, metadata in zip(ids, metadatas):
+                position = self._positions.get(vector_id)
+                if position is not None:
+                    self._metadata.set_row(position, metadata)
+            if self._journal is not None:
+                self._journal.update_metadata(list(ids), list(metadatas))
+
+    async def index_embeddings(
+        self,
+        embeddings: np.ndarray,
+        metadatas: List[dict],
+        ids: List[str],
+        documents: List[str] | None = None,
+    ) -> None:
+        logger.info("Indexing %s embeddings", len(embeddings))
+        await run_in_threadpool(self._add, embeddings, metadatas, ids, documents)
+
+    async def delete(self, ids: List[str]) -> None:
+        logger.info("Deleting %s embeddings", len(ids))
+        await run_in_threadpool(self._delete, ids)
+
+    async def update_metadata(self, ids: List[str], metadatas: List[dict]) -> None:
+        await run_in_threadpool(self._update_metadata, ids, metadatas)
+
+    def _list_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._ids)
+
+    async def list_ids(self) -> List[str]:
+        # The lock can be held by training or a save for a long time; never wait for it on the loop.
+        return await run_in_threadpool(self._list_ids)
+
+    def _fetch(self, ids: List[str]) -> tuple:
+        with self._lock:
+            positions = [self._positions[vector_id] for vector_id in ids if vector_id in self._positions]
+            return (
+                [self._ids[position] for position in positions],
+                np.array(self._full(np.asarray(positions, dtype=np.int64)), dtype=np.float32),
+                [self._metadata.row(position) for position in positions],
+                [self._texts[position] for position in positions],
+            )
+
+    async def fetch(self, ids: List[str]) -> tuple:
+        """``(ids, embeddings, metadatas, documents)`` of the stored vectors among ``ids``.
+
+        Cosine vectors come back normalized, which re-indexing leaves unchanged.
+        """
+
+        return await run_in_threadpool(self._fetch, ids)
+
+    def drop(self) -> None:
+        """Empty the store and delete its saved files; the directory goes only if nothing else is in it."""
+
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            self._vectors = np.empty((0, 0), dtype=np.float32)
+            if self._file is not None:
+                self._file.close()
+            self._file, self._slots = None, np.empty(0, dtype=np.int64)
+            self._norms = np.empty(0, dtype=np.float32)
+            self._codes = None
+            self._size = 0
+            self._ids, self._positions, self._texts = [], {}, []
+            self._metadata = MetadataIndex()
+            if not self.path:
+                return
+            for name in self.FILES:
+                root, extension = os.path.splitext(name)
+                for leftover in (name, f"{root}.tmp{extension}"):
+                    try:
+                        os.remove(os.path.join(self.path, leftover))
+                    except FileNotFoundError:
+                        pass
+            try:
+                os.rmdir(self.path)
+            except OSError:
+                pass
+
+    def _compact(self) -> None:
+        """Release spare capacity, drop dead rows from the row file and persist.
+
+        Deletes already keep the matrix dense; the row file is copied block by
+        block, like :meth:`save` writes it.
+        """
+
+        with self._training, self._lock:
+            if self.quantizer is None:
+                self._vectors = np.array(self._vectors[: self._size])
+            elif self._file is not None and self._file.rows > self._size:
+                fresh = self._file.copy(self._slots[: self._size])
+                self._file.close()
+                self._file, self._slots = fresh, np.arange(self._size)
+            else:
+                self._slots = np.array(self._slots[: self._size])
+            self._norms = np.array(self._norms[: self._size])
+            if self._codes is not None:
+                self._codes = np.array(self._codes[: self._size])
+        self.save()
+
+    async def compact(self) -> None:
+        await run_in_threadpool(self._compact)
+
+    # -- reads -----------------------------------------------------------------------
+
+    def _encoded(self, rows: Optional[np.ndarray]) -> np.ndarray:
+        """What search scores for ``rows`` (all when ``None``): quantizer codes once trained, else vectors."""
+
+        if self._codes is None:
+            return self._full(rows)
+        return self._codes[: self._size] if rows is None else self._codes[rows]
+
+    def _full_blocks(self, rows: np.ndarray) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """``(rows, vectors)`` in blocks, so reading the row file never loads it whole."""
+
+        for start in range(0, len(rows), _READ_BLOCK):
+            block = rows[start : start + _READ_BLOCK]
+            yield block, np.asarray(self._full(block))
+
+    def _full(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Full-precision vectors of ``rows`` (all when ``None``); a view when no gather is needed."""
+
+        if self.quantizer is None:
+            return self._vectors[: self._size] if rows is None else self._vectors[rows]
+        if self._file is None:
+            return np.empty((0, 0), dtype=np.float32)
+        if rows is None:
+            # Without updates or deletes since the last compaction, file rows are store rows.
+            if self._file.rows == self._size:
+                return self._file.read(0, self._size)
+            rows = np.arange(self._size)
+        return self._file.take(self._slots[rows])
+
+    def _dots(self, queries: np.ndarray, encoded: np.ndarray) -> np.ndarray:
+        if self._codes is None:
+            return queries @ encoded.T
+        return self.quantizer.dots(encoded, queries)
+
+    def _to_distances(self, dots: np.ndarray, queries: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        if self.metric == "cosine":
+            return 1.0 - dots
+        norms = self._norms[: self._size] if rows is None else self._norms[rows]
+        return norms[None, :] - 2 * dots + np.einsum("ij,ij->i", queries, queries)[:, None]
+
+    def _distances(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        queries = query[None, :]
+        return self._to_distances(self._dots(queries, self._encoded(rows)), queries, rows)[0]
+
+    def _shortlist(self, top_k: int) -> int:
+        """How many candidates to take from the (possibly approximate) scan before re-ranking."""
+
+        return top_k * self.rerank if self._codes is not None and self.rerank > 0 else top_k
+
+    def _rerank(self, queries: np.ndarray, candidates: List[tuple], top_k: int) -> List[tuple]:
+        """Re-score quantized candidates against the full-precision vectors and keep the best ``top_k``."""
+
+        if self._codes is None or self.rerank <= 0:
+            return [(rows[:top_k], distances[:top_k]) for rows, distances in candidates]
+        results = []
+        for query, (rows, _) in zip(queries, candidates):
+            dots = self._full(rows) @ query
+            exact = self._to_distances(dots[None, :], query[None, :], rows)[0]
+            results.append(select_top_k(rows, exact, top_k))
+        return results
+
+    def _candidates(self, query: np.ndarray, allowed: Optional[np.ndarray]) -> tuple:
+        """Return (row positions, distances) eligible for top-k selection.
+
+        ``allowed`` holds the rows passing the metadata filter (``None``: all);
+        only those rows are scored.
+        """
+
+        if allowed is None:
+            return np.arange(self._size), self._distances(query)
+        return allowed, self._distances(query, allowed)
+
+    def _top_rows(self, query: np.ndarray, top_k: int, filters: dict | None) -> tuple:
+        """Row positions and distances of the ``top_k`` nearest rows, best first. Call under the lock."""
+
+        if self._size == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        allowed = self._metadata.select(filters)
+        candidates = select_top_k(*self._candidates(query, allowed), self._shortlist(top_k))
+        return self._rerank(query[None, :], [candidates], top_k)[0]
+
+    def _chunks(self, rows: np.ndarray, distances: np.ndarray) -> List[RetrievedChunk]:
+        return [
+            RetrievedChunk(
+                id=self._ids[row],
+                text=self._texts[row] or "",
+                score=float(distance),
+                metadata=self._metadata.row(row),
+            )
+            for row, distance in zip(rows.tolist(), distances.tolist())
+        ]
+
+    def _search(self, embedding: np.ndarray, top_k: int, filters: dict | None) -> List[RetrievedChunk]:
+        query = self._prepare(np.reshape(embedding, (1, -1)))[0]
+        with self._lock:
+            return self._chunks(*self._top_rows(query, top_k, filters))
+
+    def _top_rows_many(self, queries: np.ndarray, top_k: int, allowed: Optional[np.ndarray]) -> List[tuple]:
+        """Top-k for a block of queries sharing one filter, via one matrix product per block."""
+
+        rows = np.arange(self._size) if allowed is None else allowed
+        if len(rows) == 0 or top_k <= 0:
+            return [(rows[:0], np.empty(0, dtype=np.float32)) for _ in queries]
+        k = min(top_k, len(rows))
+        encoded = self._encoded(allowed)
+        # Bound the (queries x rows) distance matrix to roughly 16M floats.
+        block = max(1, _BATCH_DISTANCE_ELEMENTS // len(rows))
+        results = []
+        for start in range(0, len(queries), block):
+            chunk = queries[start : start + block]
+            distances = self._to_distances(self._dots(chunk, encoded), chunk, allowed)
+            best = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            best_distances = np.take_along_axis(distances, best, axis=1)
+            order = np.argsort(best_distances, axis=1, kind="stable")
+            best = np.take_along_axis(best, order, axis=1)
+            best_distances = np.take_along_axis(best_distances, order, axis=1)
+            results.extend(zip(rows[best], best_distances))
+        return results
+
+    def _search_many(
+        self, embeddings: np.ndarray, top_ks: List[int], filters: List[dict | None]
+    ) -> List[List[RetrievedChunk]]:
+        queries = self._prepare(embeddings)
+        results: List[List[RetrievedChunk]] = [[] for _ in top_ks]
+        groups: Dict[str, List[int]] = {}
+        for i, where in enumerate(filters):
+            groups.setdefault(json.dumps(where, sort_keys=True), []).append(i)
+        with self._lock:
+            if self._size == 0:
+                return results
+            for members in groups.values():
+                k = max(top_ks[i] for i in members)
+                allowed = self._metadata.select(filters[members[0]])
+                candidates = self._top_rows_many(queries[members], self._shortlist(k), allowed)
+                for i, (rows, distances) in zip(members, self._rerank(queries[members], candidates, k)):
+                    results[i] = self._chunks(rows[: top_ks[i]], distances[: top_ks[i]])
+        return results
+
+    async def query(self, embedding: np.ndarray, top_k: int, filters: dict | None = None) -> List[RetrievedChunk]:
+        logger.info("Querying vector store with top_k=%s", top_k)
+        return await run_in_threadpool(self._search, embedding, top_k, filters)
+
+    async def query_many(
+        self, embeddings: np.ndarray, top_ks: List[int], filters: List[dict | None]
+    ) -> List[List[RetrievedChunk]]:
+        logger.info("Querying vector store with %s queries", len(embeddings))
+        return await run_in_threadpool(self._search_many, embeddings, top_ks, filters)
@@ -0,0 +1,55 @@
+"""PDF text extraction, parallelized across pages on a compute executor.
+
+The module-level functions take a file path or the PDF bytes and import
+nothing from the application, so process-pool workers can run them cheaply.
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+from collections import deque
+from typing import AsyncIterator, Deque, List, Union
+
+try:
+    from pypdf import PdfReader
+except Exception:  # pragma: no cover
+    PdfReader = None
+
+PdfSource = Union[str, bytes]
+
+
+def _reader(source: PdfSource) -> "PdfReader":
+    if PdfReader is None:
+        raise RuntimeError("PDF support not available")
+    return PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def page_count(source: PdfSource) -> int:
+    return len(_reader(source).pages)
+
+
+def extract_pages(source: PdfSource, start: int, stop: int) -> List[str]:
+    """Text of pages ``start`` to ``stop - 1``, each followed by a newline."""
+
+    pages = _reader(source).pages
+    return [(pages[i].extract_text() or "") + "\n" for i in range(start, stop)]
+
+
+async def pdf_pieces(source: PdfSource, executor, pages_per_task: int = 16) -> AsyncIterator[str]:
+    """Yield page texts in order while up to ``executor.max_workers`` page ranges are extracted in parallel."""
+
+    count = await executor.run(page_count, source)
+    pending: Deque[asyncio.Future] = deque()
+    try:
+        for start in range(0, count, pages_per_task):
+            stop = min(start + pages_per_task, count)
+            pending.append(asyncio.ensure_future(executor.run(extract_pages, source, start, stop)))
+            if len(pending) >= executor.max_workers:
+                for text in await pending.popleft():
+                    yield text
+        while pending:
+            for text in await pending.popleft():
+                yield text
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,218 @@
+"""Vector quantizers: compact codes for stored vectors and inner products computed against them.
+
+A quantizer turns float32 rows into codes (``encode``) and scores float32
+queries against codes without decoding the whole matrix (``dots``):
+
+* ``float16`` halves memory and needs no training.
+* ``int8`` is per-dimension scalar quantization to one byte per dimension.
+* ``pq`` (product quantization) splits each vector into sub-vectors of
+  ``subvector_dim`` dimensions and stores one byte per sub-vector: the index
+  of its nearest centroid in a 256-entry codebook. Query scoring is a lookup
+  into a per-query table of sub-vector inner products.
+
+``int8`` and ``pq`` learn their parameters from a sample (``train``).
+"""
+from __future__ import annotations
+
+from typing import Callable, Dict, Optional, Protocol
+
+import numpy as np
+
+_ASSIGN_BLOCK = 65_536
+# Codes are widened to float32 at most this many rows at a time while scoring.
+_SCORE_BLOCK = 65_536
+
+
+def nearest_centroid(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the closest centroid (squared L2) for every row, computed in blocks."""
+
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    assignments = np.empty(len(data), dtype=np.int32)
+    for start in range(0, len(data), _ASSIGN_BLOCK):
+        block = data[start : start + _ASSIGN_BLOCK]
+        assignments[start : start + len(block)] = np.argmin(centroid_norms - 2 * block @ centroids.T, axis=1)
+    return assignments
+
+
+def kmeans(data: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means returning ``k`` float32 centroids."""
+
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=k, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assignments = nearest_centroid(data, centroids)
+        counts = np.bincount(assignments, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, data)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters from random points so every list stays usable.
+        centroids[empty] = data[rng.choice(len(data), size=int(empty.sum()), replace=False)]
+    return centroids
+
+
+def _blockwise(codes: np.ndarray, queries: np.ndarray, score: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+    dots = np.empty((len(queries), len(codes)), dtype=np.float32)
+    for start in range(0, len(codes), _SCORE_BLOCK):
+        block = codes[start : start + _SCORE_BLOCK]
+        dots[:, start : start + len(block)] = score(block)
+    return dots
+
+
+class Quantizer(Protocol):
+    kind: str
+
+    @property
+    def trained(self) -> bool:
+        ...
+
+    def train(self, data: np.ndarray) -> None:
+        ...
+
+    def encode(self, data: np.ndarray) -> np.ndarray:
+        ...
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        ...
+
+    def dots(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """Approximate ``queries @ decode(codes).T`` as a ``(len(queries), len(codes))`` float32 array."""
+        ...
+
+    def state(self) -> Dict[str, np.ndarray]:
+        ...
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        ...
+
+
+class Float16Quantizer:
+    """Half-precision storage; scoring widens blocks back to float32."""
+
+    kind = "float16"
+    trained = True
+
+    def train(self, data: np.ndarray) -> None:
+        pass
+
+    def encode(self, data: np.ndarray) -> np.ndarray:
+        return np.asarray(data, dtype=np.float16)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32)
+
+    def dots(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        return _blockwise(codes, queries, lambda block: queries @ block.astype(np.float32).T)
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        pass
+
+
+class ScalarQuantizer:
+    """One unsigned byte per dimension over the per-dimension range seen in training."""
+
+    kind = "int8"
+
+    def __init__(self) -> None:
+        self._offset: Optional[np.ndarray] = None
+        self._scale: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self._offset is not None
+
+    def train(self, data: np.ndarray) -> None:
+        low, high = data.min(axis=0), data.max(axis=0)
+        self._offset = low.astype(np.float32)
+        self._scale = (np.maximum(high - low, 1e-12) / 255).astype(np.float32)
+
+    def encode(self, data: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint((data - self._offset) / self._scale), 0, 255).astype(np.uint8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return self._offset + codes.astype(np.float32) * self._scale
+
+    def dots(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        # q . (offset + scale * c) = q . offset + (q * scale) . c
+        base = (queries @ self._offset)[:, None]
+        scaled = queries * self._scale
+        return _blockwise(codes, queries, lambda block: base + scaled @ block.astype(np.float32).T)
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"offset": self._offset, "scale": self._scale}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        self._offset, self._scale = state["offset"], state["scale"]
+
+
+class ProductQuantizer:
+    """One byte per ``subvector_dim``-dimensional sub-vector, indexing a k-means codebook."""
+
+    kind = "pq"
+
+    def __init__(self, subvector_dim: int = 8, iterations: int = 20) -> None:
+        self.subvector_dim = subvector_dim
+        self.iterations = iterations
+        self._codebooks: Optional[np.ndarray] = None  # (subvectors, centroids, subvector_dim)
+
+    @property
+    def trained(self) -> bool:
+        return self._codebooks is not None
+
+    def _split(self, data: np.ndarray) -> np.ndarray:
+        if data.shape[1] % self.subvector_dim:
+            raise ValueError(f"Dimension {data.shape[1]} is not a multiple of subvector_dim={self.subvector_dim}")
+        return data.reshape(len(data), data.shape[1] // self.subvector_dim, self.subvector_dim)
+
+    def train(self, data: np.ndarray) -> None:
+        parts = self._split(np.asarray(data, dtype=np.float32))
+        centroids = min(256, len(data))
+        self._codebooks = np.stack(
+            [kmeans(parts[:, j], centroids, self.iterations, seed=j) for j in range(parts.shape[1])]
+        )
+
+    def encode(self, data: np.ndarray) -> np.ndarray:
+        parts = self._split(np.asarray(data, dtype=np.float32))
+        codes = np.empty(parts.shape[:2], dtype=np.uint8)
+        for j, codebook in enumerate(self._codebooks):
+            codes[:, j] = nearest_centroid(parts[:, j], codebook)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = [codebook[codes[:, j]] for j, codebook in enumerate(self._codebooks)]
+        return np.concatenate(parts, axis=1) if parts else np.empty((len(codes), 0), dtype=np.float32)
+
+    def dots(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        # tables[q, j, c]: inner product of query q's j-th sub-vector with centroid c.
+        tables = np.einsum("qjd,jcd->qjc", self._split(queries), self._codebooks)
+
+        def score(block: np.ndarray) -> np.ndarray:
+            dots = np.zeros((len(queries), len(block)), dtype=np.float32)
+            for j in range(block.shape[1]):
+                dots += tables[:, j, block[:, j]]
+            return dots
+
+        return _blockwise(codes, queries, score)
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self._codebooks}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        self._codebooks = state["codebooks"]
+
+
+def get_quantizer(kind: str, *, pq_subvector_dim: int = 8) -> Optional[Quantizer]:
+    """Quantizer for ``kind`` (``none``, ``float16``, ``int8`` or ``pq``); ``None`` keeps float32."""
+
+    if kind == "none":
+        return None
+    if kind == "float16":
+        return Float16Quantizer()
+    if kind == "int8":
+        return ScalarQuantizer()
+    if kind == "pq":
+        return ProductQuantizer(subvector_dim=pq_subvector_dim)
+    raise ValueError(f"Unknown quantization {kind!r}")
@@ -0,0 +1,135 @@
+"""Caching of retrieval results and generated answers for repeated queries.
+
+Retrieval entries are keyed by the normalized query, ``top_k``, filters,
+retrieval mode and the index version; answers by the query, the text of the retrieved context
+and the LLM model. Ingestion, deletion and garbage collection bump the index
+version, so entries computed against an older index are never served again.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+_index_version = 0
+
+
+def index_version() -> int:
+    return _index_version
+
+
+def bump_index_version() -> int:
+    """Invalidate every cached retrieval result computed in this process."""
+
+    global _index_version
+    _index_version += 1
+    return _index_version
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split()).lower()
+
+
+def _digest(*parts: Any) -> str:
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def context_hashes(contexts: Sequence[dict]) -> List[str]:
+    """Content hashes of retrieved contexts.
+
+    Chunk ids are not stable enough: a rolled-back or deleted chunk's id can be
+    reused by a new chunk with different text.
+    """
+
+    return [hashlib.sha256(context["text"].encode("utf-8")).hexdigest() for context in contexts]
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    def snapshot(self, size: int) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class TTLCache:
+    """Size-bounded LRU whose entries also expire ``ttl_seconds`` after being stored."""
+
+    def __init__(
+        self, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats_counters = CacheStats()
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return self.stats_counters.snapshot(len(self._entries))
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= self._clock():
+            del self._entries[key]
+            self.stats_counters.expirations += 1
+            entry = None
+        if entry is None:
+            self.stats_counters.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats_counters.hits += 1
+        return entry[1]
+
+    def put(self, key: str, value: Any) -> None:
+        self._entries[key] = (self._clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats_counters.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class QueryCache:
+    """Two-level cache: retrieval results, then answers generated from them."""
+
+    def __init__(
+        self, *, max_entries: int = 1024, ttl_seconds: float = 300.0, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.retrieval = TTLCache(max_entries, ttl_seconds, clock)
+        self.answers = TTLCache(max_entries, ttl_seconds, clock)
+
+    @staticmethod
+    def retrieval_key(query: str, top_k: int, filters: Optional[dict], mode: str = "dense") -> str:
+        return _digest("retrieval", normalize_query(query), top_k, filters, mode, index_version())
+
+    @staticmethod
+    def answer_key(query: str, contexts: Sequence[dict], model_id: str) -> str:
+        # The raw query: the model sees it verbatim, so case and spacing may change the answer.
+        return _digest("answer", query, context_hashes(contexts), model_id)
+
+    def stats(self) -> dict:
+        return {"retrieval": self.retrieval.stats(), "answers": self.answers.stats()}
+
+    def clear(self) -> None:
+        self.retrieval.clear()
+        self.answers.clear()
@@ -1,14 +1,54 @@
 """RAG orchestration logic."""
 from __future__ import annotations
 
-from typing import List
+import time
+from typing import AsyncIterator, List, Optional, Tuple
 
+from app.core.logging import logger
+from app.core.metrics import span
 from app.services.embeddings import EmbeddingProvider
+from app.services.lexical_index import LexicalIndex
 from app.services.llm import LLMClient
+from app.services.query_cache import QueryCache
+from app.services.reranking import Reranker
 from app.services.vector_store import VectorStore
 from app.services import retrieval
 
 
+async def _contexts(
+    *,
+    query: str,
+    embedding_provider: EmbeddingProvider,
+    vector_store: VectorStore,
+    top_k: int,
+    filters: dict | None,
+    cache: Optional[QueryCache],
+    mode: str,
+    lexical_index: Optional[LexicalIndex],
+    reranker: Optional[Reranker],
+) -> Tuple[List[dict], bool]:
+    """Retrieve context for ``query``, returning it and whether it came from the cache."""
+
+    if cache is not None:
+        retrieval_key = cache.retrieval_key(query, top_k, filters, mode)
+        contexts = cache.retrieval.get(retrieval_key)
+        if contexts is not None:
+            return contexts, True
+    contexts = await retrieval.retrieve(
+        query=query,
+        embedding_provider=embedding_provider,
+        vector_store=vector_store,
+        top_k=top_k,
+        filters=filters,
+        mode=mode,
+        lexical_index=lexical_index,
+        reranker=reranker,
+    )
+    if cache is not None:
+        cache.retrieval.put(retrieval_key, contexts)
+    return contexts, False
+
+
 async def answer_query(
     *,
     query: str,
@@ -17,10 +57,113 @@ async def answer_query(
     llm_client: LLMClient,
     top_k: int = 5,
     filters: dict | None = None,
+    cache: Optional[QueryCache] = None,
+    mode: str = "dense",
+    lexical_index: Optional[LexicalIndex] = None,
+    reranker: Optional[Reranker] = None,
 ) -> dict:
-    contexts = await retrieval.retrieve(
-        query=query, embedding_provider=embedding_provider, vector_store=vector_store, top_k=top_k, filters=filters
+    """Retrieve context and generate an answer.
+
+    With a ``cache``, the result also carries ``cache``: ``"hit"`` when both
+    the retrieval and the answer were served from it, ``"partial"`` when one
+    was, else ``"miss"``.
+    """
+
+    contexts, cached = await _contexts(
+        query=query,
+        embedding_provider=embedding_provider,
+        vector_store=vector_store,
+        top_k=top_k,
+        filters=filters,
+        cache=cache,
+        mode=mode,
+        lexical_index=lexical_index,
+        reranker=reranker,
     )
-    context_texts: List[str] = [ctx["text"] for ctx in contexts]
-    answer = await llm_client.generate_answer(query, context_texts)
-    return {"answer": answer, "context": contexts}
+    hits = int(cached)
+    answer = None
+    if cache is not None:
+        answer_key = cache.answer_key(query, contexts, llm_client.model_id)
+        answer = cache.answers.get(answer_key)
+        hits += answer is not None
+    if answer is None:
+        context_texts: List[str] = [ctx["text"] for ctx in contexts]
+        with span("generate"):
+            answer = await llm_client.generate_answer(query, context_texts)
+        if cache is not None:
+            cache.answers.put(answer_key, answer)
+    result = {"answer": answer, "context": contexts}
+    if cache is not None:
+        result["cache"] = ("miss", "partial", "hit")[hits]
+    return result
+
+
+async def stream_answer(
+    *,
+    query: str,
+    embedding_provider: EmbeddingProvider,
+    vector_store: VectorStore,
+    llm_client: LLMClient,
+    top_k: int = 5,
+    filters: dict | None = None,
+    cache: Optional[QueryCache] = None,
+    mode: str = "dense",
+    lexical_index: Optional[LexicalIndex] = None,
+    reranker: Optional[Reranker] = None,
+) -> AsyncIterator[Tuple[str, object]]:
+    """Yield ``("context", contexts)``, then ``("token", text)`` per answer token, then ``("done", stats)``.
+
+    ``stats`` holds the time to the first token and the token rate. A cached
+    answer is sent as a single token; a streamed one is cached only once it
+    has completed. Closing the generator stops generation.
+    """
+
+    start = time.perf_counter()
+    contexts, _ = await _contexts(
+        query=query,
+        embedding_provider=embedding_provider,
+        vector_store=vector_store,
+        top_k=top_k,
+        filters=filters,
+        cache=cache,
+        mode=mode,
+        lexical_index=lexical_index,
+        reranker=reranker,
+    )
+    yield "context", contexts
+
+    answer = None
+    if cache is not None:
+        answer_key = cache.answer_key(query, contexts, llm_client.model_id)
+        answer = cache.answers.get(answer_key)
+    tokens = [answer] if answer is not None else []
+    first_token = None
+    completed = False
+    try:
+        if answer is not None:
+            first_token = time.perf_counter()
+            yield "token", answer
+        else:
+            stream = llm_client.stream_answer(query, [ctx["text"] for ctx in contexts])
+            try:
+                async for token in stream:
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    tokens.append(token)
+                    yield "token", token
+            finally:
+                await stream.aclose()
+            if cache is not None:
+                cache.answers.put(answer_key, "".join(tokens))
+        completed = True
+    finally:
+        end = time.perf_counter()
+        generating = end - first_token if first_token is not None else 0.0
+        stats = {
+            "tokens": len(tokens),
+            "ttfb_seconds": round((first_token or end) - start, 6),
+            "tokens_per_second": round(len(tokens) / generating, 1) if generating > 0 else None,
+            "cached": answer is not None,
+        }
+        logger.info("Streamed answer%s: %s", "" if completed else " (cancelled)", stats)
+    yield "done", stats
@@ -0,0 +1,244 @@
+"""Process-wide registry of long-lived services.
+
+Embedding models and vector store clients are expensive to build, so they are
+constructed once at application startup and shared across requests through
+FastAPI dependencies instead of being rebuilt per request.
+"""
+from __future__ import annotations
+
+import inspect
+import os
+import resource
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from app.config import Settings, get_settings
+from app.core.db import async_session_scope
+from app.core.logging import logger
+from app.services.batching import MicroBatchingEmbeddingProvider
+from app.services.embedding_cache import CachedEmbeddingProvider
+from app.services.embeddings import EmbeddingProvider, get_embedding_provider
+from app.services.executors import ComputeExecutor, LoopLagMonitor
+from app.services.lexical_index import LexicalIndex, LexicallyIndexedVectorStore
+from app.services.query_cache import QueryCache
+from app.services.reranking import Reranker, load_cross_encoder
+from app.services.vector_store import VectorStore, get_vector_store
+
+
+def _rss_bytes() -> int:
+    """Resident set size of the current process, best effort."""
+
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def _maybe_await(result) -> None:
+    if inspect.isawaitable(result):
+        await result
+
+
+@dataclass
+class ServiceRegistry:
+    """Holds the shared embedding provider, vector store, indexes, caches, re-ranker and compute executors."""
+
+    embedding_provider: EmbeddingProvider
+    vector_store: VectorStore
+    lexical_index: Optional[LexicalIndex] = None
+    query_cache: Optional[QueryCache] = None
+    reranker: Optional[Reranker] = None
+    extraction_executor: Optional[ComputeExecutor] = None
+    inference_executor: Optional[ComputeExecutor] = None
+    loop_lag: Optional[LoopLagMonitor] = None
+    load_seconds: Dict[str, float] = field(default_factory=dict)
+    memory_bytes: Dict[str, int] = field(default_factory=dict)
+
+    async def warm_up(self) -> None:
+        """Run a throwaway inference so the first request does not pay for lazy initialisation."""
+
+        start = time.perf_counter()
+        await self.embedding_provider.embed_texts(["warm-up"])
+        self.load_seconds["warm_up"] = time.perf_counter() - start
+
+    async def close(self) -> None:
+        for service in (self.embedding_provider, self.vector_store):
+            close = getattr(service, "close", None)
+            if close is not None:
+                await _maybe_await(close())
+        for executor in (self.extraction_executor, self.inference_executor):
+            if executor is not None:
+                executor.close()
+
+
+_registry: Optional[ServiceRegistry] = None
+_lock = threading.Lock()
+
+
+def _timed(name: str, factory, load_seconds: Dict[str, float], memory_bytes: Dict[str, int]):
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    service = factory()
+    load_seconds[name] = time.perf_counter() - start
+    memory_bytes[name] = max(_rss_bytes() - rss_before, 0)
+    return service
+
+
+def build_registry(settings: Settings | None = None) -> ServiceRegistry:
+    """Construct every shared service, recording load time and memory growth."""
+
+    settings = settings or get_settings()
+    load_seconds: Dict[str, float] = {}
+    memory_bytes: Dict[str, int] = {}
+    extraction_executor = ComputeExecutor(
+        "extraction",
+        kind=settings.extraction_executor,
+        max_workers=settings.extraction_workers,
+        max_queue=settings.extraction_max_queue,
+        timeout=settings.extraction_timeout_seconds,
+    )
+    inference_executor = ComputeExecutor(
+        "inference",
+        kind=settings.inference_executor,
+        max_workers=settings.inference_workers,
+        max_queue=settings.inference_max_queue,
+        timeout=settings.inference_timeout_seconds,
+    )
+    embedding_provider = _timed(
+        "embedding_provider", lambda: get_embedding_provider(inference_executor), load_seconds, memory_bytes
+    )
+    if settings.embedding_batch_enabled:
+        embedding_provider = MicroBatchingEmbeddingProvider(
+            embedding_provider,
+            max_batch_size=settings.embedding_batch_max_size,
+            max_wait_ms=settings.embedding_batch_max_wait_ms,
+            max_queue_size=settings.embedding_batch_max_queue,
+            executor=inference_executor,
+        )
+    if settings.embedding_cache_enabled:
+        embedding_provider = CachedEmbeddingProvider(
+            embedding_provider,
+            max_entries=settings.embedding_cache_max_entries,
+            disk_path=settings.embedding_cache_path,
+        )
+    vector_store = _timed("vector_store", get_vector_store, load_seconds, memory_bytes)
+    lexical_index = None
+    if settings.lexical_index_enabled:
+        lexical_index = LexicalIndex()
+        vector_store = LexicallyIndexedVectorStore(vector_store, lexical_index)
+    query_cache = None
+    if settings.query_cache_enabled:
+        query_cache = QueryCache(
+            max_entries=settings.query_cache_max_entries, ttl_seconds=settings.query_cache_ttl_seconds
+        )
+    reranker = None
+    if settings.rerank_enabled:
+        cross_encoder = None
+        if settings.rerank_cross_encoder:
+            cross_encoder = _timed(
+                "cross_encoder", lambda: load_cross_encoder(settings.rerank_cross_encoder), load_seconds, memory_bytes
+            )
+        reranker = Reranker(
+            embedding_provider,
+            vector_store,
+            cross_encoder=cross_encoder,
+            executor=inference_executor,
+            overfetch=settings.rerank_overfetch,
+            batch_size=settings.rerank_batch_size,
+            diversity=settings.mmr_diversity,
+            duplicate_threshold=settings.mmr_duplicate_threshold,
+        )
+    for name, seconds in load_seconds.items():
+        logger.info("Loaded %s in %.3fs (+%.1f MiB RSS)", name, seconds, memory_bytes[name] / 2**20)
+    return ServiceRegistry(
+        embedding_provider=embedding_provider,
+        vector_store=vector_store,
+        lexical_index=lexical_index,
+        query_cache=query_cache,
+        reranker=reranker,
+        extraction_executor=extraction_executor,
+        inference_executor=inference_executor,
+        loop_lag=LoopLagMonitor(interval=settings.loop_lag_interval_ms / 1000),
+        load_seconds=load_seconds,
+        memory_bytes=memory_bytes,
+    )
+
+
+def get_registry() -> ServiceRegistry:
+    """Return the process-wide registry, building it lazily if startup did not run."""
+
+    global _registry
+    if _registry is None:
+        with _lock:
+            if _registry is None:
+                _registry = build_registry()
+    return _registry
+
+
+async def startup() -> ServiceRegistry:
+    """Build the registry at application startup and optionally warm up the models."""
+
+    settings = get_settings()
+    registry = get_registry()
+    if registry.loop_lag is not None:
+        registry.loop_lag.start()
+    if settings.warmup_on_startup:
+        await registry.warm_up()
+        logger.info("Embedding warm-up took %.3fs", registry.load_seconds["warm_up"])
+    if registry.lexical_index is not None:
+        start = time.perf_counter()
+        async with async_session_scope() as session:
+            await registry.lexical_index.load(session)
+        registry.load_seconds["lexical_index"] = time.perf_counter() - start
+    return registry
+
+
+async def shutdown() -> None:
+    """Close shared services and drop the registry."""
+
+    global _registry
+    with _lock:
+        registry, _registry = _registry, None
+    if registry is not None:
+        if registry.loop_lag is not None:
+            await registry.loop_lag.stop()
+        await registry.close()
+
+
+def provide_embedding_provider() -> EmbeddingProvider:
+    """FastAPI dependency returning the shared embedding provider."""
+
+    return get_registry().embedding_provider
+
+
+def provide_vector_store() -> VectorStore:
+    """FastAPI dependency returning the shared vector store."""
+
+    return get_registry().vector_store
+
+
+def provide_query_cache() -> Optional[QueryCache]:
+    """FastAPI dependency returning the shared query cache, or ``None`` when disabled."""
+
+    return get_registry().query_cache
+
+
+def provide_extraction_executor() -> Optional[ComputeExecutor]:
+    """FastAPI dependency returning the shared executor for CPU-heavy document extraction."""
+
+    return get_registry().extraction_executor
+
+
+def provide_lexical_index() -> Optional[LexicalIndex]:
+    """FastAPI dependency returning the shared lexical index, or ``None`` when disabled."""
+
+    return get_registry().lexical_index
+
+
+def provide_reranker() -> Optional[Reranker]:
+    """FastAPI dependency returning the shared re-ranker, or ``None`` when disabled."""
+
+    return get_registry().reranker
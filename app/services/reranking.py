@@ -0,0 +1,170 @@
+"""Second retrieval stage: re-score over-fetched candidates and select a diverse context with MMR.
+
+Retrieval fetches ``top_k * overfetch`` candidates. The re-ranker scores them
+against the query, with an optional cross-encoder or by exact cosine on the
+full-precision vectors, and then keeps ``top_k`` by maximal marginal
+relevance (MMR). MMR trades relevance against similarity to the chunks
+already chosen, and it drops candidates that nearly duplicate one of them. The
+context passed to the LLM is therefore small and has little overlap, without
+raising ``top_k``.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, List, Optional
+
+import numpy as np
+
+from app.core.logging import logger
+from app.core.metrics import span
+from app.services.embeddings import EmbeddingProvider, as_matrix
+from app.services.executors import ComputeExecutor
+
+if TYPE_CHECKING:
+    from app.services.vector_store import VectorStore
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:  # pragma: no cover - optional dependency
+    CrossEncoder = None
+
+
+def load_cross_encoder(model_name: Optional[str]):
+    """The cross-encoder ``model_name`` or ``None`` when unset or sentence-transformers is missing."""
+
+    if not model_name:
+        return None
+    if CrossEncoder is None:
+        logger.warning("sentence-transformers is not installed; re-ranking without cross-encoder %s", model_name)
+        return None
+    return CrossEncoder(model_name)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def mmr(
+    relevance: np.ndarray,
+    similarity: np.ndarray,
+    top_k: int,
+    diversity: float = 0.3,
+    duplicate_threshold: float = 0.95,
+) -> List[int]:
+    """Indices picked by maximal marginal relevance, best first.
+
+    Each step takes the candidate maximising
+    ``(1 - diversity) * relevance - diversity * max similarity to the picked ones``;
+    ``relevance`` is scaled to [0, 1]. Candidates at least
+    ``duplicate_threshold`` similar to a picked one are dropped, so fewer than
+    ``top_k`` may come back.
+    """
+
+    count = len(relevance)
+    if count == 0 or top_k <= 0:
+        return []
+    spread = relevance.max() - relevance.min()
+    relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones(count)
+    available = np.ones(count, dtype=bool)
+    closest = np.zeros(count)
+    picked: List[int] = []
+    while len(picked) < top_k and available.any():
+        gain = (1 - diversity) * relevance - diversity * closest
+        best = int(np.argmax(np.where(available, gain, -np.inf)))
+        picked.append(best)
+        available[best] = False
+        available &= similarity[best] < duplicate_threshold
+        closest = np.maximum(closest, similarity[best])
+    return picked
+
+
+class Reranker:
+    """Re-rank retrieval candidates and pick a diverse ``top_k``.
+
+    Candidate vectors are fetched from the vector store by id. Texts whose
+    vector cannot be fetched are re-embedded in batches of ``batch_size``.
+    Scores stay lower-is-better:
+    - with a cross-encoder, the negated cross-encoder score;
+    - for dense retrieval, the exact cosine distance;
+    - otherwise the retriever's own score.
+    The cross-encoder runs in batches of ``batch_size`` on ``executor`` when
+    one is given.
+    """
+
+    def __init__(
+        self,
+        embedding_provider: EmbeddingProvider,
+        vector_store: Optional[VectorStore] = None,
+        *,
+        cross_encoder=None,
+        executor: Optional[ComputeExecutor] = None,
+        overfetch: int = 4,
+        batch_size: int = 32,
+        diversity: float = 0.3,
+        duplicate_threshold: float = 0.95,
+    ) -> None:
+        self.embedding_provider = embedding_provider
+        self.vector_store = vector_store
+        self.cross_encoder = cross_encoder
+        self.executor = executor
+        self.overfetch = overfetch
+        self.batch_size = batch_size
+        self.diversity = diversity
+        self.duplicate_threshold = duplicate_threshold
+
+    def candidates(self, top_k: int) -> int:
+        return top_k * max(self.overfetch, 1)
+
+    async def _vectors(self, results: List[dict]) -> np.ndarray:
+        vectors: List[Optional[np.ndarray]] = [None] * len(results)
+        fetch = getattr(self.vector_store, "fetch", None)
+        ids = [result.get("id") for result in results]
+        if fetch is not None and any(ids):
+            found, embeddings, _, _ = await fetch([vector_id for vector_id in ids if vector_id])
+            rows = {vector_id: row for row, vector_id in enumerate(found)}
+            for i, vector_id in enumerate(ids):
+                if vector_id in rows:
+                    vectors[i] = embeddings[rows[vector_id]]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start : start + self.batch_size]
+            embedded = as_matrix(await self.embedding_provider.embed_texts([results[i]["text"] for i in batch]))
+            for i, vector in zip(batch, embedded):
+                vectors[i] = vector
+        return np.stack(vectors).astype(np.float32, copy=False)
+
+    def _cross_encode(self, query: str, texts: List[str]) -> np.ndarray:
+        pairs = [(query, text) for text in texts]
+        return np.asarray(self.cross_encoder.predict(pairs, batch_size=self.batch_size), dtype=np.float32)
+
+    async def rerank(
+        self,
+        query: str,
+        results: List[dict],
+        top_k: int,
+        *,
+        query_embedding: Optional[np.ndarray] = None,
+        exact: bool = True,
+    ) -> List[dict]:
+        """The best ``top_k`` of ``results`` after re-scoring and MMR; ``exact`` re-scores by cosine."""
+
+        if not results:
+            return results
+        with span("rerank_fetch"):
+            vectors = _normalize(await self._vectors(results))
+            if query_embedding is None and exact and self.cross_encoder is None:
+                query_embedding = as_matrix(await self.embedding_provider.embed_texts([query]))[0]
+        with span("rerank"):
+            if self.cross_encoder is not None:
+                texts = [result["text"] for result in results]
+                if self.executor is not None:
+                    scores = -await self.executor.run(self._cross_encode, query, texts)
+                else:
+                    scores = -self._cross_encode(query, texts)
+            elif exact:
+                scores = 1.0 - vectors @ _normalize(np.asarray(query_embedding, dtype=np.float32))
+            else:
+                scores = np.asarray([result["score"] for result in results], dtype=np.float32)
+        with span("mmr"):
+            picked = mmr(-scores, vectors @ vectors.T, top_k, self.diversity, self.duplicate_threshold)
+        return [{**results[i], "score": float(scores[i])} for i in picked]
@@ -1,15 +1,157 @@
 """Retrieval utilities."""
 from __future__ import annotations
 
-from typing import List
+import asyncio
+from typing import Dict, List, Optional, Sequence, Tuple
 
+from app.config import get_settings
+from app.core.metrics import metrics, span
 from app.services.embeddings import EmbeddingProvider
+from app.services.lexical_index import LexicalIndex
+from app.services.reranking import Reranker
 from app.services.vector_store import VectorStore
 
+settings = get_settings()
+
+MODES = ("dense", "lexical", "hybrid")
+
+
+def _fusion_key(result: dict) -> Tuple[Optional[int], str]:
+    return (result.get("metadata") or {}).get("chunk_id"), result["text"]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[dict]], top_k: int, k: Optional[int] = None) -> List[dict]:
+    """Merge ranked result lists by summing ``1 / (k + rank)`` per chunk.
+
+    The fused score is negated so that, like distances, lower is better.
+    """
+
+    k = settings.rrf_k if k is None else k
+    fused: Dict[Tuple[Optional[int], str], float] = {}
+    results: Dict[Tuple[Optional[int], str], dict] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, start=1):
+            key = _fusion_key(result)
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+            results.setdefault(key, result)
+    best = sorted(fused, key=fused.__getitem__, reverse=True)[:top_k]
+    return [{**results[key], "score": -fused[key]} for key in best]
+
+
+async def _lexical(lexical_index: Optional[LexicalIndex], query: str, top_k: int, filters: dict | None) -> List[dict]:
+    if lexical_index is None:
+        raise ValueError("Lexical retrieval is disabled (RAG_LEXICAL_INDEX_ENABLED=false)")
+    with span("lexical"):
+        results = await lexical_index.query(query, top_k, filters)
+    return [result.dict() for result in results]
+
 
 async def retrieve(
-    *, query: str, embedding_provider: EmbeddingProvider, vector_store: VectorStore, top_k: int = 5, filters: dict | None = None
+    *,
+    query: str,
+    embedding_provider: EmbeddingProvider,
+    vector_store: VectorStore,
+    top_k: int = 5,
+    filters: dict | None = None,
+    mode: str = "dense",
+    lexical_index: Optional[LexicalIndex] = None,
+    reranker: Optional[Reranker] = None,
 ) -> List[dict]:
-    query_embedding = (await embedding_provider.embed_texts([query]))[0]
-    results = await vector_store.query(query_embedding, top_k=top_k, filters=filters)
-    return [result.dict() for result in results]
+    """Retrieve the ``top_k`` chunks for ``query``.
+
+    ``dense`` searches the vector store, ``lexical`` the BM25 index, and
+    ``hybrid`` fuses the top ``hybrid_candidates`` of both with reciprocal-rank
+    fusion. Scores are distances, negated BM25 or negated fused scores
+    respectively; lower is always better. With a ``reranker`` the retriever
+    over-fetches and the re-ranker picks the ``top_k``.
+    """
+
+    if mode not in MODES:
+        raise ValueError(f"Unknown retrieval mode {mode!r}")
+    metrics.counter("rag_queries_total", mode=mode).inc()
+    fetch_k = reranker.candidates(top_k) if reranker is not None else top_k
+    query_embedding = None
+
+    async def dense(candidates: int) -> List[dict]:
+        nonlocal query_embedding
+        with span("embed"):
+            query_embedding = (await embedding_provider.embed_texts([query]))[0]
+        with span("search"):
+            results = await vector_store.query(query_embedding, top_k=candidates, filters=filters)
+        return [result.dict() for result in results]
+
+    if mode == "lexical":
+        results = await _lexical(lexical_index, query, fetch_k, filters)
+    elif mode == "dense":
+        results = await dense(fetch_k)
+    else:
+        candidates = max(fetch_k, settings.hybrid_candidates)
+        rankings = await asyncio.gather(dense(candidates), _lexical(lexical_index, query, candidates, filters))
+        with span("fuse"):
+            results = reciprocal_rank_fusion(rankings, fetch_k)
+    if reranker is None:
+        return results
+    return await reranker.rerank(query, results, top_k, query_embedding=query_embedding, exact=mode == "dense")
+
+
+async def retrieve_many(
+    *,
+    queries: List[str],
+    embedding_provider: EmbeddingProvider,
+    vector_store: VectorStore,
+    top_ks: List[int],
+    filters: List[dict | None],
+    modes: Optional[List[str]] = None,
+    lexical_index: Optional[LexicalIndex] = None,
+    reranker: Optional[Reranker] = None,
+) -> List[List[dict]]:
+    """Retrieve for many queries; dense ones share one embedding batch and one vector store call.
+
+    With a ``reranker`` each query over-fetches and is re-ranked on its own.
+    """
+
+    if not queries:
+        return []
+    modes = modes or ["dense"] * len(queries)
+    results: List[List[dict]] = [[] for _ in queries]
+    dense = [i for i, mode in enumerate(modes) if mode == "dense"]
+    others = [i for i, mode in enumerate(modes) if mode != "dense"]
+    if dense:
+        metrics.counter("rag_queries_total", mode="dense").inc(len(dense))
+        with span("embed"):
+            query_embeddings = await embedding_provider.embed_texts([queries[i] for i in dense])
+        with span("search"):
+            fetch_ks = [reranker.candidates(top_ks[i]) if reranker is not None else top_ks[i] for i in dense]
+            batched = await vector_store.query_many(
+                query_embeddings, top_ks=fetch_ks, filters=[filters[i] for i in dense]
+            )
+        for i, per_query in zip(dense, batched):
+            results[i] = [result.dict() for result in per_query]
+        if reranker is not None:
+            reranked = await asyncio.gather(
+                *(
+                    reranker.rerank(queries[i], results[i], top_ks[i], query_embedding=query_embedding)
+                    for i, query_embedding in zip(dense, query_embeddings)
+                )
+            )
+            for i, per_query in zip(dense, reranked):
+                results[i] = per_query
+    if others:
+        retrieved = await asyncio.gather(
+            *(
+                retrieve(
+                    query=queries[i],
+                    embedding_provider=embedding_provider,
+                    vector_store=vector_store,
+                    top_k=top_ks[i],
+                    filters=filters[i],
+                    mode=modes[i],
+                    lexical_index=lexical_index,
+                    reranker=reranker,
+                )
+                for i in others
+            )
+        )
+        for i, per_query in zip(others, retrieved):
+            results[i] = per_query
+    return results
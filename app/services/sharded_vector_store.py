@@ -0,0 +1,300 @@
+"""Vector store that partitions vectors across local shards and scatter-gathers queries."""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import inspect
+import itertools
+import zlib
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.core.logging import logger
+from app.core.models import RetrievedChunk
+
+if TYPE_CHECKING:
+    from app.services.vector_store import VectorStore
+
+# Metadata fields holding lists; a vector is placed by the first element, so a filter
+# on one element may match vectors on any shard.
+MULTI_VALUED = ("tags",)
+
+
+def shard_value(metadata: dict, key: str):
+    # Every backend returns list fields as lists. Chroma collections from before
+    # per-tag keys hold comma-joined strings and must be re-ingested (see README).
+    value = metadata.get(key)
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    return value
+
+
+def shard_for(value, shards: int) -> int:
+    """Stable shard of a metadata value: CRC32 of its string form, so placement survives restarts."""
+
+    return zlib.crc32(str(value).encode("utf-8")) % shards
+
+
+def _merge(rankings: Iterable[List[RetrievedChunk]], top_k: int) -> List[RetrievedChunk]:
+    """The ``top_k`` lowest scores across per-shard rankings that are each sorted best first.
+
+    A vector being moved by :meth:`ShardedVectorStore.rebalance` can briefly be
+    on two shards, so repeats of a chunk are dropped.
+    """
+
+    merged, seen = [], set()
+    for chunk in heapq.merge(*rankings, key=lambda chunk: chunk.score):
+        key = (chunk.metadata.get("chunk_id"), chunk.text)
+        if key[0] is not None and key in seen:
+            continue
+        seen.add(key)
+        merged.append(chunk)
+        if len(merged) == top_k:
+            break
+    return merged
+
+
+class ShardedVectorStore:
+    """Partition vectors over ``shards`` by a hash of the metadata field ``key``.
+
+    Inserts go to the shard owning their key value, and deletes and metadata
+    updates go to the shard that holds each id. Queries run on every shard
+    concurrently and the per-shard top-k lists are merged with a heap. Each
+    shard searches on its own worker thread, and NumPy releases the GIL during
+    the scan, so shards search on separate cores. A filter that pins ``key`` to
+    one value, or a ``$in`` list of values, queries only the matching shards.
+
+    ``retired`` shards are left over from a different shard count. They are
+    still queried, and :meth:`rebalance` moves their vectors onto ``shards``
+    and drops them. An id → shard map is built from the shards on first use
+    and kept in memory.
+    """
+
+    def __init__(
+        self, shards: Sequence[VectorStore], key: str = "document_id", retired: Sequence[VectorStore] = ()
+    ) -> None:
+        if not shards:
+            raise ValueError("At least one shard is required")
+        self.shards = list(shards)
+        self.retired = list(retired)
+        self.key = key
+        self._owners: Optional[Dict[str, int]] = None
+        self._writes = asyncio.Lock()
+
+    @property
+    def _stores(self) -> List[VectorStore]:
+        return self.shards + self.retired
+
+    def _target(self, metadata: dict) -> int:
+        return shard_for(shard_value(metadata, self.key), len(self.shards))
+
+    async def _owner_map(self) -> Dict[str, int]:
+        if self._owners is None:
+            listed = await asyncio.gather(*(store.list_ids() for store in self._stores))
+            self._owners = {vector_id: index for index, ids in enumerate(listed) for vector_id in ids}
+        return self._owners
+
+    def _routes(self, filters: dict | None) -> Optional[Set[int]]:
+        """The shards that can hold matches for ``filters``, or ``None`` for all of them."""
+
+        if self.retired or not filters or self.key in MULTI_VALUED or self.key not in filters:
+            return None
+        condition = filters[self.key]
+        if isinstance(condition, dict):
+            if set(condition) == {"$eq"}:
+                values = [condition["$eq"]]
+            elif set(condition) == {"$in"}:
+                values = list(condition["$in"])
+            else:
+                return None
+        else:
+            values = [condition]
+        return {shard_for(value, len(self.shards)) for value in values}
+
+    # -- writes ----------------------------------------------------------------------
+
+    async def _insert(self, embeddings: np.ndarray, metadatas: List[dict], ids: List[str], documents) -> None:
+        groups: Dict[int, List[int]] = {}
+        for row, metadata in enumerate(metadatas):
+            groups.setdefault(self._target(metadata), []).append(row)
+        await asyncio.gather(
+            *(
+                self.shards[index].index_embeddings(
+                    embeddings[rows],
+                    [metadatas[row] for row in rows],
+                    [ids[row] for row in rows],
+                    [documents[row] for row in rows] if documents is not None else None,
+                )
+                for index, rows in groups.items()
+            )
+        )
+        owners = await self._owner_map()
+        for index, rows in groups.items():
+            for row in rows:
+                owners[ids[row]] = index
+
+    async def _remove(self, ids: Iterable[str]) -> None:
+        owners = await self._owner_map()
+        groups: Dict[int, List[str]] = {}
+        for vector_id in ids:
+            index = owners.pop(vector_id, None)
+            if index is not None:
+                groups.setdefault(index, []).append(vector_id)
+        await asyncio.gather(*(self._stores[index].delete(group) for index, group in groups.items()))
+
+    async def _move(self, index: int, ids: List[str]) -> int:
+        """Re-insert the vectors ``ids`` held by store ``index`` on their owning shard; returns how many moved."""
+
+        found, embeddings, metadatas, documents = await self._stores[index].fetch(ids)
+        moving = [row for row, metadata in enumerate(metadatas) if self._target(metadata) != index]
+        if not moving:
+            return 0
+        moved = [found[row] for row in moving]
+        # Insert before deleting so the vectors stay searchable throughout.
+        await self._insert(
+            embeddings[np.asarray(moving)],
+            [metadatas[row] for row in moving],
+            moved,
+            [documents[row] for row in moving],
+        )
+        await self._stores[index].delete(moved)
+        return len(moving)
+
+    async def index_embeddings(
+        self,
+        embeddings: np.ndarray,
+        metadatas: List[dict],
+        ids: List[str],
+        documents: List[str] | None = None,
+    ) -> None:
+        async with self._writes:
+            owners = await self._owner_map()
+            # An id re-indexed under a different key value changes shard; drop its old copy.
+            stale = [
+                vector_id
+                for vector_id, metadata in zip(ids, metadatas)
+                if vector_id in owners and owners[vector_id] != self._target(metadata)
+            ]
+            if stale:
+                await self._remove(stale)
+            await self._insert(embeddings, metadatas, ids, documents)
+
+    async def delete(self, ids: List[str]) -> None:
+        async with self._writes:
+            await self._remove(ids)
+
+    async def update_metadata(self, ids: List[str], metadatas: List[dict]) -> None:
+        async with self._writes:
+            owners = await self._owner_map()
+            groups: Dict[int, tuple] = {}
+            for vector_id, metadata in zip(ids, metadatas):
+                index = owners.get(vector_id)
+                if index is not None:
+                    group = groups.setdefault(index, ([], []))
+                    group[0].append(vector_id)
+                    group[1].append(metadata)
+            await asyncio.gather(
+                *(self._stores[index].update_metadata(*group) for index, group in groups.items())
+            )
+            for index, (group_ids, group) in groups.items():
+                if any(self._target(metadata) != index for metadata in group):
+                    await self._move(index, group_ids)
+
+    async def rebalance(self, batch_size: int = 1000) -> dict:
+        """Move every vector to the shard its key now hashes to, then drop the retired shards."""
+
+        async with self._writes:
+            owners = await self._owner_map()
+            held: Dict[int, List[str]] = {}
+            for vector_id, owner in owners.items():
+                held.setdefault(owner, []).append(vector_id)
+            moved = 0
+            for index, ids in sorted(held.items()):
+                for start in range(0, len(ids), batch_size):
+                    moved += await self._move(index, ids[start : start + batch_size])
+            # Persist the moved vectors before deleting the only other copy of them.
+            await asyncio.gather(*(run_in_threadpool(store.save) for store in self.shards if hasattr(store, "save")))
+            for store in self.retired:
+                store.drop()
+            self.retired = []
+            sizes = [0] * len(self.shards)
+            for owner in owners.values():
+                sizes[owner] += 1
+        logger.info("Rebalanced %s vectors across %s shards", moved, len(self.shards))
+        return {"moved": moved, "shard_sizes": sizes}
+
+    async def list_ids(self) -> List[str]:
+        listed = await asyncio.gather(*(store.list_ids() for store in self._stores))
+        return list(itertools.chain.from_iterable(listed))
+
+    async def fetch(self, ids: List[str]) -> tuple:
+        owners = await self._owner_map()
+        groups: Dict[int, List[str]] = {}
+        for vector_id in ids:
+            if vector_id in owners:
+                groups.setdefault(owners[vector_id], []).append(vector_id)
+        parts = await asyncio.gather(*(self._stores[index].fetch(group) for index, group in groups.items()))
+        parts = [part for part in parts if part[0]]
+        if not parts:
+            return [], np.empty((0, 0), dtype=np.float32), [], []
+        return (
+            [vector_id for part in parts for vector_id in part[0]],
+            np.concatenate([part[1] for part in parts]),
+            [metadata for part in parts for metadata in part[2]],
+            [document for part in parts for document in part[3]],
+        )
+
+    async def compact(self) -> None:
+        await asyncio.gather(*(store.compact() for store in self._stores))
+
+    def save(self) -> None:
+        """Snapshot every shard that saves explicitly (NumPy and IVF; Chroma persists each write)."""
+
+        for store in self._stores:
+            save = getattr(store, "save", None)
+            if save is not None:
+                save()
+
+    async def close(self) -> None:
+        for store in self._stores:
+            close = getattr(store, "close", None)
+            if close is not None:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+
+    # -- reads -----------------------------------------------------------------------
+
+    def _targets(self, filters: dict | None) -> List[int]:
+        routes = self._routes(filters)
+        return list(range(len(self._stores))) if routes is None else sorted(routes)
+
+    async def query(self, embedding: np.ndarray, top_k: int, filters: dict | None = None) -> List[RetrievedChunk]:
+        targets = self._targets(filters)
+        rankings = await asyncio.gather(
+            *(self._stores[index].query(embedding, top_k, filters) for index in targets)
+        )
+        return _merge(rankings, top_k)
+
+    async def query_many(
+        self, embeddings: np.ndarray, top_ks: List[int], filters: List[dict | None]
+    ) -> List[List[RetrievedChunk]]:
+        members: Dict[int, List[int]] = {}
+        for i, where in enumerate(filters):
+            for index in self._targets(where):
+                members.setdefault(index, []).append(i)
+        answers = await asyncio.gather(
+            *(
+                self._stores[index].query_many(
+                    embeddings[rows], [top_ks[i] for i in rows], [filters[i] for i in rows]
+                )
+                for index, rows in members.items()
+            )
+        )
+        rankings: List[List[List[RetrievedChunk]]] = [[] for _ in top_ks]
+        for rows, per_query in zip(members.values(), answers):
+            for i, ranking in zip(rows, per_query):
+                rankings[i].append(ranking)
+        return [_merge(ranking, top_k) for ranking, top_k in zip(rankings, top_ks)]
@@ -1,8 +1,12 @@
-"""Vector store interface and Chroma implementation."""
+"""Vector store interface, Chroma implementation and backend selection."""
 from __future__ import annotations
 
-from typing import List, Protocol
+import json
+import os
+import re
+from typing import Dict, List, Optional, Protocol, Tuple
 
+import numpy as np
 from chromadb import Client
 from chromadb.config import Settings as ChromaSettings
 from starlette.concurrency import run_in_threadpool
@@ -10,42 +14,339 @@ from starlette.concurrency import run_in_threadpool
 from app.config import get_settings
 from app.core.logging import logger
 from app.core.models import RetrievedChunk
+from app.services.embeddings import as_matrix
+from app.services.ivf_vector_store import IVFVectorStore
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.quantization import get_quantizer
+from app.services.sharded_vector_store import ShardedVectorStore
 
 settings = get_settings()
 
+COLLECTION = "rag-collection"
+
 
 class VectorStore(Protocol):
-    async def index_embeddings(self, embeddings: List[List[float]], metadatas: List[dict], ids: List[str]) -> None:
+    """Embeddings are ``(n, dim)`` float32 matrices and single queries 1-D float32 vectors."""
+
+    async def index_embeddings(
+        self,
+        embeddings: np.ndarray,
+        metadatas: List[dict],
+        ids: List[str],
+        documents: List[str] | None = None,
+    ) -> None:
+        ...
+
+    async def delete(self, ids: List[str]) -> None:
+        ...
+
+    async def update_metadata(self, ids: List[str], metadatas: List[dict]) -> None:
+        """Replace the metadata of existing vectors without re-embedding them."""
+        ...
+
+    async def list_ids(self) -> List[str]:
+        ...
+
+    async def compact(self) -> None:
+        """Rebuild the index to reclaim space left by deletions."""
         ...
 
-    async def query(self, embedding: List[float], top_k: int, filters: dict | None = None) -> List[RetrievedChunk]:
+    async def query(self, embedding: np.ndarray, top_k: int, filters: dict | None = None) -> List[RetrievedChunk]:
         ...
 
+    async def query_many(
+        self, embeddings: np.ndarray, top_ks: List[int], filters: List[dict | None]
+    ) -> List[List[RetrievedChunk]]:
+        """Answer several queries at once; results are returned in input order."""
+        ...
+
+
+# Metadata fields holding lists; Chroma stores them as one ``"<field>:<item>": True`` key per item.
+_LIST_FIELDS = ("tags",)
+
+
+def _flatten_metadata(metadata: dict) -> Optional[dict]:
+    """Chroma only accepts scalar metadata values, so list items become boolean keys and ``None`` is dropped.
+
+    Chroma rejects empty metadata, so nothing left gives ``None``.
+    """
+
+    flat = {}
+    for key, value in metadata.items():
+        if isinstance(value, list):
+            flat.update((f"{key}:{item}", True) for item in value)
+        elif value is not None:
+            flat[key] = value
+    return flat or None
+
+
+def _unflatten_metadata(metadata: Optional[dict]) -> dict:
+    """Inverse of :func:`_flatten_metadata`; items come back sorted."""
+
+    result: dict = {}
+    for key, value in (metadata or {}).items():
+        field, separator, item = key.partition(":")
+        if separator and value is True and field in _LIST_FIELDS:
+            result.setdefault(field, []).append(item)
+        else:
+            result[key] = value
+    return result
+
+
+def _list_clause(key: str, condition) -> dict:
+    clauses = []
+    for op, value in (condition.items() if isinstance(condition, dict) else [("$eq", condition)]):
+        if op == "$eq":
+            value = [value]
+        elif op != "$in":
+            raise ValueError(f"The Chroma backend can only filter {key!r} with $eq or $in, not {op!r}")
+        items = [{f"{key}:{item}": True} for item in value]
+        if not items:  # matches nothing, like an empty $in elsewhere
+            items = [{f"{key}:": True}]
+        clauses.append(items[0] if len(items) == 1 else {"$or": items})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _chroma_where(filters: Optional[dict]) -> dict:
+    """Rewrite a ``where`` filter for Chroma.
+
+    Conditions on list fields become conditions on their per-item keys, and
+    several top-level keys become an explicit ``$and``, which Chroma requires.
+    """
+
+    if not filters:
+        return {}
+    clauses = []
+    for key, condition in filters.items():
+        if key in ("$and", "$or"):
+            clauses.append({key: [_chroma_where(clause) for clause in condition]})
+        elif key in _LIST_FIELDS:
+            clauses.append(_list_clause(key, condition))
+        else:
+            clauses.append({key: condition})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _chroma_settings() -> ChromaSettings:
+    if settings.chroma_persist_directory:
+        return ChromaSettings(persist_directory=settings.chroma_persist_directory, is_persistent=True)
+    return ChromaSettings()
+
 
 class ChromaVectorStore:
     """Wrapper around Chroma DB."""
 
-    def __init__(self, collection_name: str = "rag-collection") -> None:
-        client_settings = ChromaSettings(persist_directory=settings.chroma_persist_directory)
-        self.client = Client(settings=client_settings)
+    def __init__(self, collection_name: str = COLLECTION) -> None:
+        self.client = Client(settings=_chroma_settings())
+        self._recover(collection_name)
         self.collection = self.client.get_or_create_collection(name=collection_name, embedding_function=None)
 
-    async def index_embeddings(self, embeddings: List[List[float]], metadatas: List[dict], ids: List[str]) -> None:
+    def _recover(self, name: str) -> None:
+        """Finish or roll back a compaction of ``name`` that was interrupted.
+
+        ``<name>-old`` is the live collection renamed aside: once ``<name>`` exists
+        again the copy finished and it is dropped, otherwise it is renamed back and
+        the partial ``<name>-compact`` copy is discarded.
+        """
+
+        names = {collection.name for collection in self.client.list_collections()}
+        if f"{name}-old" in names:
+            if name in names:
+                self.client.delete_collection(f"{name}-old")
+                logger.warning("Dropped the pre-compaction copy of Chroma collection %s", name)
+                return
+            self.client.get_collection(f"{name}-old", embedding_function=None).modify(name=name)
+            logger.warning("Restored Chroma collection %s after an interrupted compaction", name)
+        if f"{name}-compact" in names:
+            self.client.delete_collection(f"{name}-compact")
+
+    async def index_embeddings(
+        self,
+        embeddings: np.ndarray,
+        metadatas: List[dict],
+        ids: List[str],
+        documents: List[str] | None = None,
+    ) -> None:
         logger.info("Indexing %s embeddings", len(embeddings))
-        await run_in_threadpool(self.collection.add, embeddings=embeddings, metadatas=metadatas, ids=ids)
+        await run_in_threadpool(
+            self.collection.add,
+            # Chroma validates nested lists; this is the one place they are materialized.
+            embeddings=as_matrix(embeddings).tolist(),
+            metadatas=[_flatten_metadata(metadata) for metadata in metadatas],
+            ids=ids,
+            documents=documents,
+        )
+
+    async def delete(self, ids: List[str]) -> None:
+        logger.info("Deleting %s embeddings", len(ids))
+        if ids:
+            await run_in_threadpool(self.collection.delete, ids=ids)
+
+    async def update_metadata(self, ids: List[str], metadatas: List[dict]) -> None:
+        if ids:
+            await run_in_threadpool(
+                self.collection.update, ids=ids, metadatas=[_flatten_metadata(metadata) for metadata in metadatas]
+            )
+
+    async def list_ids(self) -> List[str]:
+        result = await run_in_threadpool(self.collection.get, include=[])
+        return list(result["ids"])
+
+    async def fetch(self, ids: List[str]) -> tuple:
+        """``(ids, embeddings, metadatas, documents)`` of the stored vectors among ``ids``."""
+
+        if not ids:
+            return [], np.empty((0, 0), dtype=np.float32), [], []
+        result = await run_in_threadpool(
+            self.collection.get, ids=ids, include=["embeddings", "metadatas", "documents"]
+        )
+        embeddings = as_matrix(result["embeddings"]) if result["ids"] else np.empty((0, 0), dtype=np.float32)
+        metadatas = [_unflatten_metadata(metadata) for metadata in result["metadatas"]]
+        return list(result["ids"]), embeddings, metadatas, list(result["documents"])
+
+    def drop(self) -> None:
+        """Delete the collection."""
+
+        self.client.delete_collection(self.collection.name)
 
-    async def query(self, embedding: List[float], top_k: int, filters: dict | None = None) -> List[RetrievedChunk]:
+    def _compact(self, page_size: int = 1000) -> None:
+        # Deleted entries stay in Chroma's HNSW graph; copying the live ones into a
+        # fresh collection drops them. The live collection is renamed aside first,
+        # so a crash at any point leaves a complete copy that _recover finds.
+        name = self.collection.name
+        old = self.collection
+        old.modify(name=f"{name}-old")
+        fresh = self.client.create_collection(name=f"{name}-compact", embedding_function=None)
+        offset = 0
+        while True:
+            page = old.get(limit=page_size, offset=offset, include=["embeddings", "metadatas", "documents"])
+            if not page["ids"]:
+                break
+            fresh.add(
+                ids=page["ids"],
+                embeddings=page["embeddings"],
+                metadatas=page["metadatas"],
+                documents=page["documents"],
+            )
+            offset += len(page["ids"])
+        fresh.modify(name=name)
+        self.collection = fresh
+        self.client.delete_collection(old.name)
+        logger.info("Compacted Chroma collection %s to %s vectors", name, offset)
+
+    async def compact(self) -> None:
+        await run_in_threadpool(self._compact)
+
+    async def query(self, embedding: np.ndarray, top_k: int, filters: dict | None = None) -> List[RetrievedChunk]:
         logger.info("Querying vector store with top_k=%s", top_k)
         result = await run_in_threadpool(
-            self.collection.query, query_embeddings=[embedding], n_results=top_k, where=filters or {}
+            self.collection.query,
+            query_embeddings=as_matrix([embedding]).tolist(),
+            n_results=top_k,
+            where=_chroma_where(filters),
+        )
+        return _chunks_from_result(result, 0)
+
+    async def query_many(
+        self, embeddings: np.ndarray, top_ks: List[int], filters: List[dict | None]
+    ) -> List[List[RetrievedChunk]]:
+        logger.info("Querying vector store with %s queries", len(embeddings))
+        matrix = as_matrix(embeddings)
+        results: List[List[RetrievedChunk]] = [[] for _ in matrix]
+        groups: Dict[str, List[int]] = {}
+        for i, where in enumerate(filters):
+            groups.setdefault(json.dumps(where, sort_keys=True), []).append(i)
+        # One Chroma call per distinct filter, over-fetching to the largest top_k in the group.
+        for members in groups.values():
+            result = await run_in_threadpool(
+                self.collection.query,
+                query_embeddings=matrix[members].tolist(),
+                n_results=max(top_ks[i] for i in members),
+                where=_chroma_where(filters[members[0]]),
+            )
+            for position, i in enumerate(members):
+                results[i] = _chunks_from_result(result, position)[: top_ks[i]]
+        return results
+
+
+def _chunks_from_result(result: dict, position: int) -> List[RetrievedChunk]:
+    contexts = []
+    texts = (result.get("documents") or [[]])[position]
+    ids = (result.get("ids") or [[None] * len(texts)])[position]
+    for vector_id, text, score, metadata in zip(
+        ids,
+        texts,
+        (result.get("distances") or [[]])[position],
+        (result.get("metadatas") or [[]])[position],
+    ):
+        metadata = _unflatten_metadata(metadata)
+        contexts.append(RetrievedChunk(id=vector_id, text=text or "", score=float(score), metadata=metadata))
+    return contexts
+
+
+def _build_store(shard: Optional[int] = None) -> VectorStore:
+    """The configured backend; with ``shard``, that shard's directory or collection."""
+
+    if settings.vector_store == "chroma":
+        return ChromaVectorStore(COLLECTION if shard is None else f"{COLLECTION}-{shard}")
+    path = settings.numpy_store_path
+    if path and shard is not None:
+        path = os.path.join(path, f"shard-{shard}")
+    quantization = dict(
+        quantizer=get_quantizer(settings.vector_quantization, pq_subvector_dim=settings.pq_subvector_dim),
+        rerank=settings.quantization_rerank,
+        quantizer_train_size=settings.quantization_train_size,
+    )
+    if settings.vector_store == "ivf":
+        return IVFVectorStore(
+            path=path,
+            metric=settings.vector_metric,
+            nlist=settings.ivf_nlist,
+            nprobe=settings.ivf_nprobe,
+            train_size=settings.ivf_train_size,
+            **quantization,
         )
-        contexts = []
-        for text, score, metadata in zip(
-            result.get("documents", [[]])[0], result.get("distances", [[]])[0], result.get("metadatas", [[]])[0]
-        ):
-            contexts.append(RetrievedChunk(text=text, score=float(score), metadata=metadata))
-        return contexts
+    return NumpyVectorStore(path=path, metric=settings.vector_metric, **quantization)
+
+
+def _saved_shards() -> Tuple[List[int], bool]:
+    """Shard numbers already saved for the configured backend, and whether an unsharded index exists."""
+
+    if settings.vector_store == "chroma":
+        if not settings.chroma_persist_directory:
+            return [], False
+        # A collection caught mid-compaction is renamed back when its store is built.
+        names = [
+            collection.name.removesuffix("-old")
+            for collection in Client(settings=_chroma_settings()).list_collections()
+        ]
+        pattern, unsharded = re.compile(rf"{re.escape(COLLECTION)}-(\d+)"), COLLECTION in names
+    else:
+        path = settings.numpy_store_path
+        if not path or not os.path.isdir(path):
+            return [], False
+        names = os.listdir(path)
+        # A store killed before its first snapshot has only a journal.
+        journal = os.path.join(path, "journal.jsonl")
+        unsharded = "store.json" in names or (os.path.exists(journal) and os.path.getsize(journal) > 0)
+        pattern = re.compile(r"shard-(\d+)")
+    return sorted(int(match.group(1)) for match in map(pattern.fullmatch, names) if match), unsharded
 
 
 def get_vector_store() -> VectorStore:
-    return ChromaVectorStore()
+    """The configured backend, sharded when ``RAG_VECTOR_SHARDS`` > 1 or shards were saved before.
+
+    Saved shards beyond the configured count, and a saved unsharded index, are
+    kept as retired shards until ``POST /admin/rebalance`` moves their vectors.
+    """
+
+    saved, unsharded = _saved_shards()
+    if settings.vector_shards <= 1 and not saved:
+        return _build_store()
+    shards = [_build_store(i) for i in range(max(settings.vector_shards, 1))]
+    retired = [_build_store(i) for i in saved if i >= len(shards)]
+    if unsharded:
+        retired.append(_build_store())
+    if retired:
+        logger.warning("%s retired vector store shards are waiting to be rebalanced", len(retired))
+    return ShardedVectorStore(shards, key=settings.vector_shard_key, retired=retired)
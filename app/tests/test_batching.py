@@ -0,0 +1,36 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.batching import MicroBatchingEmbeddingProvider
+from app.services.embeddings import LocalEmbeddingProvider
+
+
+class RecordingProvider:
+    def __init__(self) -> None:
+        self.inner = LocalEmbeddingProvider()
+        self.model_id = self.inner.model_id
+        self.batches = []
+
+    def encode(self, texts):
+        self.batches.append(list(texts))
+        return self.inner.encode(texts)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_merged_and_scattered_in_order():
+    provider = RecordingProvider()
+    batcher = MicroBatchingEmbeddingProvider(provider, max_batch_size=8, max_wait_ms=50)
+
+    queries = [[f"query {i}"] for i in range(6)] + [["a", "b", "c"]]
+    results = await asyncio.gather(*(batcher.embed_texts(texts) for texts in queries))
+
+    for texts, vectors in zip(queries, results):
+        np.testing.assert_array_equal(vectors, provider.inner.encode(texts))
+    assert all(len(batch) <= 8 for batch in provider.batches)
+    assert len(provider.batches) < len(queries)
+    stats = batcher.stats()
+    assert stats["requests"] == len(queries)
+    assert stats["texts"] == 9
+    await batcher.close()
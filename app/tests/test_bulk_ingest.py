@@ -0,0 +1,74 @@
+import argparse
+
+import pytest
+from sqlalchemy import select
+
+from app.core.db import Base, SessionLocal, engine
+from app.persistence import models
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.vector_store import settings as vector_settings
+from scripts import bulk_ingest
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+class InterruptedStore(NumpyVectorStore):
+    """Indexes ``batches`` batches, then is interrupted right after indexing the next one."""
+
+    def __init__(self, path, batches):
+        super().__init__(path=path)
+        self.batches = batches
+
+    async def index_embeddings(self, *args):
+        await super().index_embeddings(*args)
+        if self.batches == 0:
+            raise KeyboardInterrupt
+        self.batches -= 1
+
+
+def _args(tmp_path):
+    return argparse.Namespace(
+        inputs=[str(tmp_path / "corpus")],
+        workers=1,
+        embed_batch_size=1,
+        manifest=str(tmp_path / "manifest"),
+        save_every=2,
+        chunk_strategy="fixed",
+        chunk_size=500,
+        chunk_overlap=0,
+    )
+
+
+def _stored_vector_ids():
+    with SessionLocal() as session:
+        return sorted(session.scalars(select(models.Chunk.vector_id)))
+
+
+@pytest.mark.asyncio
+async def test_interrupted_run_resumes_without_losing_or_duplicating_vectors(tmp_path, monkeypatch):
+    (tmp_path / "corpus").mkdir()
+    for i in range(5):
+        (tmp_path / "corpus" / f"doc{i}.txt").write_text(f"Bulk document {i} about subject {i}.")
+    store_path = str(tmp_path / "vectors")
+    monkeypatch.setattr(vector_settings, "vector_store", "numpy")
+    monkeypatch.setattr(vector_settings, "numpy_store_path", store_path)
+    monkeypatch.setattr(vector_settings, "vector_quantization", "none")
+
+    monkeypatch.setattr(bulk_ingest, "get_vector_store", lambda: InterruptedStore(store_path, batches=3))
+    with pytest.raises(KeyboardInterrupt):
+        await bulk_ingest.run(_args(tmp_path))
+    # The store was never closed: what survives is what the next process would load.
+    done = bulk_ingest.load_manifest(str(tmp_path / "manifest"))
+    assert len(done) == 3 and len(_stored_vector_ids()) == 3
+    assert sorted(await NumpyVectorStore(path=store_path).list_ids()) == _stored_vector_ids()
+
+    monkeypatch.setattr(bulk_ingest, "get_vector_store", lambda: NumpyVectorStore(path=store_path))
+    report = await bulk_ingest.run(_args(tmp_path))
+    assert (report["documents"], report["skipped_from_checkpoint"]) == (2, 3)
+    ids = _stored_vector_ids()
+    assert len(ids) == 5 and sorted(await NumpyVectorStore(path=store_path).list_ids()) == ids
@@ -0,0 +1,96 @@
+import random
+
+import pytest
+
+from app.services.chunking import StreamNormalizer, chunk_stream, chunk_text, make_chunker, regex_token_starts
+
+TEXT = " ".join(
+    f"Sentence number {i} talks about {'vectors ' * (i % 7)}and retrieval{'!' if i % 5 == 0 else '.'}"
+    for i in range(120)
+)
+
+
+def _pieces(text, size):
+    return [text[start : start + size] for start in range(0, len(text), size)]
+
+
+def test_fixed_strategy_matches_chunk_text():
+    assert list(chunk_stream(_pieces(TEXT, 41))) == chunk_text(TEXT)
+
+
+def test_sentence_strategy_packs_whole_sentences_and_streams_identically():
+    chunks = list(chunk_stream([TEXT], 300, 60, "sentence"))
+    assert chunks == list(chunk_stream(_pieces(TEXT, 23), 300, 60, "sentence"))
+    assert all(len(chunk["text"]) <= 300 for chunk in chunks)
+    assert all(chunk["text"][-1] in ".!" for chunk in chunks)
+    for chunk in chunks:
+        assert TEXT[chunk["start_offset"] : chunk["end_offset"]] == chunk["text"]
+    # Consecutive chunks overlap by at most the overlap budget and skip only the separating space.
+    for previous, current in zip(chunks, chunks[1:]):
+        assert -1 <= previous["end_offset"] - current["start_offset"] <= 60
+
+
+def test_token_strategy_respects_token_budget():
+    chunks = list(chunk_stream([TEXT], 40, 0, "token"))
+    assert all(len(regex_token_starts(chunk["text"])) <= 40 for chunk in chunks)
+    assert " ".join(chunk["text"] for chunk in chunks) == TEXT
+
+
+def test_oversized_sentences_fall_back_to_smaller_units():
+    text = "word " * 100 + "x" * 250 + "."
+    chunks = list(chunk_stream([text], 60, 0, "sentence"))
+    assert all(0 < len(chunk["text"]) <= 60 for chunk in chunks)
+    assert "".join(chunk["text"] for chunk in chunks).replace(" ", "") == text.replace(" ", "")
+
+
+def test_make_chunker_validates_options():
+    with pytest.raises(ValueError):
+        make_chunker("paragraph")
+    with pytest.raises(ValueError):
+        make_chunker("token", 100, 100)
+
+
+def test_normalizer_matches_split_join_across_piece_boundaries():
+    pieces = ["  alpha be", "ta", " ", "", "gamma\n\n", "delta", "\tepsilon  ", "zeta"]
+    normalizer = StreamNormalizer()
+    out = "".join(normalizer.feed(piece) for piece in pieces) + normalizer.finish()
+    assert out == " ".join("".join(pieces).split())
+
+
+def test_normalizer_emits_unbroken_text_without_carrying_it():
+    # Text without whitespace used to be carried and re-split on every piece, which was quadratic.
+    normalizer = StreamNormalizer()
+    piece = "x" * 4096
+    assert all(normalizer.feed(piece) == piece for _ in range(2000))
+    assert normalizer.finish() == ""
+    blob = "y" * 200_000
+    assert list(chunk_stream(_pieces(blob, 1000))) == chunk_text(blob)
+
+
+def test_sentence_chunks_resynchronize_after_an_early_edit():
+    sentences = [f"Sentence {i} mentions topic {i * 7 % 13} in passing" for i in range(400)]
+    before = {chunk["text"] for chunk in chunk_stream([". ".join(sentences)], strategy="sentence")}
+    edited = sentences[:2] + ["An inserted remark"] + sentences[2:]
+    after = [chunk["text"] for chunk in chunk_stream([". ".join(edited)], strategy="sentence")]
+    assert sum(text in before for text in after) >= 0.8 * len(after)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_packing_strategies_do_not_depend_on_where_the_stream_is_split(seed):
+    rng = random.Random(seed)
+    # Long run-on sentences and unbroken words force the word and fixed-window fallbacks.
+    parts = [
+        rng.choice(["Short one.", "Why not?", "It works!", 'Quoted "end."', "(aside.)", "run-on " * rng.randint(5, 40)])
+        if rng.random() < 0.9
+        else "w" * rng.randint(10, 300) + rng.choice(["", ".", ".)", "?"])
+        for _ in range(200)
+    ]
+    text = " ".join(parts)
+    strategy = rng.choice(["sentence", "token"])
+    chunk_size = rng.choice([8, 20, 60, 150])
+    overlap = rng.randrange(chunk_size)
+    cuts = sorted(rng.sample(range(1, len(text)), rng.randint(1, 300)))
+    pieces = [text[start:end] for start, end in zip([0, *cuts], [*cuts, len(text)])]
+    assert list(chunk_stream(pieces, chunk_size, overlap, strategy)) == list(
+        chunk_stream([text], chunk_size, overlap, strategy)
+    )
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from app.services.embedding_cache import CachedEmbeddingProvider
+from app.services.embeddings import LocalEmbeddingProvider, OpenAIEmbeddingProvider
+
+
+class CountingProvider:
+    def __init__(self, inner) -> None:
+        self.inner = inner
+        self.model_id = inner.model_id
+        self.calls = []
+
+    async def embed_texts(self, texts):
+        self.calls.append(list(texts))
+        return await self.inner.embed_texts(texts)
+
+
+@pytest.mark.asyncio
+async def test_only_misses_reach_the_model_and_disk_tier_survives(tmp_path):
+    provider = CountingProvider(LocalEmbeddingProvider())
+    cache = CachedEmbeddingProvider(provider, max_entries=2, disk_path=str(tmp_path / "cache.db"))
+
+    first = await cache.embed_texts(["alpha", "beta", "alpha"])
+    second = await cache.embed_texts(["alpha  ", "gamma"])
+    assert provider.calls == [["alpha", "beta"], ["gamma"]]
+    assert second.dtype == np.float32 and second.shape == (2, 8)
+    np.testing.assert_array_equal(second[0], first[0])
+    assert cache.stats()["evictions"] == 1
+    await cache.close()
+
+    reopened = CachedEmbeddingProvider(provider, disk_path=str(tmp_path / "cache.db"))
+    np.testing.assert_array_equal(await reopened.embed_texts(["beta"]), first[1:2])
+    assert reopened.stats()["disk_hits"] == 1
+    assert len(provider.calls) == 2
+    await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_openai_provider_is_cached_under_its_own_model_id():
+    cache = CachedEmbeddingProvider(OpenAIEmbeddingProvider(api_key="test"))
+    await cache.embed_texts(["hello"])
+    await cache.embed_texts(["hello"])
+    assert cache.stats()["memory_hits"] == 1
+    assert cache.model_id == "openai-stub"
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.db import Base, engine
+from app.main import app
+from app.services.executors import ComputeExecutor, ExecutorSaturatedError, ExecutorTimeoutError, LoopLagMonitor
+from app.services import pdf
+from app.services.pdf import extract_pages, pdf_pieces
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def _pdf(pages):
+    """A minimal PDF with one line of Helvetica text per page."""
+
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", "", "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+    out, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+@pytest.mark.asyncio
+async def test_executor_rejects_when_saturated_and_times_out():
+    executor = ComputeExecutor("test", kind="thread", max_workers=1, max_queue=1)
+    release = threading.Event()
+    running = [asyncio.ensure_future(executor.run(release.wait, 5)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    with pytest.raises(ExecutorSaturatedError):
+        await executor.run(time.sleep, 0)
+    release.set()
+    assert await asyncio.gather(*running) == [True, True]
+
+    with pytest.raises(ExecutorTimeoutError):
+        await executor.run(time.sleep, 0.2, timeout=0.01)
+    # The timed-out task still holds its worker, so it stays in flight until it returns.
+    assert executor.stats()["in_flight"] == 1
+    await asyncio.sleep(0.3)
+    stats = executor.stats()
+    assert (stats["completed"], stats["rejected"], stats["timed_out"], stats["in_flight"]) == (2, 1, 1, 0)
+    assert stats["max_wait_ms"] > 0
+    executor.close()
+
+
+@pytest.mark.asyncio
+async def test_pdf_pages_are_parsed_in_parallel_processes_and_kept_in_order():
+    pages = [f"Page {i} text" for i in range(7)]
+    data = _pdf(pages)
+    executor = ComputeExecutor("pdf", kind="process", max_workers=2)
+    try:
+        pieces = [piece async for piece in pdf_pieces(data, executor, pages_per_task=2)]
+    finally:
+        executor.close()
+    assert pieces == extract_pages(data, 0, 7)
+    assert [piece.strip() for piece in pieces] == pages
+    assert executor.stats()["completed"] == 5  # page count + four page ranges
+
+
+@pytest.mark.asyncio
+async def test_loop_lag_monitor_sees_blocking_code():
+    monitor = LoopLagMonitor(interval=0.005)
+    monitor.start()
+    await asyncio.sleep(0.02)
+    time.sleep(0.05)
+    await asyncio.sleep(0.02)
+    await monitor.stop()
+    assert monitor.stats()["max_ms"] >= 40
+
+
+def test_pdf_upload_runs_on_extraction_executor(monkeypatch, tmp_path):
+    sources = []
+    original = pdf.pdf_pieces
+
+    def recording_pdf_pieces(source, *args):
+        sources.append(source)
+        return original(source, *args)
+
+    monkeypatch.setattr(pdf, "pdf_pieces", recording_pdf_pieces)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    with TestClient(app) as client:
+        response = client.post(
+            "/documents",
+            data={"title": "Manual"},
+            files={"file": ("manual.pdf", _pdf(["Replace the filter", "Restart the pump"]), "application/pdf")},
+        )
+        assert response.status_code == 201
+        stats = client.get("/admin/executors").json()
+        assert stats["extraction"]["completed"] >= 2
+        assert stats["inference"]["completed"] >= 1
+        assert stats["event_loop_lag"]["interval_ms"] > 0
+    # Workers read the spooled upload by path, and the spool file is removed afterwards.
+    assert len(sources) == 1 and isinstance(sources[0], str)
+    assert os.listdir(tmp_path) == []
@@ -3,8 +3,10 @@ from sqlalchemy.orm import Session
 
 from app.core.db import Base, SessionLocal, engine
 from app.persistence import repositories
+from app.services.chunking import chunk_text
 from app.services.embeddings import LocalEmbeddingProvider
-from app.services.ingestion import ingest_text
+from app.services.ingestion import ingest_stream, ingest_text
+from app.services.numpy_vector_store import NumpyVectorStore
 from app.services.vector_store import ChromaVectorStore
 
 
@@ -34,3 +36,162 @@ async def test_ingest_text_creates_document():
     docs = repositories.list_documents(session)
     assert len(docs) == 1
     session.close()
+
+
+@pytest.mark.asyncio
+async def test_ingest_stream_matches_whole_text_chunking():
+    provider = LocalEmbeddingProvider()
+    store = NumpyVectorStore()
+    text = "  Streaming   ingestion keeps\n\nmemory bounded. " * 60
+
+    async def pieces():
+        for start in range(0, len(text), 37):
+            yield text[start : start + 37]
+
+    session: Session = SessionLocal()
+    result = await ingest_stream(
+        title="Streamed",
+        source="unit",
+        tags=None,
+        pieces=pieces(),
+        embedding_provider=provider,
+        vector_store=store,
+        session=session,
+        batch_size=2,
+    )
+    session.commit()
+    document = repositories.get_document(session, result["document_id"])
+    expected = chunk_text(" ".join(text.split()))
+    assert [(c.index, c.text, c.start_offset, c.end_offset) for c in document.chunks] == [
+        (c["index"], c["text"], c["start_offset"], c["end_offset"]) for c in expected
+    ]
+    assert len(store) == len(expected)
+    session.close()
+
+
+class CountingProvider(LocalEmbeddingProvider):
+    def __init__(self):
+        super().__init__()
+        self.embedded = []
+
+    async def embed_texts(self, texts):
+        self.embedded.extend(texts)
+        return await super().embed_texts(texts)
+
+
+@pytest.mark.asyncio
+async def test_upsert_embeds_only_changed_chunks_and_removes_stale_vectors():
+    provider = CountingProvider()
+    store = NumpyVectorStore()
+    sentences = [f"Sentence {i} describes part {i} of the manual." for i in range(40)]
+    options = dict(chunk_strategy="sentence", chunk_size=200, chunk_overlap=0, upsert=True)
+
+    session: Session = SessionLocal()
+    first = await ingest_text(
+        title="Manual",
+        source="manual.txt",
+        tags=None,
+        text=" ".join(sentences),
+        embedding_provider=provider,
+        vector_store=store,
+        session=session,
+        **options,
+    )
+    session.commit()
+    assert first["added"] == first["chunks"] == len(store)
+
+    provider.embedded.clear()
+    edited = sentences[:30] + ["A brand new closing sentence."]
+    second = await ingest_text(
+        title="Manual v2",
+        source="manual.txt",
+        tags=["v2"],
+        text=" ".join(edited),
+        embedding_provider=provider,
+        vector_store=store,
+        session=session,
+        **options,
+    )
+    session.commit()
+
+    assert second["document_id"] == first["document_id"]
+    assert second["added"] == len(provider.embedded) < second["chunks"]
+    assert second["unchanged"] + second["added"] == second["chunks"] == len(store)
+    assert second["removed"] > 0
+    document = repositories.get_document(session, first["document_id"])
+    assert document.title == "Manual v2"
+    assert " ".join(chunk.text for chunk in document.chunks) == " ".join(edited)
+    assert sorted(store._ids) == sorted(chunk.vector_id for chunk in document.chunks)
+    assert all(row.metadata["title"] == "Manual v2" for row in await store.query([1.0] * 8, top_k=50))
+    session.close()
+
+
+class FailingProvider(LocalEmbeddingProvider):
+    def __init__(self, batches):
+        super().__init__()
+        self.batches = batches
+
+    async def embed_texts(self, texts):
+        if not self.batches:
+            raise RuntimeError("embedding backend unavailable")
+        self.batches -= 1
+        return await super().embed_texts(texts)
+
+
+@pytest.mark.asyncio
+async def test_failed_ingest_rolls_back_rows_and_deletes_indexed_vectors():
+    store = NumpyVectorStore()
+    session: Session = SessionLocal()
+    before = len(repositories.list_documents(session))
+    with pytest.raises(RuntimeError):
+        await ingest_text(
+            title="Broken",
+            source="unit",
+            tags=None,
+            text="One sentence here. " * 40,
+            embedding_provider=FailingProvider(batches=2),
+            vector_store=store,
+            session=session,
+            chunk_strategy="sentence",
+            chunk_size=20,
+            chunk_overlap=0,
+            batch_size=2,
+        )
+    assert len(repositories.list_documents(session)) == before
+    assert len(store) == 0
+    session.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_upsert_leaves_stored_metadata_unchanged():
+    store = NumpyVectorStore()
+    sentences = [f"Sentence {i} covers step {i} of the guide." for i in range(40)]
+    options = dict(chunk_strategy="sentence", chunk_size=60, chunk_overlap=0, batch_size=2, upsert=True)
+
+    session: Session = SessionLocal()
+    await ingest_text(
+        title="Guide",
+        source="guide.txt",
+        tags=None,
+        text=" ".join(sentences),
+        embedding_provider=LocalEmbeddingProvider(),
+        vector_store=store,
+        session=session,
+        **options,
+    )
+    before = {row.id: row.metadata for row in await store.query([1.0] * 8, top_k=100)}
+
+    # The new title relabels every kept chunk before the appended sentences fail to embed.
+    with pytest.raises(RuntimeError):
+        await ingest_text(
+            title="Guide v2",
+            source="guide.txt",
+            tags=None,
+            text=" ".join(sentences + ["An appended closing sentence."]),
+            embedding_provider=FailingProvider(batches=0),
+            vector_store=store,
+            session=session,
+            **options,
+        )
+    assert {row.id: row.metadata for row in await store.query([1.0] * 8, top_k=100)} == before
+    session.close()
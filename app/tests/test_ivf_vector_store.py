@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from app.services.ivf_vector_store import IVFVectorStore, recall_report
+
+
+def _clustered(count, dim=16, clusters=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(0, clusters, size=count)] + 0.1 * rng.normal(size=(count, dim))).astype(np.float32)
+
+
+@pytest.mark.asyncio
+async def test_trains_after_threshold_and_assigns_incremental_inserts(tmp_path):
+    data = _clustered(300)
+    store = IVFVectorStore(path=str(tmp_path), nlist=8, nprobe=2, train_size=200)
+    await store.index_embeddings(data[:150].tolist(), [{"i": i} for i in range(150)], [str(i) for i in range(150)])
+    assert not store.trained
+    await store.index_embeddings(
+        data[150:].tolist(), [{"i": i} for i in range(150, 300)], [str(i) for i in range(150, 300)]
+    )
+    assert store.trained
+    assert sum(len(rows) for rows in store._lists) == 300
+
+    result = await store.query(data[42].tolist(), top_k=1)
+    assert result[0].metadata == {"i": 42}
+
+    report = recall_report(store, data[:20], top_k=5, nprobes=[1, 8])
+    assert report[-1]["recall"] == 1.0
+    assert report[0]["recall"] <= report[-1]["recall"]
+
+    store.close()
+    reloaded = IVFVectorStore(path=str(tmp_path), nlist=8, nprobe=2)
+    assert reloaded.trained
+    assert (await reloaded.query(data[42].tolist(), top_k=1))[0].metadata == {"i": 42}
+
+
+@pytest.mark.asyncio
+async def test_delete_rebuilds_inverted_lists():
+    data = _clustered(300)
+    store = IVFVectorStore(nlist=8, nprobe=8, train_size=200)
+    await store.index_embeddings(data.tolist(), [{"i": i} for i in range(300)], [str(i) for i in range(300)])
+    await store.delete([str(i) for i in range(0, 300, 2)])
+
+    assert len(store) == 150
+    assert sorted(position for rows in store._lists for position in rows) == list(range(150))
+    result = await store.query(data[43].tolist(), top_k=1)
+    assert result[0].metadata == {"i": 43}
+
+
+@pytest.mark.asyncio
+async def test_train_size_below_nlist_waits_for_enough_vectors():
+    data = _clustered(32)
+    store = IVFVectorStore(nlist=16, train_size=4)
+    await store.index_embeddings(data[:8].tolist(), [{"i": i} for i in range(8)], [str(i) for i in range(8)])
+    assert not store.trained
+    await store.index_embeddings(data[8:].tolist(), [{"i": i} for i in range(8, 32)], [str(i) for i in range(8, 32)])
+    assert store.trained
+
+
+@pytest.mark.asyncio
+async def test_upserts_move_rows_between_lists():
+    data = _clustered(300)
+    store = IVFVectorStore(nlist=8, nprobe=8, train_size=200)
+    ids = [str(i) for i in range(300)]
+    await store.index_embeddings(data.tolist(), [{"i": i} for i in range(300)], ids)
+    # Overwrite every vector with another row's so most rows change list.
+    await store.index_embeddings(data[::-1].tolist(), [{"i": i} for i in range(300)], ids)
+
+    for list_id, rows in enumerate(store._lists):
+        assert (store._assignments[rows] == list_id).all()
+    assert sorted(position for rows in store._lists for position in rows) == list(range(300))
+    assert (await store.query(data[0].tolist(), top_k=1))[0].metadata == {"i": 299}
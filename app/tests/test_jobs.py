@@ -0,0 +1,50 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.db import Base, engine, session_scope
+from app.main import app
+from app.persistence import repositories
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def _wait_for(client, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_is_accepted_immediately_and_ingested_in_background():
+    with TestClient(app) as client:
+        response = client.post(
+            "/jobs",
+            data={"title": "Background"},
+            files={"file": ("dump.txt", ("background ingestion " * 400).encode(), "text/plain")},
+        )
+        assert response.status_code == 202
+        assert response.json()["status"] == "queued"
+
+        job = _wait_for(client, response.json()["id"])
+        assert job["status"] == "succeeded"
+        assert job["chunks_processed"] > 1
+        assert job["chunks_per_second"] > 0
+        assert client.get(f"/documents/{job['document_id']}").status_code == 200
+        assert any(j["id"] == job["id"] for j in client.get("/jobs").json())
+
+        failed = _wait_for(client, client.post("/jobs", data={"title": "Empty", "text": "   "}).json()["id"])
+        assert failed["status"] == "failed"
+        assert failed["error"] == "No text provided"
+
+    with session_scope() as session:
+        assert repositories.get_job(session, job["id"]).status == "succeeded"
@@ -0,0 +1,125 @@
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import Base, engine, session_scope
+from app.main import app
+from app.persistence import repositories
+from app.services import registry
+from app.services.ingestion import IngestionInProgressError, _IngestionGate
+from app.services.vector_store import ChromaVectorStore
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def _ingest(client, title, source, tags):
+    response = client.post(
+        "/documents",
+        data={"title": title, "source": source, "tags": tags, "text": f"{title} content. " * 80},
+    )
+    assert response.status_code == 201
+    return response.json()
+
+
+def _vector_ids(document_id):
+    with session_scope() as session:
+        return repositories.chunk_vector_ids(session, [document_id])
+
+
+def test_delete_documents_and_collect_garbage():
+    with TestClient(app) as client:
+        store = registry.get_registry().vector_store
+        first = _ingest(client, "First", "s1", ["a", "b"])
+        second = _ingest(client, "Second", "s2", ["b"])
+        third = _ingest(client, "Third", "s3", ["c"])
+        first_vectors = _vector_ids(first["document_id"])
+
+        response = client.delete(f"/documents/{first['document_id']}")
+        assert response.json() == {"documents": 1, "chunks": first["chunks"], "vectors": first["chunks"]}
+        assert client.delete(f"/documents/{first['document_id']}").status_code == 404
+        assert not set(first_vectors) & set(asyncio.run(store.list_ids()))
+
+        assert client.delete("/documents").status_code == 400
+        response = client.delete("/documents", params={"tag": "b"})
+        assert response.json()["documents"] == 1
+        assert client.get(f"/documents/{second['document_id']}").status_code == 404
+
+        # An orphaned vector plus a chunk whose vector went missing.
+        third_vectors = _vector_ids(third["document_id"])
+        asyncio.run(store.index_embeddings([[1.0] * 8], [{"document_id": -1}], ["orphan"], ["stale"]))
+        asyncio.run(store.delete(third_vectors[:1]))
+
+        report = client.post("/admin/gc").json()
+        assert report["orphaned_vectors_deleted"] >= 1
+        assert report["chunks_reindexed"] == 1
+        live = set(asyncio.run(store.list_ids()))
+        assert "orphan" not in live
+        assert set(third_vectors) <= live
+
+
+def test_failed_delete_commit_keeps_vectors(monkeypatch):
+    with TestClient(app) as client:
+        store = registry.get_registry().vector_store
+        document = _ingest(client, "Kept", "s4", ["k"])
+        vectors = _vector_ids(document["document_id"])
+
+        async def fail(self):
+            raise RuntimeError("commit failed")
+
+        monkeypatch.setattr(AsyncSession, "commit", fail)
+        with pytest.raises(RuntimeError):
+            client.delete(f"/documents/{document['document_id']}")
+        monkeypatch.undo()
+        assert client.get(f"/documents/{document['document_id']}").status_code == 200
+        assert set(vectors) <= set(asyncio.run(store.list_ids()))
+
+
+def _collection_names(store):
+    return {collection.name for collection in store.client.list_collections()}
+
+
+def test_chroma_compaction_survives_an_interrupted_copy():
+    store = ChromaVectorStore("test-compact")
+    ids = ["a", "b", "c"]
+    asyncio.run(store.index_embeddings(np.eye(3, dtype=np.float32), [{"n": i} for i in range(3)], ids, ids))
+    asyncio.run(store.delete(["b"]))
+    asyncio.run(store.compact())
+    assert sorted(asyncio.run(store.list_ids())) == ["a", "c"]
+    assert not {"test-compact-old", "test-compact-compact"} & _collection_names(store)
+
+    # Crash mid-copy: the live collection is renamed aside next to a partial copy.
+    store.collection.modify(name="test-compact-old")
+    store.client.create_collection("test-compact-compact")
+    reopened = ChromaVectorStore("test-compact")
+    assert sorted(asyncio.run(reopened.list_ids())) == ["a", "c"]
+    assert not {"test-compact-old", "test-compact-compact"} & _collection_names(reopened)
+
+
+@pytest.mark.asyncio
+async def test_ingestion_waits_for_garbage_collection():
+    gate = _IngestionGate()
+    order = []
+
+    async def ingest():
+        async with gate.ingest():
+            order.append("ingest")
+
+    async with gate.collect():
+        task = asyncio.create_task(ingest())
+        await asyncio.sleep(0.01)
+        order.append("collected")
+    await task
+    assert order == ["collected", "ingest"]
+
+    async with gate.ingest():
+        with pytest.raises(IngestionInProgressError):
+            async with gate.collect():
+                pass
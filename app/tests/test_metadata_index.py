@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from app.services.ivf_vector_store import IVFVectorStore
+from app.services.metadata_index import MetadataIndex
+
+FILTERS = [
+    {"tags": "red"},
+    {"document_id": {"$in": [1, 3]}},
+    {"$and": [{"tags": "blue"}, {"document_id": {"$nin": [0]}}]},
+    {"$or": [{"source": "a.txt"}, {"tags": {"$in": ["green", "missing"]}}]},
+    {"document_id": {"$ne": 2}, "rank": {"$gte": 10}},
+    {"tags": "missing"},
+]
+
+
+def _rows(count):
+    colours = ["red", "blue", "green"]
+    return [
+        {
+            "document_id": i % 4,
+            "source": "a.txt" if i % 5 == 0 else None,
+            "tags": [colours[i % 3], colours[(i + 1) % 3]] if i % 2 else [colours[i % 3]],
+            "rank": i,
+        }
+        for i in range(count)
+    ]
+
+
+def _assert_matches_scan(index):
+    for filters in FILTERS:
+        assert index.select(filters).tolist() == np.flatnonzero(index.mask(filters)).tolist(), filters
+
+
+def test_select_matches_column_scan_through_updates_and_removals():
+    index = MetadataIndex()
+    index.append(_rows(30))
+    assert index.select(None) is None
+    _assert_matches_scan(index)
+
+    index.set_row(4, {"document_id": 9, "tags": ["blue"], "rank": 4})
+    index.set_row(5, {"document_id": 1, "source": "a.txt", "tags": ["red", "red"], "rank": 5})
+    _assert_matches_scan(index)
+
+    keep = np.ones(30, dtype=bool)
+    keep[[0, 3, 4, 17]] = False
+    index.keep(keep)
+    assert len(index) == 26
+    _assert_matches_scan(index)
+
+    rebuilt = MetadataIndex(index.to_dict(), len(index))
+    for filters in FILTERS:
+        assert rebuilt.select(filters).tolist() == index.select(filters).tolist()
+
+
+@pytest.mark.asyncio
+async def test_trained_ivf_returns_full_top_k_for_selective_filters():
+    store = IVFVectorStore(nlist=8, nprobe=1, train_size=200)
+    vectors = np.random.default_rng(0).normal(size=(400, 8)).astype(np.float32).tolist()
+    metadatas = [{"document_id": i, "tags": ["rare"] if i % 50 == 0 else []} for i in range(400)]
+    await store.index_embeddings(vectors, metadatas, [str(i) for i in range(400)], [f"t{i}" for i in range(400)])
+    assert store.trained
+
+    results = await store.query(vectors[1], top_k=8, filters={"tags": "rare"})
+    assert sorted(r.metadata["document_id"] for r in results) == list(range(0, 400, 50))
@@ -0,0 +1,76 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.db import Base, engine
+from app.core.metrics import Histogram, Metrics, SlowRequestProfiler
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_histogram_percentiles_are_within_bucket_error():
+    samples = np.random.default_rng(0).lognormal(mean=-5, sigma=1.5, size=20_000)
+    histogram = Histogram()
+    for seconds in samples:
+        histogram.observe(float(seconds))
+    for q in (0.5, 0.95, 0.99):
+        exact = np.quantile(samples, q)
+        assert exact <= histogram.percentile(q) <= exact * 1.06
+    assert histogram.count == len(samples)
+    assert histogram.percentile(1.0) == histogram.max == samples.max()
+
+
+def test_render_uses_prometheus_text_format():
+    registry = Metrics()
+    registry.describe("demo_seconds", "Demo latency.")
+    registry.histogram("demo_seconds", stage='a "quoted" stage').observe(0.002)
+    registry.counter("demo_total", kind="x").inc(3)
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP demo_seconds Demo latency.", "# TYPE demo_seconds summary"]
+    assert 'demo_seconds{stage="a \\"quoted\\" stage",quantile="0.5"} 0.002' in lines
+    assert 'demo_seconds_count{stage="a \\"quoted\\" stage"} 1' in lines
+    assert lines[-2:] == ["# TYPE demo_total counter", 'demo_total{kind="x"} 3']
+
+
+def test_query_reports_stage_timings_and_metrics():
+    client.post("/documents", data={"title": "Timed", "text": "Server timing shows stage latency", "source": "t"})
+    response = client.post("/query", json={"query": "which stage is slow for server timing", "top_k": 1})
+    assert response.status_code == 200
+    stages = {entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")}
+    assert {"embed", "search", "generate", "total"} <= stages
+
+    exposition = client.get("/metrics").text
+    assert 'rag_stage_seconds_count{stage="chunk"}' in exposition
+    assert 'rag_stage_seconds{stage="search",quantile="0.99"}' in exposition
+    assert 'rag_http_requests_total{handler="query",method="POST",status="200"}' in exposition
+    assert 'rag_queries_total{mode="dense"}' in exposition
+
+
+def test_slow_request_profiler_reports_blocking_stack():
+    reports = []
+    profiler = SlowRequestProfiler(threshold=0.02, interval=0.001, hook=reports.append)
+    fast = profiler.begin()
+    assert profiler.end(fast, "fast") is None
+
+    def block():
+        time.sleep(0.1)
+
+    started = profiler.begin()
+    block()
+    report = profiler.end(started, "GET /slow")
+    assert reports == [report] and report["request"] == "GET /slow"
+    assert report["samples"] > 10
+    assert report["stacks"][0]["share"] > 0.5
+    assert any(" block" in frame for frame in report["stacks"][0]["stack"])
+    assert profiler._thread is not None and profiler._thread is not threading.current_thread()
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from app.services.numpy_vector_store import NumpyVectorStore
+
+
+def _random_vectors(count, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32).tolist()
+
+
+@pytest.mark.asyncio
+async def test_query_matches_exact_cosine_ranking_and_filters():
+    store = NumpyVectorStore()
+    vectors = _random_vectors(50)
+    metadatas = [{"document_id": i % 5, "tags": ["even"] if i % 2 == 0 else ["odd"]} for i in range(50)]
+    await store.index_embeddings(vectors, metadatas, [f"v{i}" for i in range(50)], [f"text {i}" for i in range(50)])
+
+    query = vectors[7]
+    results = await store.query(query, top_k=3)
+    matrix = np.asarray(vectors)
+    sims = matrix @ np.asarray(query) / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+    assert [r.text for r in results] == [f"text {i}" for i in np.argsort(-sims)[:3]]
+    assert results[0].score == pytest.approx(0.0, abs=1e-5)
+
+    filtered = await store.query(query, top_k=50, filters={"$and": [{"tags": "even"}, {"document_id": {"$in": [0, 2]}}]})
+    assert filtered and all(r.metadata["document_id"] in (0, 2) and r.metadata["tags"] == ["even"] for r in filtered)
+
+
+@pytest.mark.asyncio
+async def test_save_and_memory_mapped_reload(tmp_path):
+    store = NumpyVectorStore(path=str(tmp_path), metric="l2")
+    vectors = _random_vectors(10)
+    await store.index_embeddings(vectors, [{"i": i} for i in range(10)], [str(i) for i in range(10)])
+    store.close()
+
+    reloaded = NumpyVectorStore(path=str(tmp_path), metric="l2")
+    assert len(reloaded) == 10
+    assert (await reloaded.query(vectors[3], top_k=1))[0].metadata == {"i": 3}
+    await reloaded.index_embeddings(_random_vectors(2, seed=1), [{"i": 10}, {"i": 11}], ["10", "11"])
+    assert len(reloaded) == 12
+
+
+@pytest.mark.asyncio
+async def test_writes_survive_a_crash_through_the_journal(tmp_path):
+    store = NumpyVectorStore(path=str(tmp_path))
+    vectors = _random_vectors(10)
+    await store.index_embeddings(vectors[:6], [{"i": i} for i in range(6)], [str(i) for i in range(6)])
+    store.close()
+    # Never closed again: everything below lives only in the journal.
+    store = NumpyVectorStore(path=str(tmp_path))
+    await store.index_embeddings(vectors[6:], [{"i": i} for i in range(6, 10)], [str(i) for i in range(6, 10)])
+    await store.delete(["0", "7"])
+    await store.update_metadata(["8"], [{"i": "relabelled"}])
+    with open(tmp_path / "journal.jsonl", "ab") as journal:
+        journal.write(b'{"op": "delete", "ids": ["1"')  # torn by the crash
+
+    recovered = NumpyVectorStore(path=str(tmp_path))
+    assert sorted(await recovered.list_ids()) == sorted(["1", "2", "3", "4", "5", "6", "8", "9"])
+    assert (await recovered.query(vectors[8], top_k=1))[0].metadata == {"i": "relabelled"}
+    await recovered.index_embeddings(vectors[:1], [{"i": 0}], ["0"])
+    assert "0" in await NumpyVectorStore(path=str(tmp_path)).list_ids()
+
+
+@pytest.mark.asyncio
+async def test_reload_uses_saved_norms_without_reading_vectors(tmp_path, monkeypatch):
+    store = NumpyVectorStore(path=str(tmp_path), metric="l2")
+    vectors = _random_vectors(20)
+    await store.index_embeddings(vectors, [{"i": i} for i in range(20)], [str(i) for i in range(20)])
+    store.close()
+
+    monkeypatch.setattr(np, "einsum", lambda *args: pytest.fail("norms were recomputed"))
+    reloaded = NumpyVectorStore(path=str(tmp_path), metric="l2")
+    monkeypatch.undo()
+    np.testing.assert_allclose(reloaded._norms[:20], np.einsum("ij,ij->i", *[np.asarray(vectors)] * 2), rtol=1e-5)
+    assert (await reloaded.query(vectors[5], top_k=1))[0].metadata == {"i": 5}
+
+
+@pytest.mark.asyncio
+async def test_list_ids_waits_for_the_lock_off_the_event_loop():
+    store = NumpyVectorStore()
+    await store.index_embeddings(_random_vectors(3), [{}] * 3, ["a", "b", "c"])
+    held, release = threading.Event(), threading.Event()
+
+    def hold_lock():
+        with store._lock:
+            held.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold_lock)
+    holder.start()
+    held.wait(5)
+    listing = asyncio.ensure_future(store.list_ids())
+    await asyncio.sleep(0.05)  # runs only if list_ids is not blocking the loop
+    assert not listing.done()
+    release.set()
+    assert await listing == ["a", "b", "c"]
+    holder.join(5)
+
+
+@pytest.mark.asyncio
+async def test_query_many_matches_individual_queries():
+    store = NumpyVectorStore(metric="l2")
+    vectors = _random_vectors(40)
+    metadatas = [{"document_id": i % 4} for i in range(40)]
+    await store.index_embeddings(vectors, metadatas, [f"v{i}" for i in range(40)], [f"text {i}" for i in range(40)])
+
+    queries = _random_vectors(5, seed=3)
+    top_ks = [1, 3, 5, 2, 4]
+    filters = [None, {"document_id": 1}, None, {"document_id": 1}, {"document_id": {"$in": [2, 3]}}]
+    batched = await store.query_many(queries, top_ks=top_ks, filters=filters)
+    for query, k, where, results in zip(queries, top_ks, filters, batched):
+        single = await store.query(query, top_k=k, filters=where)
+        assert [r.text for r in results] == [r.text for r in single]
+        assert [r.score for r in results] == pytest.approx([r.score for r in single], abs=1e-4)
+
+
+@pytest.mark.asyncio
+async def test_delete_compacts_rows_and_keeps_ids_consistent():
+    store = NumpyVectorStore()
+    await store.index_embeddings(
+        [[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]], [{"n": 0}, {"n": 1}, {"n": 2}], ["a", "b", "c"], ["A", "B", "C"]
+    )
+    await store.delete(["b", "missing"])
+    await store.update_metadata(["c"], [{"n": 20}])
+
+    assert len(store) == 2
+    results = await store.query([0.0, 1.0], top_k=5)
+    assert [(r.text, r.metadata["n"]) for r in results] == [("C", 20), ("A", 0)]
+    await store.index_embeddings([[0.0, 1.0]], [{"n": 3}], ["d"], ["D"])
+    assert (await store.query([0.0, 1.0], top_k=1))[0].text == "D"
@@ -0,0 +1,116 @@
+import threading
+
+import numpy as np
+import pytest
+
+from app.services.ivf_vector_store import IVFVectorStore
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.quantization import ScalarQuantizer, get_quantizer
+
+
+def _data(count, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(8, dim))
+    return (centers[rng.integers(0, 8, size=count)] + 0.1 * rng.normal(size=(count, dim))).astype(np.float32)
+
+
+@pytest.mark.parametrize("kind", ["float16", "int8", "pq"])
+def test_dots_against_codes_match_decoded_vectors(kind):
+    data, queries = _data(500), _data(3, seed=1)
+    quantizer = get_quantizer(kind, pq_subvector_dim=4)
+    quantizer.train(data)
+    codes = quantizer.encode(data)
+    assert codes.nbytes < data.nbytes
+    expected = queries @ quantizer.decode(codes).T
+    np.testing.assert_allclose(quantizer.dots(codes, queries), expected, rtol=1e-4, atol=1e-3)
+    assert np.abs(quantizer.decode(codes) - data).mean() < 0.1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["float16", "int8", "pq"])
+async def test_quantized_store_reranks_persists_and_deletes(tmp_path, kind):
+    data = _data(300)
+    store = NumpyVectorStore(
+        path=str(tmp_path), metric="l2", quantizer=get_quantizer(kind, pq_subvector_dim=4), quantizer_train_size=200
+    )
+    await store.index_embeddings(data[:250].tolist(), [{"i": i} for i in range(250)], [str(i) for i in range(250)])
+    assert store._codes is not None
+    await store.index_embeddings(
+        data[250:].tolist(), [{"i": i} for i in range(250, 300)], [str(i) for i in range(250, 300)]
+    )
+
+    result = (await store.query(data[270].tolist(), top_k=1))[0]
+    assert result.metadata == {"i": 270}
+    assert result.score == pytest.approx(0.0, abs=1e-4)
+
+    await store.delete([str(i) for i in range(100)])
+    batched = await store.query_many([data[150].tolist(), data[5].tolist()], top_ks=[1, 1], filters=[None, None])
+    assert batched[0][0].metadata == {"i": 150}
+    assert batched[1][0].metadata["i"] >= 100
+
+    store.close()
+    reloaded = NumpyVectorStore(path=str(tmp_path), metric="l2", quantizer=get_quantizer(kind, pq_subvector_dim=4))
+    assert len(reloaded._codes) == 200
+    np.testing.assert_array_equal(reloaded._codes, store._codes[:200])
+    assert (await reloaded.query(data[220].tolist(), top_k=1))[0].metadata == {"i": 220}
+
+
+@pytest.mark.asyncio
+async def test_ivf_scores_probed_lists_from_codes():
+    data = _data(400)
+    store = IVFVectorStore(nlist=8, nprobe=2, train_size=200, quantizer=get_quantizer("int8"), quantizer_train_size=200)
+    await store.index_embeddings(data.tolist(), [{"i": i} for i in range(400)], [str(i) for i in range(400)])
+    assert store.trained and store._codes is not None
+    assert (await store.query(data[42].tolist(), top_k=1))[0].metadata == {"i": 42}
+
+
+@pytest.mark.asyncio
+async def test_quantized_store_keeps_full_precision_in_the_row_file(tmp_path):
+    data = _data(300)
+    store = NumpyVectorStore(path=str(tmp_path), quantizer=get_quantizer("int8"), quantizer_train_size=200)
+    ids = [str(i) for i in range(300)]
+    await store.index_embeddings(data, [{"i": i} for i in range(300)], ids)
+    assert store._vectors.nbytes == 0 and store._codes is not None and store._file.rows == 300
+
+    # Updates append and deletes leave dead rows in the file until compaction.
+    await store.index_embeddings(data[:1] * -1, [{"i": "flipped"}], ["0"])
+    await store.delete(ids[1:51])
+    assert store._file.rows == 301 and len(store) == 250
+    assert (await store.query(-data[0], top_k=1))[0].metadata == {"i": "flipped"}
+    fetched = (await store.fetch(["60"]))[1][0]
+    np.testing.assert_allclose(fetched, data[60] / np.linalg.norm(data[60]), rtol=1e-6)
+
+    await store.compact()
+    assert store._file.rows == 250
+    assert (await store.query(data[120], top_k=1))[0].metadata == {"i": 120}
+    reloaded = NumpyVectorStore(path=str(tmp_path), quantizer=get_quantizer("int8"), quantizer_train_size=200)
+    # The saved vectors are read in place, not copied into a new row file.
+    assert isinstance(reloaded._file.base, np.memmap) and reloaded._file.rows == 250
+    assert sorted(await reloaded.list_ids()) == sorted(["0"] + ids[51:])
+    assert (await reloaded.query(-data[0], top_k=1))[0].metadata == {"i": "flipped"}
+    np.testing.assert_array_equal(reloaded._codes, store._codes[:250])
+
+
+def test_quantizer_trains_outside_the_store_lock(monkeypatch):
+    data = _data(120)
+    store = NumpyVectorStore(quantizer=get_quantizer("int8"), quantizer_train_size=100)
+    training, release = threading.Event(), threading.Event()
+    train = ScalarQuantizer.train
+
+    def slow_train(self, sample):
+        training.set()
+        release.wait(5)
+        train(self, sample)
+
+    monkeypatch.setattr(ScalarQuantizer, "train", slow_train)
+    first = (data[:100], [{"i": i} for i in range(100)], [str(i) for i in range(100)], None)
+    writer = threading.Thread(target=store._add, args=first)
+    writer.start()
+    assert training.wait(5)
+    # Searches and writes go on while the quantizer trains; rows written meanwhile are encoded on swap.
+    assert store._search(data[7], 1, None)[0].metadata == {"i": 7}
+    store._add(data[100:], [{"i": i} for i in range(100, 120)], [str(i) for i in range(100, 120)], None)
+    release.set()
+    writer.join(5)
+    assert store.quantizer.trained and store._codes is not None
+    assert store._search(data[110], 1, None)[0].metadata == {"i": 110}
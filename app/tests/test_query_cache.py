@@ -0,0 +1,61 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.db import Base, engine
+from app.main import app
+from app.services.query_cache import QueryCache, TTLCache, bump_index_version
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_ttl_cache_evicts_least_recently_used_and_expires():
+    now = [0.0]
+    cache = TTLCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    now[0] = 11
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["expirations"]) == (1, 2, 1, 1)
+
+
+def test_retrieval_key_normalizes_query_and_tracks_index_version():
+    key = QueryCache.retrieval_key("What  is RAG?", 5, {"tag": "x"})
+    assert key == QueryCache.retrieval_key(" what is rag? ", 5, {"tag": "x"})
+    assert key != QueryCache.retrieval_key("what is rag?", 3, {"tag": "x"})
+    bump_index_version()
+    assert key != QueryCache.retrieval_key("what is rag?", 5, {"tag": "x"})
+
+
+def test_query_responses_are_cached_until_the_index_changes():
+    with TestClient(app) as client:
+        client.post("/documents", data={"title": "Cache", "text": "Caching avoids repeated work", "source": "c"})
+        payload = {"query": "caching", "top_k": 1}
+        first = client.post("/query", json=payload)
+        second = client.post("/query", json=payload)
+        assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("MISS", "HIT")
+        assert first.json() == second.json()
+
+        client.post("/documents", data={"title": "More", "text": "Another document", "source": "m"})
+        # New index version: retrieval runs again, the answer for the same context is reused.
+        third = client.post("/query", json=payload)
+        assert third.headers["X-Cache"] == "PARTIAL"
+
+        stats = client.get("/admin/cache").json()["query"]
+        assert stats["retrieval"]["hits"] == 1
+        assert stats["answers"]["hits"] == 2
+
+
+def test_answer_key_follows_context_text_not_chunk_ids():
+    context = {"text": "Old text", "metadata": {"chunk_id": 7}}
+    key = QueryCache.answer_key("q", [context], "model")
+    assert key != QueryCache.answer_key("q", [{**context, "text": "New text under a reused id"}], "model")
+    assert key == QueryCache.answer_key("q", [{**context, "metadata": {"chunk_id": 8}}], "model")
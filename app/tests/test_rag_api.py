@@ -1,10 +1,24 @@
+import json
+
+import pytest
 from fastapi.testclient import TestClient
 
+from app.core.db import Base, engine
 from app.main import app
+from app.services.llm import DummyLLMClient
+from app.services.rag import stream_answer
+from app.services.registry import get_registry
 
 client = TestClient(app)
 
 
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
 def test_ingest_and_query():
     ingest_response = client.post(
         "/documents",
@@ -21,3 +35,50 @@ def test_ingest_and_query():
 
     detail = client.get(f"/documents/{doc_id}")
     assert detail.status_code == 200
+
+
+def _events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        name, data = block.split("\n", 1)
+        events.append((name[len("event: ") :], json.loads(data[len("data: ") :])))
+    return events
+
+
+def test_query_stream_sends_context_then_tokens():
+    client.post("/documents", data={"title": "Stream", "text": "Streaming sends tokens early", "source": "s"})
+    payload = {"query": "streaming tokens", "top_k": 1}
+    with client.stream("POST", "/query/stream", json=payload) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _events(response.read().decode())
+
+    names = [name for name, _ in events]
+    assert names[0] == "context" and names[-1] == "done"
+    assert names.count("token") == events[-1][1]["tokens"] > 1
+    streamed = "".join(data for name, data in events if name == "token")
+    assert streamed == client.post("/query", json=payload).json()["answer"]
+
+
+@pytest.mark.asyncio
+async def test_closing_the_stream_stops_generation():
+    class Recording(DummyLLMClient):
+        closed = False
+
+        async def stream_answer(self, query, context):
+            try:
+                for token in ["a", " b", " c"]:
+                    yield token
+            finally:
+                Recording.closed = True
+
+    registry = get_registry()
+    events = stream_answer(
+        query="anything",
+        embedding_provider=registry.embedding_provider,
+        vector_store=registry.vector_store,
+        llm_client=Recording(),
+    )
+    assert (await events.__anext__())[0] == "context"
+    assert await events.__anext__() == ("token", "a")
+    await events.aclose()
+    assert Recording.closed
@@ -0,0 +1,14 @@
+import pytest
+
+from app.services import registry
+
+
+@pytest.mark.asyncio
+async def test_registry_shares_services_until_shutdown():
+    first = registry.get_registry()
+    assert registry.provide_embedding_provider() is first.embedding_provider
+    assert registry.provide_vector_store() is first.vector_store
+    assert set(first.load_seconds) == {"embedding_provider", "vector_store"}
+
+    await registry.shutdown()
+    assert registry.get_registry() is not first
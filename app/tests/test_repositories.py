@@ -0,0 +1,154 @@
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from app.core.db import Base, SessionLocal, async_session_scope, engine
+from app.persistence import async_repositories, migrations, models, repositories
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def _chunks(count):
+    return [{"index": i, "text": f"chunk {i}", "start_offset": i, "end_offset": i + 1} for i in range(count)]
+
+
+def test_bulk_chunks_counts_and_pagination_use_constant_queries():
+    session = SessionLocal()
+    documents = []
+    for i in range(5):
+        document = repositories.create_document(session, title=f"doc {i}", source=None, tags=None)
+        created = repositories.create_chunks(session, document=document, chunks=_chunks(i + 1))
+        assert [chunk.index for chunk in created] == list(range(i + 1))
+        assert all(chunk.id is not None for chunk in created)
+        documents.append(document)
+    session.commit()
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        first_page = repositories.list_documents(session, limit=3)
+        second_page = repositories.list_documents(session, limit=3, after_id=first_page[-1].id)
+        counts = repositories.chunk_counts(session, [doc.id for doc in first_page + second_page])
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert [doc.id for doc in first_page + second_page] == [doc.id for doc in documents]
+    assert counts == {doc.id: i + 1 for i, doc in enumerate(documents)}
+    assert len(statements) == 3
+    session.close()
+
+
+@pytest.mark.asyncio
+async def test_async_repositories_round_trip():
+    async with async_session_scope() as session:
+        document = await async_repositories.create_document(session, title="async", source="s", tags=["a"])
+        await async_repositories.create_chunks(session, document=document, chunks=_chunks(3))
+        document_id = document.id
+
+    async with async_session_scope() as session:
+        fetched = await async_repositories.get_document(session, document_id)
+        assert [chunk.index for chunk in fetched.chunks] == [0, 1, 2]
+        assert await async_repositories.chunk_count(session, document_id) == 3
+        assert await async_repositories.chunk_counts(session, [document_id]) == {document_id: 3}
+        listed = await async_repositories.list_documents(session, after_id=document_id - 1)
+        assert [doc.id for doc in listed] == [document_id]
+
+
+def test_tags_are_normalized_ordered_and_removed_with_documents():
+    session = SessionLocal()
+    first = repositories.create_document(session, title="tagged", source=None, tags=["t-b", "t-a", "t-b"])
+    second = repositories.create_document(session, title="also", source=None, tags=["t-a"])
+    session.commit()
+    assert first.tags == ["t-b", "t-a"]
+    assert session.query(models.Tag).filter(models.Tag.name.in_(["t-a", "t-b"])).count() == 2
+
+    repositories.set_document_tags(session, first, ["t-c", "t-b"])
+    session.commit()
+    assert repositories.find_document_ids(session, tag="t-a") == [second.id]
+    assert repositories.find_document_ids(session, tag="t-c") == [first.id]
+
+    first_id = first.id
+    repositories.delete_documents(session, [first_id])
+    session.commit()
+    assert session.query(models.DocumentTag).filter_by(document_id=first_id).count() == 0
+    session.close()
+
+
+def test_inserting_existing_tags_is_a_no_op():
+    session = SessionLocal()
+    repositories.create_document(session, title="raced", source=None, tags=["t-race"])
+    session.commit()
+    # What a transaction that selected before the tag was committed would run.
+    session.execute(models.Tag.insert_missing("sqlite", ["t-race"]))
+    assert session.query(models.Tag).filter_by(name="t-race").count() == 1
+    session.close()
+
+
+def test_upgrade_moves_legacy_document_tags(tmp_path):
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with legacy.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE documents "
+                "(id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, source VARCHAR, tags VARCHAR)"
+            )
+        )
+        connection.execute(text("INSERT INTO documents VALUES (1, 'a', NULL, 'ops,infra'), (2, 'b', NULL, NULL)"))
+        connection.execute(text("INSERT INTO documents VALUES (3, 'c', NULL, 'infra')"))
+
+    migrations.upgrade(legacy)
+    migrations.upgrade(legacy)
+    with Session(legacy) as session:
+        assert {document.id: document.tags for document in session.query(models.Document)} == {
+            1: ["ops", "infra"],
+            2: [],
+            3: ["infra"],
+        }
+        assert repositories.find_document_ids(session, tag="infra") == [1, 3]
+    legacy.dispose()
+
+
+def test_upgrade_adds_columns_introduced_after_the_table(tmp_path):
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with legacy.begin() as connection:
+        connection.execute(
+            text("CREATE TABLE documents (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, source VARCHAR)")
+        )
+        connection.execute(
+            text(
+                "CREATE TABLE chunks (id INTEGER PRIMARY KEY, document_id INTEGER NOT NULL REFERENCES documents(id), "
+                "\"index\" INTEGER NOT NULL, text TEXT NOT NULL, start_offset INTEGER NOT NULL, "
+                "end_offset INTEGER NOT NULL)"
+            )
+        )
+        connection.execute(
+            text(
+                "CREATE TABLE ingestion_jobs (id VARCHAR PRIMARY KEY, status VARCHAR NOT NULL, title VARCHAR NOT NULL, "
+                "source VARCHAR, tags VARCHAR, content_type VARCHAR NOT NULL, payload_path VARCHAR NOT NULL, "
+                "document_id INTEGER, chunks_processed INTEGER NOT NULL, error TEXT, created_at DATETIME NOT NULL, "
+                "started_at DATETIME, finished_at DATETIME)"
+            )
+        )
+        connection.execute(text("INSERT INTO documents VALUES (1, 'a', 'a.txt')"))
+        connection.execute(text("INSERT INTO chunks VALUES (1, 1, 0, 'old chunk', 0, 9)"))
+        connection.execute(
+            text(
+                "INSERT INTO ingestion_jobs VALUES "
+                "('j', 'succeeded', 't', NULL, NULL, 'text/plain', 'p', 1, 1, NULL, '2024-01-01 00:00:00', NULL, NULL)"
+            )
+        )
+
+    migrations.upgrade(legacy)
+    migrations.upgrade(legacy)
+    with Session(legacy) as session:
+        chunk = session.get(models.Chunk, 1)
+        assert (chunk.text, chunk.content_hash, chunk.vector_id) == ("old chunk", None, None)
+        assert session.get(models.IngestionJob, "j").upsert is False
+        assert repositories.find_document_by_source(session, "a.txt").id == 1
+    legacy.dispose()
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.db import Base, engine
+from app.main import app
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.registry import provide_embedding_provider, provide_reranker, provide_vector_store
+from app.services.reranking import Reranker, mmr
+from app.services.retrieval import retrieve
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+class TableEmbeddings:
+    model_id = "table"
+
+    def __init__(self, table):
+        self.table = table
+        self.calls = []
+
+    async def embed_texts(self, texts):
+        self.calls.append(list(texts))
+        return np.asarray([self.table[text] for text in texts], dtype=np.float32)
+
+
+def _unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_mmr_drops_near_duplicates_and_diversifies():
+    vectors = np.stack([_unit(1, 0, 0), _unit(1, 0.01, 0), _unit(0.8, 0.6, 0), _unit(0, 0, 1)])
+    similarity = vectors @ vectors.T
+    relevance = np.asarray([1.0, 0.99, 0.9, 0.2])
+    assert mmr(relevance, similarity, top_k=3, diversity=0.0) == [0, 2, 3]
+    assert mmr(relevance, similarity, top_k=2, diversity=0.9) == [0, 3]
+    assert mmr(relevance, similarity, top_k=4, diversity=0.5, duplicate_threshold=1.1) == [0, 2, 3, 1]
+    assert mmr(relevance[:0], similarity[:0, :0], top_k=3) == []
+
+
+@pytest.mark.asyncio
+async def test_rerank_rescores_stored_vectors_and_embeds_only_missing_ones():
+    table = {"a": _unit(1, 0.1), "b": _unit(1, 0.5), "c": _unit(0, 1), "query": _unit(1, 0)}
+    store = NumpyVectorStore()
+    await store.index_embeddings(np.stack([table["a"], table["b"]]), [{}, {}], ["va", "vb"], ["a", "b"])
+    provider = TableEmbeddings(table)
+    reranker = Reranker(provider, store, diversity=0.0)
+    results = [
+        {"id": "vb", "text": "b", "score": 0.0, "metadata": {}},
+        {"id": None, "text": "c", "score": 0.1, "metadata": {}},
+        {"id": "va", "text": "a", "score": 0.2, "metadata": {}},
+    ]
+
+    reranked = await reranker.rerank("query", results, top_k=2, query_embedding=table["query"])
+    assert [result["text"] for result in reranked] == ["a", "b"]
+    assert reranked[0]["score"] == pytest.approx(1 - float(table["a"] @ table["query"]), abs=1e-6)
+    assert provider.calls == [["c"]]
+
+    kept = await reranker.rerank("query", results, top_k=2, exact=False)
+    assert [(result["text"], result["score"]) for result in kept] == [("b", 0.0), ("c", pytest.approx(0.1))]
+
+
+@pytest.mark.asyncio
+async def test_retrieve_overfetches_and_returns_distinct_chunks():
+    table = {"query": _unit(1, 0, 0)}
+    for i in range(3):
+        table[f"copy {i}"] = _unit(1, 0.05, 0)
+    table["other"] = _unit(1, 0, 0.6)
+    texts = list(table)[1:]
+    store = NumpyVectorStore()
+    await store.index_embeddings(np.stack([table[t] for t in texts]), [{} for _ in texts], texts, texts)
+    provider = TableEmbeddings(table)
+
+    plain = await retrieve(query="query", embedding_provider=provider, vector_store=store, top_k=2)
+    assert all(result["text"].startswith("copy") for result in plain)
+    reranked = await retrieve(
+        query="query", embedding_provider=provider, vector_store=store, top_k=2, reranker=Reranker(provider, store)
+    )
+    assert [result["text"] for result in reranked][1] == "other"
+    assert provider.calls == [["query"], ["query"]]
+
+
+class NoQueryEmbeddings(TableEmbeddings):
+    async def embed_texts(self, texts):
+        assert "query" not in texts, "the cross-encoder scores the query text itself"
+        return await super().embed_texts(texts)
+
+
+class LengthCrossEncoder:
+    def predict(self, pairs, batch_size):
+        return [len(text) for _, text in pairs]
+
+
+@pytest.mark.asyncio
+async def test_cross_encoder_rerank_does_not_embed_the_query():
+    table = {"short": _unit(1, 0), "much longer": _unit(0, 1), "query": _unit(1, 0)}
+    reranker = Reranker(NoQueryEmbeddings(table), None, cross_encoder=LengthCrossEncoder(), diversity=0.0)
+    results = [{"id": None, "text": text, "score": 0.0, "metadata": {}} for text in ("short", "much longer")]
+    reranked = await reranker.rerank("query", results, top_k=2)
+    assert [result["text"] for result in reranked] == ["much longer", "short"]
+
+
+def test_query_reports_rerank_stages():
+    app.dependency_overrides[provide_reranker] = lambda: Reranker(provide_embedding_provider(), provide_vector_store())
+    try:
+        client.post("/documents", data={"title": "Rerank", "text": "Re-ranking picks a diverse context", "source": "t"})
+        response = client.post("/query", json={"query": "how is the context picked", "top_k": 1})
+    finally:
+        app.dependency_overrides.pop(provide_reranker)
+    assert response.status_code == 200
+    stages = {entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")}
+    assert {"search", "rerank_fetch", "rerank", "mmr"} <= stages
@@ -4,7 +4,8 @@ from sqlalchemy.orm import Session
 from app.core.db import Base, SessionLocal, engine
 from app.persistence import repositories
 from app.services.embeddings import LocalEmbeddingProvider
-from app.services.retrieval import retrieve
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.retrieval import retrieve, retrieve_many
 from app.services.vector_store import ChromaVectorStore
 
 
@@ -30,9 +31,63 @@ async def test_retrieve_returns_results():
     session.commit()
 
     embeddings = await provider.embed_texts([chunk.text])
-    await store.index_embeddings(embeddings, [chunk.metadata()], ["retrieval-chunk"])
+    await store.index_embeddings(embeddings, [chunk.metadata()], ["retrieval-chunk"], [chunk.text])
 
     results = await retrieve(query="retrieval", embedding_provider=provider, vector_store=store, top_k=1)
     assert len(results) == 1
     assert "retrieval" in results[0]["text"]
     session.close()
+
+
+@pytest.mark.asyncio
+async def test_retrieve_many_preserves_input_order():
+    provider = LocalEmbeddingProvider()
+    store = NumpyVectorStore()
+    texts = ["alpha chunk", "beta chunk", "gamma chunk"]
+    embeddings = await provider.embed_texts(texts)
+    await store.index_embeddings(embeddings, [{"index": i} for i in range(3)], texts, texts)
+
+    results = await retrieve_many(
+        queries=["gamma chunk", "alpha chunk"],
+        embedding_provider=provider,
+        vector_store=store,
+        top_ks=[1, 2],
+        filters=[None, None],
+    )
+    assert [len(r) for r in results] == [1, 2]
+    assert results[0][0]["text"] == "gamma chunk"
+    assert results[1][0]["text"] == "alpha chunk"
+
+
+@pytest.mark.asyncio
+async def test_chroma_results_without_documents_have_empty_text():
+    provider = LocalEmbeddingProvider()
+    store = ChromaVectorStore(collection_name="test-retrieval-no-documents")
+    embeddings = await provider.embed_texts(["no document stored"])
+    await store.index_embeddings(embeddings, [{"chunk_id": 1}], ["bare-chunk"])
+
+    results = await store.query(embeddings[0], top_k=1)
+    assert [(result.id, result.text) for result in results] == [("bare-chunk", "")]
+
+
+@pytest.mark.asyncio
+async def test_chroma_filters_on_individual_tags():
+    provider = LocalEmbeddingProvider()
+    store = ChromaVectorStore(collection_name="test-retrieval-tags")
+    texts = ["ops runbook", "ops and security notes", "untagged text"]
+    metadatas = [{"tags": ["ops"]}, {"tags": ["ops", "security"], "document_id": 2}, {"tags": []}]
+    embeddings = await provider.embed_texts(texts)
+    await store.index_embeddings(embeddings, metadatas, ["a", "b", "c"], texts)
+
+    async def ids(filters):
+        return sorted(result.id for result in await store.query(embeddings[0], top_k=3, filters=filters))
+
+    assert await ids({"tags": "ops"}) == ["a", "b"]
+    assert await ids({"tags": "security"}) == ["b"]
+    assert await ids({"tags": {"$in": ["security", "missing"]}}) == ["b"]
+    assert await ids({"tags": "ops", "document_id": 2}) == ["b"]
+    assert await ids({"$or": [{"tags": "security"}, {"tags": {"$in": []}}]}) == ["b"]
+    result = (await store.query(embeddings[1], top_k=1, filters={"tags": "security"}))[0]
+    assert result.metadata == {"tags": ["ops", "security"], "document_id": 2}
+    with pytest.raises(ValueError):
+        await store.query(embeddings[0], top_k=3, filters={"tags": {"$ne": "ops"}})
@@ -0,0 +1,118 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.services import vector_store as vector_store_module
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.sharded_vector_store import ShardedVectorStore, shard_for
+
+
+class CountingStore(NumpyVectorStore):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queries = 0
+
+    async def query(self, embedding, top_k, filters=None):
+        self.queries += 1
+        return await super().query(embedding, top_k, filters)
+
+
+def _corpus(count=400, dim=16, documents=20, seed=0):
+    rng = np.random.default_rng(seed)
+    data = rng.normal(size=(count, dim)).astype(np.float32)
+    metadatas = [{"document_id": i % documents, "chunk_id": i} for i in range(count)]
+    return data, metadatas, [f"v{i}" for i in range(count)], [f"text {i}" for i in range(count)]
+
+
+async def _ranked(store, queries):
+    # Moved vectors are re-normalized, which can change scores in the last bit.
+    return [[(chunk.text, round(chunk.score, 5)) for chunk in await store.query(query, top_k=5)] for query in queries]
+
+
+async def _ids_by_store(store):
+    return [set(await shard.list_ids()) for shard in store.shards + store.retired]
+
+
+@pytest.mark.asyncio
+async def test_scatter_gather_matches_a_single_store_and_routes_by_document():
+    data, metadatas, ids, texts = _corpus()
+    single = NumpyVectorStore()
+    sharded = ShardedVectorStore([CountingStore() for _ in range(4)])
+    for store in (single, sharded):
+        await store.index_embeddings(data, metadatas, ids, texts)
+
+    held = await _ids_by_store(sharded)
+    assert sorted(len(shard) for shard in held)[0] > 0 and sum(map(len, held)) == len(ids)
+    for vector_id, metadata in zip(ids, metadatas):
+        assert vector_id in held[shard_for(metadata["document_id"], 4)]
+
+    for query in data[:10]:
+        expected = await single.query(query, top_k=7)
+        assert await sharded.query(query, top_k=7) == expected
+    many = await sharded.query_many(data[:3], top_ks=[2, 5, 1], filters=[None, {"document_id": 3}, None])
+    assert many == await single.query_many(data[:3], top_ks=[2, 5, 1], filters=[None, {"document_id": 3}, None])
+
+    before = [shard.queries for shard in sharded.shards]
+    pinned = await sharded.query(data[0], top_k=5, filters={"document_id": 3})
+    assert pinned == await single.query(data[0], top_k=5, filters={"document_id": 3})
+    calls = [shard.queries - count for shard, count in zip(sharded.shards, before)]
+    assert calls.count(1) == 1 and sum(calls) == 1
+
+    await sharded.delete(ids[:50])
+    assert sorted(await sharded.list_ids()) == sorted(ids[50:])
+
+
+@pytest.mark.asyncio
+async def test_metadata_update_moves_vectors_to_their_new_shard():
+    data, metadatas, ids, texts = _corpus(count=40, documents=4)
+    sharded = ShardedVectorStore([NumpyVectorStore() for _ in range(3)])
+    await sharded.index_embeddings(data, metadatas, ids, texts)
+    target = next(d for d in range(10, 100) if shard_for(d, 3) != shard_for(metadatas[0]["document_id"], 3))
+    await sharded.update_metadata([ids[0]], [{"document_id": target, "chunk_id": 0}])
+
+    held = await _ids_by_store(sharded)
+    assert [ids[0] in shard for shard in held] == [i == shard_for(target, 3) for i in range(3)]
+    result = await sharded.query(data[0], top_k=1, filters={"document_id": target})
+    assert result[0].text == "text 0" and result[0].metadata["document_id"] == target
+
+
+@pytest.mark.asyncio
+async def test_rebalance_after_shard_count_changes(tmp_path, monkeypatch):
+    settings = vector_store_module.settings
+    monkeypatch.setattr(settings, "vector_store", "numpy")
+    monkeypatch.setattr(settings, "numpy_store_path", str(tmp_path))
+    monkeypatch.setattr(settings, "vector_quantization", "none")
+    data, metadatas, ids, texts = _corpus()
+
+    monkeypatch.setattr(settings, "vector_shards", 1)
+    unsharded = vector_store_module.get_vector_store()
+    assert isinstance(unsharded, NumpyVectorStore)
+    await unsharded.index_embeddings(data, metadatas, ids, texts)
+    unsharded.close()
+    expected = await _ranked(unsharded, data[:5])
+
+    monkeypatch.setattr(settings, "vector_shards", 3)
+    sharded = vector_store_module.get_vector_store()
+    assert len(sharded.shards) == 3 and len(sharded.retired) == 1
+    assert await _ranked(sharded, data[:5]) == expected
+    result = await sharded.rebalance()
+    assert result["moved"] == len(ids) and sum(result["shard_sizes"]) == len(ids)
+    assert sorted(os.listdir(tmp_path)) == ["shard-0", "shard-1", "shard-2"]
+    assert await _ranked(sharded, data[:5]) == expected
+    # Reopen without closing: the moved vectors must already be on disk.
+    reopened = vector_store_module.get_vector_store()
+    assert not reopened.retired and sorted(await reopened.list_ids()) == sorted(ids)
+    assert await _ranked(reopened, data[:5]) == expected
+    await sharded.close()
+
+    monkeypatch.setattr(settings, "vector_shards", 2)
+    resharded = vector_store_module.get_vector_store()
+    assert len(resharded.shards) == 2 and len(resharded.retired) == 1
+    result = await resharded.rebalance()
+    assert 0 < result["moved"] < len(ids) and sum(result["shard_sizes"]) == len(ids)
+    assert sorted(os.listdir(tmp_path)) == ["shard-0", "shard-1"]
+    held = await _ids_by_store(resharded)
+    for vector_id, metadata in zip(ids, metadatas):
+        assert vector_id in held[shard_for(metadata["document_id"], 2)]
+    assert await _ranked(resharded, data[:5]) == expected
@@ -0,0 +1,39 @@
+"""Report IVF recall and latency against exact search on a synthetic corpus."""
+import argparse
+import json
+
+import numpy as np
+
+from app.services.ivf_vector_store import IVFVectorStore, recall_report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Clustered data is closer to real embeddings than isotropic noise.
+    centers = rng.normal(size=(args.nlist, args.dim)).astype(np.float32)
+    labels = rng.integers(0, args.nlist, size=args.vectors)
+    data = centers[labels] + 0.5 * rng.normal(size=(args.vectors, args.dim)).astype(np.float32)
+
+    index = IVFVectorStore(nlist=args.nlist, train_size=args.vectors)
+    batch = 10_000
+    for start in range(0, args.vectors, batch):
+        rows = data[start : start + batch]
+        index._add(rows, [{} for _ in rows], [str(start + i) for i in range(len(rows))], None)
+
+    queries = data[rng.choice(args.vectors, size=args.queries, replace=False)]
+    queries = queries + 0.1 * rng.normal(size=queries.shape).astype(np.float32)
+    for row in recall_report(index, queries, top_k=args.top_k, nprobes=args.nprobe):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compare chunking strategies: chunks/sec, tokens per chunk and embedding overhead.
+
+Text files given on the command line are used as the corpus; otherwise a
+synthetic corpus of sentences is generated. ``overhead`` is the characters
+sent to the embedding model divided by the document length, i.e. the extra
+work caused by overlap.
+
+    python -m scripts.bench_chunking docs/*.txt --repeat 3
+"""
+import argparse
+import json
+import random
+import time
+from typing import List
+
+from app.services.chunking import STRATEGIES, chunk_stream, regex_token_starts, tokenizer_token_starts
+from app.services.embeddings import LocalEmbeddingProvider, get_tokenizer
+
+WORDS = "the index stores vectors for every chunk of text and answers nearest neighbour queries quickly".split()
+
+
+def synthetic_corpus(documents: int, sentences: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(documents):
+        text = []
+        for _ in range(sentences):
+            words = rng.choices(WORDS, k=rng.randint(5, 30))
+            text.append(" ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"]))
+            if rng.random() < 0.1:
+                text.append("\n\n")
+        corpus.append(" ".join(text))
+    return corpus
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--sentences", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=None, help="override every strategy's default size")
+    parser.add_argument("--chunk-overlap", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.files:
+        corpus = []
+        for path in args.files:
+            with open(path, encoding="utf-8", errors="replace") as handle:
+                corpus.append(handle.read())
+    else:
+        corpus = synthetic_corpus(args.documents, args.sentences)
+    tokenizer = get_tokenizer(LocalEmbeddingProvider())
+    token_starts = tokenizer_token_starts(tokenizer) if tokenizer is not None else regex_token_starts
+    source_chars = sum(len(" ".join(text.split())) for text in corpus)
+
+    for strategy in STRATEGIES:
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            chunks = [
+                chunk
+                for text in corpus
+                for chunk in chunk_stream([text], args.chunk_size, args.chunk_overlap, strategy, token_starts)
+            ]
+            best = min(best, time.perf_counter() - start)
+        tokens = sum(len(token_starts(chunk["text"])) for chunk in chunks)
+        embedded_chars = sum(len(chunk["text"]) for chunk in chunks)
+        print(
+            json.dumps(
+                {
+                    "strategy": strategy,
+                    "chunks": len(chunks),
+                    "chunks_per_second": round(len(chunks) / best, 1),
+                    "mb_per_second": round(source_chars / best / 1e6, 2),
+                    "avg_tokens_per_chunk": round(tokens / len(chunks), 1) if chunks else 0,
+                    "avg_chars_per_chunk": round(embedded_chars / len(chunks), 1) if chunks else 0,
+                    "overhead": round(embedded_chars / source_chars, 3) if source_chars else 0,
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
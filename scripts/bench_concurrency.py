@@ -0,0 +1,127 @@
+"""Compare concurrent request throughput for sync-session and async-session handlers.
+
+Both handlers list a page of documents with chunk counts; one uses the
+blocking ``Session`` inside ``async def`` (the previous behaviour), the other
+``AsyncSession``. Requests are driven in-process through an ASGI client while
+a ticker task measures event-loop lag.
+
+The sync handler checks connections out of the pool on the event-loop thread.
+With the old threadpool-run ``get_db`` teardown, connections are only returned
+once the loop is free again, so at high concurrency the previous code stalls
+for the full pool timeout; the benchmark closes its sync sessions on the loop
+and uses a short ``--pool-timeout`` so the comparison completes, counting
+timed-out requests as ``errors``.
+
+    python -m scripts.bench_concurrency --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import get_settings
+from app.core.db import Base, engine, get_async_db, session_scope
+from app.persistence import async_repositories, repositories
+
+app = FastAPI()
+BenchSession = sessionmaker()
+
+
+async def get_bench_db():
+    session: Session = BenchSession()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@app.get("/sync/documents")
+async def sync_documents(session: Session = Depends(get_bench_db)):
+    docs = repositories.list_documents(session, limit=100)
+    counts = repositories.chunk_counts(session, [doc.id for doc in docs])
+    return [{"id": doc.id, "chunks": counts.get(doc.id, 0)} for doc in docs]
+
+
+@app.get("/async/documents")
+async def async_documents(session: AsyncSession = Depends(get_async_db)):
+    docs = await async_repositories.list_documents(session, limit=100)
+    counts = await async_repositories.chunk_counts(session, [doc.id for doc in docs])
+    return [{"id": doc.id, "chunks": counts.get(doc.id, 0)} for doc in docs]
+
+
+def seed(documents: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    with session_scope() as session:
+        if repositories.list_documents(session, limit=documents)[documents - 1 : documents]:
+            return
+        for i in range(documents):
+            document = repositories.create_document(session, title=f"bench {i}", source="bench", tags=None)
+            repositories.create_chunks(
+                session,
+                document=document,
+                chunks=[{"index": j, "text": "x" * 200, "start_offset": 0, "end_offset": 200} for j in range(10)],
+            )
+
+
+async def _lag_monitor(samples: list, stop: asyncio.Event, interval: float = 0.005) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def run(path: str, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    lag: list = []
+    stop = asyncio.Event()
+    errors = 0
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def one() -> None:
+            nonlocal errors
+            async with semaphore:
+                response = await client.get(path)
+                errors += response.is_error
+
+        monitor = asyncio.create_task(_lag_monitor(lag, stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await monitor
+    return {
+        "path": path,
+        "requests_per_second": round(requests / elapsed, 1),
+        "max_event_loop_lag_ms": round(1000 * max(lag, default=0.0), 2),
+        "errors": errors,
+    }
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    for path in ("/sync/documents", "/async/documents"):
+        print(json.dumps(await run(path, args.requests, args.concurrency)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--pool-timeout", type=float, default=2.0, help="sync pool checkout timeout in seconds")
+    args = parser.parse_args()
+    url = get_settings().database_url
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    BenchSession.configure(bind=create_engine(url, connect_args=connect_args, pool_timeout=args.pool_timeout))
+    seed(args.documents)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
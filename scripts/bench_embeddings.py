@@ -0,0 +1,81 @@
+"""Compare the list-of-floats and ndarray embedding paths from encoding to indexing.
+
+``lists`` reproduces the previous path: the hashing fallback built each vector
+with a per-element loop (or the model's array was converted with ``tolist()``)
+and the vector store converted the nested lists back into a matrix. ``ndarray``
+is the current path, one float32 matrix end to end. For each path the script
+reports time per 10k chunks, the memory held by the embeddings between the two
+steps and the peak traced allocation.
+
+    python -m scripts.bench_embeddings --chunks 10000 --repeat 3
+"""
+import argparse
+import hashlib
+import json
+import time
+import tracemalloc
+
+from app.services.embeddings import LocalEmbeddingProvider
+from app.services.numpy_vector_store import NumpyVectorStore
+
+
+def _lists(provider: LocalEmbeddingProvider, texts):
+    if provider.model:
+        return provider.encode(texts).tolist()
+    embeddings = []
+    for text in texts:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        embeddings.append([float(int.from_bytes(digest[i : i + 4], "big") % 1000) for i in range(0, 32, 4)])
+    return embeddings
+
+
+def _ndarray(provider: LocalEmbeddingProvider, texts):
+    return provider.encode(texts)
+
+
+def _measure(encode, provider, texts, batch_size: int) -> dict:
+    store = NumpyVectorStore()
+    embed_seconds = index_seconds = 0.0
+    held = peak = 0
+    tracemalloc.start()
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start : start + batch_size]
+        ids = [str(start + i) for i in range(len(batch))]
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        began = time.perf_counter()
+        embeddings = encode(provider, batch)
+        embedded = time.perf_counter()
+        held = max(held, tracemalloc.get_traced_memory()[0] - before)
+        store._add(embeddings, [{} for _ in batch], ids, None)
+        index_seconds += time.perf_counter() - embedded
+        embed_seconds += embedded - began
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+        del embeddings
+    tracemalloc.stop()
+    per_10k = 10_000 / len(texts)
+    return {
+        "embed_ms_per_10k": round(embed_seconds * per_10k * 1000, 2),
+        "index_ms_per_10k": round(index_seconds * per_10k * 1000, 2),
+        "embeddings_kib_per_batch": round(held / 1024, 1),
+        "peak_kib_per_batch": round(peak / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=10_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    provider = LocalEmbeddingProvider()
+    texts = [f"chunk {i}: the pump valve filter was replaced during maintenance" for i in range(args.chunks)]
+    for name, encode in (("lists", _lists), ("ndarray", _ndarray)):
+        runs = [_measure(encode, provider, texts, args.batch_size) for _ in range(args.repeat)]
+        best = {key: min(run[key] for run in runs) for key in runs[0]}
+        print(json.dumps({"path": name, "model": provider.model_id, "chunks": args.chunks, **best}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Measure event-loop lag and throughput with blocking work inline vs offloaded.
+
+Each run parses ``--documents`` generated PDFs concurrently and embeds their
+pages while a :class:`LoopLagMonitor` samples the event loop. ``inline`` runs
+both steps on the loop, as ingestion did before; ``executor`` parses pages in
+a process pool and embeds on a thread pool. Lag is what every other request
+(queries, health checks) would have waited behind the ingestion.
+
+    python -m scripts.bench_offload --documents 8 --pages 200
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.services.embeddings import LocalEmbeddingProvider
+from app.services.executors import ComputeExecutor, LoopLagMonitor
+from app.services.pdf import pdf_pieces
+
+
+def _pdf(pages) -> bytes:
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", "", "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = "BT /F1 10 Tf 72 720 Td " + " ".join(f"({line}) Tj 0 -12 Td" for line in text) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+    out, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+async def _ingest(data: bytes, extraction: ComputeExecutor, provider: LocalEmbeddingProvider) -> int:
+    pages = 0
+    async for piece in pdf_pieces(data, extraction, pages_per_task=16):
+        await provider.embed_texts([piece])
+        pages += 1
+    return pages
+
+
+async def _measure(mode: str, documents, args) -> dict:
+    kind = "inline" if mode == "inline" else "process"
+    extraction = ComputeExecutor("extraction", kind=kind, max_workers=args.workers, max_queue=len(documents) * 4)
+    inference = ComputeExecutor("inference", kind="thread" if kind != "inline" else "inline", max_workers=2)
+    provider = LocalEmbeddingProvider(executor=inference)
+    if kind == "process":
+        await extraction.run(len, b"")  # start the workers outside the timed section
+    monitor = LoopLagMonitor(interval=0.01, window=100_000)
+    monitor.start()
+    began = time.perf_counter()
+    pages = sum(await asyncio.gather(*(_ingest(data, extraction, provider) for data in documents)))
+    seconds = time.perf_counter() - began
+    await monitor.stop()
+    extraction.close()
+    inference.close()
+    lag = monitor.stats()
+    return {
+        "mode": mode,
+        "model": provider.model_id,
+        "pages": pages,
+        "pages_per_second": round(pages / seconds, 1),
+        "lag_p99_ms": round(lag["p99_ms"], 1),
+        "lag_max_ms": round(lag["max_ms"], 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    lines = [f"line {i}: inspect the pump valve and replace the filter cartridge" for i in range(40)]
+    documents = [_pdf([lines] * args.pages) for _ in range(args.documents)]
+    for mode in ("inline", "executor"):
+        print(json.dumps(asyncio.run(_measure(mode, documents, args))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Compare dense, lexical and hybrid retrieval on latency and quality.
+
+The synthetic corpus gives every chunk a unique product code among filler
+sentences. Two query sets are run: ``code`` queries name the code only (the
+exact-term case dense retrieval tends to miss), ``words`` queries reuse a few
+of the chunk's words. Quality is recall@k and MRR of the chunk each query was
+drawn from; latency is per query, end to end through ``retrieval.retrieve``.
+
+    python -m scripts.bench_retrieval --chunks 20000 --queries 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+
+from app.services import retrieval
+from app.services.embeddings import LocalEmbeddingProvider
+from app.services.lexical_index import LexicalIndex, LexicallyIndexedVectorStore
+from app.services.numpy_vector_store import NumpyVectorStore
+
+WORDS = (
+    "invoice shipment warehouse battery charger cable adapter firmware update refund warranty "
+    "screen keyboard sensor pump valve filter motor bearing gasket thermostat compressor"
+).split()
+
+
+def synthetic_chunks(count: int, rng: random.Random):
+    chunks = []
+    for i in range(count):
+        words = rng.choices(WORDS, k=rng.randint(20, 60))
+        position = rng.randrange(len(words))
+        words.insert(position, f"SKU-{i:06d}")
+        chunks.append(" ".join(words) + ".")
+    return chunks
+
+
+async def run(args) -> None:
+    rng = random.Random(args.seed)
+    texts = synthetic_chunks(args.chunks, rng)
+    provider = LocalEmbeddingProvider()
+    index = LexicalIndex()
+    store = LexicallyIndexedVectorStore(NumpyVectorStore(), index)
+    start = time.perf_counter()
+    for offset in range(0, len(texts), 1000):
+        batch = texts[offset : offset + 1000]
+        ids = [str(offset + i) for i in range(len(batch))]
+        embeddings = await provider.embed_texts(batch)
+        await store.index_embeddings(embeddings, [{"chunk_id": int(i)} for i in ids], ids, batch)
+    print(json.dumps({"chunks": len(texts), "index_seconds": round(time.perf_counter() - start, 3), "terms": len(index._postings)}))
+
+    targets = rng.sample(range(len(texts)), min(args.queries, len(texts)))
+    query_sets = {
+        "code": [(f"SKU-{i:06d}", i) for i in targets],
+        "words": [(" ".join(rng.sample(texts[i].split(), 6)), i) for i in targets],
+    }
+    for name, queries in query_sets.items():
+        for mode in retrieval.MODES:
+            latencies, hits, reciprocal_ranks = [], 0, []
+            for query, target in queries:
+                began = time.perf_counter()
+                results = await retrieval.retrieve(
+                    query=query,
+                    embedding_provider=provider,
+                    vector_store=store,
+                    top_k=args.top_k,
+                    mode=mode,
+                    lexical_index=index,
+                )
+                latencies.append(time.perf_counter() - began)
+                ranked = [result["metadata"]["chunk_id"] for result in results]
+                if target in ranked:
+                    hits += 1
+                    reciprocal_ranks.append(1 / (ranked.index(target) + 1))
+                else:
+                    reciprocal_ranks.append(0.0)
+            print(
+                json.dumps(
+                    {
+                        "queries": name,
+                        "mode": mode,
+                        f"recall@{args.top_k}": round(hits / len(queries), 3),
+                        "mrr": round(float(np.mean(reciprocal_ranks)), 3),
+                        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+                        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+                    }
+                )
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Query latency and throughput of the NumPy store split into 1, 2, 4, ... shards.
+
+Each shard scans its slice on its own worker thread, so a single query's
+latency falls with the shard count up to the number of cores. ``concurrent``
+runs ``--concurrency`` queries at once to show whether throughput holds up.
+
+    python -m scripts.bench_sharding --vectors 200000 --dim 384 --shards 1 2 4 8
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.sharded_vector_store import ShardedVectorStore
+
+
+async def _measure(shards: int, data: np.ndarray, queries: np.ndarray, args) -> dict:
+    store = ShardedVectorStore([NumpyVectorStore() for _ in range(shards)])
+    for start in range(0, len(data), 10_000):
+        rows = data[start : start + 10_000]
+        ids = [str(start + i) for i in range(len(rows))]
+        await store.index_embeddings(rows, [{"document_id": start + i} for i in range(len(rows))], ids)
+    await store.query(queries[0], args.top_k)
+
+    latencies = []
+    for query in queries:
+        began = time.perf_counter()
+        await store.query(query, args.top_k)
+        latencies.append(time.perf_counter() - began)
+    began = time.perf_counter()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(query) -> None:
+        async with semaphore:
+            await store.query(query, args.top_k)
+
+    await asyncio.gather(*(one(query) for query in queries))
+    elapsed = time.perf_counter() - began
+    latency_ms = np.asarray(latencies) * 1000
+    return {
+        "shards": shards,
+        "vectors": len(data),
+        "p50_ms": round(float(np.percentile(latency_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latency_ms, 95)), 3),
+        "concurrent_queries_per_second": round(len(queries) / elapsed, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(args.vectors, args.dim)).astype(np.float32)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    for shards in args.shards:
+        print(json.dumps(asyncio.run(_measure(shards, data, queries, args))))
+
+
+if __name__ == "__main__":
+    main()
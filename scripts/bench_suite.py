@@ -0,0 +1,267 @@
+"""Offline benchmark suite for ingestion, retrieval and the query API.
+
+Every benchmark runs on a seeded synthetic corpus:
+
+* ``chunk_text``: chunks and MiB per second over ``--documents`` documents.
+* ``embed_texts``: texts per second with the hashing fallback. A
+  sentence-transformers model is never loaded, so runs do not depend on
+  which model happens to be installed.
+* ``index_embeddings[n=N]`` and ``query[n=N]``: vectors indexed per second and
+  single-query latency percentiles for each of ``--sizes``. The queries use
+  random ``--dim``-dimensional vectors in the configured NumPy or IVF store.
+* ``api_query``: ``POST /query`` requests per second and latency under
+  ``--concurrency`` concurrent clients. Requests go through an in-process ASGI
+  client against ``--api-chunks`` indexed chunks with the query cache off.
+
+Throughput and store query latency are the best of ``--repeat`` runs. Results
+are written as JSON to ``--output``. With ``--baseline``, every
+``*_per_second`` metric that dropped and every ``*_ms`` metric that rose by
+more than ``--threshold`` (a fraction) is reported as a regression, and the
+script exits with status 1.
+
+    python -m scripts.bench_suite --output bench/main.json
+    python -m scripts.bench_suite --output bench/branch.json --baseline bench/main.json --threshold 0.15
+
+The database and vector store are scratch copies; ``RAG_DATABASE_URL`` and
+``RAG_VECTOR_STORE`` may be set to benchmark others.
+"""
+import os
+import tempfile
+
+_SCRATCH = tempfile.mkdtemp(prefix="rag-bench-")
+os.environ.setdefault("RAG_DATABASE_URL", f"sqlite:///{_SCRATCH}/bench.db")
+os.environ.setdefault("RAG_JOB_SPOOL_DIRECTORY", f"{_SCRATCH}/jobs")
+os.environ.setdefault("RAG_VECTOR_STORE", "numpy")
+os.environ["RAG_EMBEDDING_PROVIDER"] = "local"
+os.environ["RAG_QUERY_CACHE_ENABLED"] = "false"
+os.environ["RAG_EMBEDDING_CACHE_ENABLED"] = "false"
+os.environ.pop("RAG_NUMPY_STORE_PATH", None)
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import logging  # noqa: E402
+import platform  # noqa: E402
+import random  # noqa: E402
+import shutil  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+from typing import Callable, Dict, List  # noqa: E402
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+
+from app.services import embeddings  # noqa: E402
+from app.services.chunking import chunk_text  # noqa: E402
+from app.services.vector_store import get_vector_store  # noqa: E402
+
+# The hashing fallback is the embedding under test, whether or not a model is installed.
+embeddings.SentenceTransformer = None
+
+WORDS = (
+    "invoice shipment warehouse battery charger cable adapter firmware update refund warranty "
+    "screen keyboard sensor pump valve filter motor bearing gasket thermostat compressor"
+).split()
+
+
+def synthetic_documents(count: int, words: int, rng: random.Random) -> List[str]:
+    documents = []
+    for _ in range(count):
+        sentences = []
+        while sum(len(sentence) for sentence in sentences) < words * 7:
+            sentences.append(" ".join(rng.choices(WORDS, k=rng.randint(5, 25))).capitalize() + ".")
+        documents.append(" ".join(sentences))
+    return documents
+
+
+def _best(run: Callable[[], float], repeat: int) -> float:
+    return min(run() for _ in range(repeat))
+
+
+def _percentiles(seconds: List[float]) -> Dict[str, float]:
+    ms = np.asarray(seconds) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(ms, p)), 3) for p in (50, 95, 99)}
+
+
+def bench_chunking(documents: List[str], args) -> Dict[str, float]:
+    chunks = sum(len(chunk_text(text, args.chunk_size, args.chunk_overlap)) for text in documents)
+
+    def run() -> float:
+        began = time.perf_counter()
+        for text in documents:
+            chunk_text(text, args.chunk_size, args.chunk_overlap)
+        return time.perf_counter() - began
+
+    seconds = _best(run, args.repeat)
+    size = sum(len(text) for text in documents)
+    return {"chunks_per_second": round(chunks / seconds, 1), "mib_per_second": round(size / seconds / 2**20, 2)}
+
+
+async def bench_embedding(texts: List[str], args) -> Dict[str, float]:
+    provider = embeddings.LocalEmbeddingProvider()
+    seconds = float("inf")
+    for _ in range(args.repeat):
+        began = time.perf_counter()
+        for start in range(0, len(texts), args.batch_size):
+            await provider.embed_texts(texts[start : start + args.batch_size])
+        seconds = min(seconds, time.perf_counter() - began)
+    return {"texts_per_second": round(len(texts) / seconds, 1)}
+
+
+async def bench_vector_store(size: int, args, rng: np.random.Generator) -> Dict[str, Dict[str, float]]:
+    data = rng.normal(size=(size, args.dim)).astype(np.float32)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    seconds = float("inf")
+    latency: Dict[str, float] = {}
+    for _ in range(args.repeat):
+        store = get_vector_store()
+        began = time.perf_counter()
+        for start in range(0, size, args.batch_size):
+            rows = data[start : start + args.batch_size]
+            ids = [str(start + i) for i in range(len(rows))]
+            await store.index_embeddings(rows, [{"chunk_id": int(i)} for i in ids], ids, ids)
+        seconds = min(seconds, time.perf_counter() - began)
+        latencies = []
+        for query in queries:
+            began = time.perf_counter()
+            await store.query(query, args.top_k)
+            latencies.append(time.perf_counter() - began)
+        for key, value in _percentiles(latencies).items():
+            latency[key] = min(latency.get(key, value), value)
+    return {
+        f"index_embeddings[n={size}]": {"vectors_per_second": round(size / seconds, 1)},
+        f"query[n={size}]": latency,
+    }
+
+
+async def bench_api(texts: List[str], args, rng: random.Random) -> Dict[str, float]:
+    from app.main import app
+    from app.services import registry
+
+    async with app.router.lifespan_context(app):
+        store = registry.get_registry().vector_store
+        provider = embeddings.LocalEmbeddingProvider()
+        for start in range(0, len(texts), args.batch_size):
+            batch = texts[start : start + args.batch_size]
+            ids = [f"bench-{start + i}" for i in range(len(batch))]
+            metadatas = [{"document_id": 1, "chunk_id": start + i, "chunk_index": start + i} for i in range(len(batch))]
+            await store.index_embeddings(await provider.embed_texts(batch), metadatas, ids, batch)
+
+        queries = [" ".join(rng.sample(text.split(), 6)) for text in rng.sample(texts, min(args.requests, len(texts)))]
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies: List[float] = []
+        errors = 0
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+            async def one(query: str) -> None:
+                nonlocal errors
+                async with semaphore:
+                    began = time.perf_counter()
+                    response = await client.post("/query", json={"query": query, "top_k": args.top_k})
+                    latencies.append(time.perf_counter() - began)
+                    errors += response.is_error
+
+            await one(queries[0])  # first request pays for lazy imports and dependency setup
+            latencies.clear()
+            began = time.perf_counter()
+            await asyncio.gather(*(one(queries[i % len(queries)]) for i in range(args.requests)))
+            elapsed = time.perf_counter() - began
+    return {"requests_per_second": round(args.requests / elapsed, 1), **_percentiles(latencies), "errors": errors}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[dict]:
+    """Metric-by-metric changes from ``baseline``; higher ``*_per_second`` and lower ``*_ms`` are better."""
+
+    rows = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            before = baseline.get(name, {}).get(metric)
+            if not before or not (metric.endswith("_per_second") or metric.endswith("_ms")):
+                continue
+            change = (value - before) / before
+            worse = -change if metric.endswith("_per_second") else change
+            rows.append(
+                {
+                    "benchmark": name,
+                    "metric": metric,
+                    "baseline": before,
+                    "current": value,
+                    "change": round(change, 4),
+                    "regressed": worse > threshold,
+                }
+            )
+    return rows
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    documents = synthetic_documents(args.documents, args.words, rng)
+    texts = [chunk["text"] for text in documents for chunk in chunk_text(text, args.chunk_size, args.chunk_overlap)]
+    results = {"chunk_text": bench_chunking(documents, args), "embed_texts": await bench_embedding(texts, args)}
+    vectors = np.random.default_rng(args.seed)
+    for size in args.sizes:
+        results.update(await bench_vector_store(size, args, vectors))
+    if args.requests:
+        results["api_query"] = await bench_api(texts[: args.api_chunks], args, rng)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed relative slowdown (default: 0.1)")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--words", type=int, default=2000, help="approximate words per document")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--api-chunks", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=500, help="POST /query requests (0 skips the API benchmark)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(_SCRATCH, ignore_errors=True)
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "vector_store": os.environ["RAG_VECTOR_STORE"],
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        },
+        "results": results,
+    }
+    for name, metrics in results.items():
+        print(json.dumps({"benchmark": name, **metrics}))
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        if baseline["meta"]["args"] != report["meta"]["args"]:
+            print(json.dumps({"warning": "baseline was run with different arguments"}), file=sys.stderr)
+        rows = compare(results, baseline["results"], args.threshold)
+        for row in rows:
+            print(json.dumps(row))
+        if any(row["regressed"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""Bulk-load a corpus of text/PDF files, JSONL records or tarballs.
+
+Extraction and chunking run in a process pool, embeddings are computed in
+large cross-document batches, and each batch is written to the database and
+vector store in one transaction. Completed documents are appended to a
+checkpoint manifest, only once their rows are committed and their vectors are
+on disk, so an interrupted run resumes where it stopped.
+
+    python -m scripts.bulk_ingest corpus/ more.jsonl archive.tar.gz --workers 8
+"""
+import argparse
+import asyncio
+import inspect
+import io
+import json
+import os
+import tarfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.core.db import engine, session_scope
+from app.core.logging import logger
+from app.persistence import migrations, repositories
+from app.services.chunking import STRATEGIES, chunk_stream, make_chunker, tokenizer_token_starts
+from app.services.embeddings import get_embedding_provider, get_tokenizer
+from app.services.ingestion import VectorIds, content_hash
+from app.services.vector_store import get_vector_store
+
+TEXT_SUFFIXES = (".txt", ".md", ".text")
+PDF_SUFFIXES = (".pdf",)
+
+
+@dataclass
+class WorkItem:
+    """One document to load; exactly one of ``path``, ``data`` or ``text`` is set."""
+
+    key: str
+    title: str
+    source: Optional[str] = None
+    tags: Optional[List[str]] = None
+    path: Optional[str] = None
+    data: Optional[bytes] = None
+    text: Optional[str] = None
+    is_pdf: bool = False
+
+
+@dataclass
+class Extracted:
+    key: str
+    title: str
+    source: Optional[str]
+    tags: Optional[List[str]]
+    chunks: List[dict] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+def _pdf_text(stream) -> str:
+    from pypdf import PdfReader
+
+    return "\n".join(page.extract_text() or "" for page in PdfReader(stream).pages)
+
+
+_token_starts = None
+
+
+def _init_worker(tokenizer) -> None:
+    """Give each extraction process the embedding model's tokenizer for token-budget chunking."""
+
+    global _token_starts
+    _token_starts = tokenizer_token_starts(tokenizer) if tokenizer is not None else None
+
+
+def extract_and_chunk(
+    item: WorkItem, strategy: str = "fixed", chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None
+) -> Extracted:
+    """Runs in a worker process: read, extract, normalize and chunk one document."""
+
+    result = Extracted(key=item.key, title=item.title, source=item.source, tags=item.tags)
+    try:
+        if item.text is not None:
+            text = item.text
+        elif item.is_pdf:
+            text = _pdf_text(item.path if item.path else io.BytesIO(item.data))
+        elif item.path:
+            with open(item.path, encoding="utf-8", errors="replace") as handle:
+                text = handle.read()
+        else:
+            text = item.data.decode("utf-8", errors="replace")
+        result.chunks = list(chunk_stream([text], chunk_size, chunk_overlap, strategy, _token_starts))
+    except Exception as exc:  # reported per document, the run continues
+        result.error = f"{type(exc).__name__}: {exc}"
+    return result
+
+
+def _title(name: str) -> str:
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def iter_items(inputs: List[str]) -> Iterator[WorkItem]:
+    """Expand directories, JSONL files and tarballs into work items."""
+
+    for target in inputs:
+        if os.path.isdir(target):
+            for root, _, files in os.walk(target):
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    lower = name.lower()
+                    if lower.endswith(TEXT_SUFFIXES + PDF_SUFFIXES):
+                        yield WorkItem(
+                            key=os.path.abspath(path),
+                            title=_title(name),
+                            source=path,
+                            path=path,
+                            is_pdf=lower.endswith(PDF_SUFFIXES),
+                        )
+        elif target.endswith(".jsonl"):
+            with open(target, encoding="utf-8") as handle:
+                for line_number, line in enumerate(handle, start=1):
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    yield WorkItem(
+                        key=f"{os.path.abspath(target)}:{line_number}",
+                        title=record.get("title") or f"{_title(target)}-{line_number}",
+                        source=record.get("source") or target,
+                        tags=record.get("tags"),
+                        text=record["text"],
+                    )
+        elif tarfile.is_tarfile(target):
+            with tarfile.open(target) as archive:
+                for member in archive:
+                    lower = member.name.lower()
+                    if not member.isfile() or not lower.endswith(TEXT_SUFFIXES + PDF_SUFFIXES):
+                        continue
+                    yield WorkItem(
+                        key=f"{os.path.abspath(target)}!{member.name}",
+                        title=_title(member.name),
+                        source=f"{target}!{member.name}",
+                        data=archive.extractfile(member).read(),
+                        is_pdf=lower.endswith(PDF_SUFFIXES),
+                    )
+        elif os.path.isfile(target):
+            yield WorkItem(
+                key=os.path.abspath(target),
+                title=_title(target),
+                source=target,
+                path=target,
+                is_pdf=target.lower().endswith(PDF_SUFFIXES),
+            )
+        else:
+            logger.warning("Skipping %s: not a file, directory, JSONL file or tarball", target)
+
+
+def load_manifest(path: str) -> Set[str]:
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as handle:
+        return {line.rstrip("\n") for line in handle if line.strip()}
+
+
+class BulkLoader:
+    def __init__(self, *, manifest_path: str, embed_batch_size: int, save_every: int = 10) -> None:
+        self.manifest_path = manifest_path
+        self.embed_batch_size = embed_batch_size
+        self.save_every = save_every
+        self.flushes = 0
+        self.embedding_provider = get_embedding_provider()
+        self.vector_store = get_vector_store()
+        self.pending: List[Extracted] = []
+        self.pending_chunks = 0
+        self.docs = 0
+        self.chunks = 0
+        self.failed = 0
+        self.embed_seconds = 0.0
+
+    async def add(self, extracted: Extracted) -> None:
+        if extracted.error or not extracted.chunks:
+            self.failed += 1
+            logger.warning("Skipping %s: %s", extracted.key, extracted.error or "no text")
+            return
+        self.pending.append(extracted)
+        self.pending_chunks += len(extracted.chunks)
+        if self.pending_chunks >= self.embed_batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write, embed and index every pending document in one transaction and checkpoint them.
+
+        Vectors indexed for a batch whose indexing or commit fails are deleted
+        again, so a rerun does not find them under reused ids.
+        """
+
+        if not self.pending:
+            return
+        indexed: List[str] = []
+        try:
+            chunk_models = await self._write_pending(indexed)
+        except BaseException:  # also Ctrl-C
+            if indexed:
+                await self.vector_store.delete(indexed)
+            raise
+        self.flushes += 1
+        save = getattr(self.vector_store, "save", None)
+        if save is not None and self.flushes % self.save_every == 0:
+            # The store's journal already holds every flush; a snapshot keeps replay on restart short.
+            await run_in_threadpool(save)
+        with open(self.manifest_path, "a", encoding="utf-8") as manifest:
+            manifest.writelines(f"{extracted.key}\n" for extracted in self.pending)
+        self.docs += len(self.pending)
+        self.chunks += len(chunk_models)
+        self.pending = []
+        self.pending_chunks = 0
+
+    async def _write_pending(self, indexed: List[str]) -> list:
+        """Commit the pending rows with their vectors; ids are added to ``indexed`` before they are indexed."""
+
+        with session_scope() as session:
+            chunk_models, metadatas = [], []
+            for extracted in self.pending:
+                document = repositories.create_document(
+                    session, title=extracted.title, source=extracted.source, tags=extracted.tags
+                )
+                vector_ids = VectorIds(document.id)
+                for chunk in extracted.chunks:
+                    chunk["content_hash"] = content_hash(chunk["text"])
+                    chunk["vector_id"] = vector_ids.assign(chunk["content_hash"])
+                created = repositories.create_chunks(session, document=document, chunks=extracted.chunks)
+                chunk_models.extend(created)
+                metadatas.extend(chunk.metadata(document) for chunk in created)
+            texts = [chunk.text for chunk in chunk_models]
+            start = time.perf_counter()
+            embeddings = await self.embedding_provider.embed_texts(texts)
+            self.embed_seconds += time.perf_counter() - start
+            ids = [chunk.vector_id for chunk in chunk_models]
+            indexed.extend(ids)
+            await self.vector_store.index_embeddings(embeddings, metadatas, ids, texts)
+        return chunk_models
+
+    async def close(self) -> None:
+        await self.flush()
+        close = getattr(self.vector_store, "close", None)
+        if close is not None:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
+
+
+async def run(args: argparse.Namespace) -> dict:
+    migrations.upgrade(engine)
+    make_chunker(args.chunk_strategy, args.chunk_size, args.chunk_overlap)  # fail fast on bad sizes
+    done = load_manifest(args.manifest)
+    loader = BulkLoader(
+        manifest_path=args.manifest, embed_batch_size=args.embed_batch_size, save_every=args.save_every
+    )
+    tokenizer = get_tokenizer(loader.embedding_provider) if args.chunk_strategy == "token" else None
+    chunking = (args.chunk_strategy, args.chunk_size, args.chunk_overlap)
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    skipped = 0
+    max_in_flight = args.workers * 4
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(tokenizer,)) as pool:
+        in_flight: List[asyncio.Future] = []
+        for item in iter_items(args.inputs):
+            if item.key in done:
+                skipped += 1
+                continue
+            in_flight.append(loop.run_in_executor(pool, extract_and_chunk, item, *chunking))
+            # Bound the number of documents held in memory; results are consumed in order.
+            while len(in_flight) >= max_in_flight:
+                await loader.add(await in_flight.pop(0))
+        for future in in_flight:
+            await loader.add(await future)
+    await loader.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "documents": loader.docs,
+        "chunks": loader.chunks,
+        "skipped_from_checkpoint": skipped,
+        "failed": loader.failed,
+        "seconds": round(elapsed, 3),
+        "docs_per_second": round(loader.docs / elapsed, 2) if elapsed else None,
+        "chunks_per_second": round(loader.chunks / elapsed, 2) if elapsed else None,
+        "embedding_chunks_per_second": round(loader.chunks / loader.embed_seconds, 2) if loader.embed_seconds else None,
+    }
+
+
+def missing_persistence_setting() -> Optional[str]:
+    """The setting that must be set for the configured vector store to outlive this process, if it is unset."""
+
+    settings = get_settings()
+    if settings.vector_store == "chroma":
+        return None if settings.chroma_persist_directory else "RAG_CHROMA_PERSIST_DIRECTORY"
+    return None if settings.numpy_store_path else "RAG_NUMPY_STORE_PATH"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk-load documents into the RAG pipeline.")
+    parser.add_argument("inputs", nargs="+", help="directories, files, .jsonl files or tarballs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="extraction processes")
+    parser.add_argument("--embed-batch-size", type=int, default=512, help="chunks per embedding/write batch")
+    parser.add_argument("--manifest", default="bulk_ingest.manifest", help="checkpoint file of completed documents")
+    parser.add_argument("--save-every", type=int, default=10, help="flushes between NumPy/IVF store snapshots")
+    parser.add_argument("--chunk-strategy", choices=STRATEGIES, default=get_settings().chunk_strategy)
+    parser.add_argument("--chunk-size", type=int, default=get_settings().chunk_size)
+    parser.add_argument("--chunk-overlap", type=int, default=get_settings().chunk_overlap)
+    args = parser.parse_args()
+    missing = missing_persistence_setting()
+    if missing:
+        # Rows and the checkpoint would survive the run while the vectors are lost with the in-memory store.
+        parser.error(f"set {missing} so the vectors are written to the store the server reads")
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Report memory savings, recall and latency of each vector quantization mode.
+
+Every mode indexes the same synthetic corpus in a :class:`NumpyVectorStore`,
+each in a fresh process. ``search_bytes_per_vector`` is what a query scans
+(codes, or the float32 matrix without quantization). ``resident_bytes_per_vector``
+is the measured growth of the process's anonymous resident memory (``RssAnon``)
+while building and querying the store: codes, norms, row maps, ids and
+metadata. It excludes the memory-mapped full-precision rows, which the OS can
+evict. Recall@k is measured against exact float32 search, both on the
+approximate distances alone (``rerank=0``) and after exact re-ranking of
+``top_k * rerank`` candidates.
+
+    python -m scripts.quantization_report --vectors 100000 --dim 384
+"""
+import argparse
+import ctypes
+import gc
+import json
+import multiprocessing
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import numpy as np
+
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.quantization import get_quantizer
+
+
+def _anon_rss() -> int:
+    """Anonymous resident memory in bytes; peak RSS where /proc is unavailable.
+
+    Freed heap memory is handed back to the OS first (glibc keeps freed
+    temporaries otherwise), so the figure tracks what is still referenced.
+    """
+
+    gc.collect()
+    try:
+        ctypes.CDLL(None).malloc_trim(0)
+    except (AttributeError, OSError):  # not glibc
+        pass
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _corpus(args) -> tuple:
+    rng = np.random.default_rng(0)
+    # Clustered data is closer to real embeddings than isotropic noise.
+    centers = rng.normal(size=(256, args.dim)).astype(np.float32)
+    data = centers[rng.integers(0, 256, size=args.vectors)] + 0.5 * rng.normal(size=(args.vectors, args.dim))
+    data = data.astype(np.float32)
+    queries = data[rng.choice(args.vectors, size=args.queries, replace=False)]
+    queries = queries + 0.1 * rng.normal(size=queries.shape).astype(np.float32)
+    return data, queries
+
+
+def _truth(data: np.ndarray, queries: np.ndarray, top_k: int) -> List[set]:
+    """Exact cosine top-k rows, computed without building a store."""
+
+    normed = data / np.linalg.norm(data, axis=1, keepdims=True)
+    truth = []
+    for query in queries / np.linalg.norm(queries, axis=1, keepdims=True):
+        truth.append(set(np.argpartition(-(normed @ query), top_k - 1)[:top_k].tolist()))
+    return truth
+
+
+def _build(data: np.ndarray, kind: str, args) -> NumpyVectorStore:
+    quantizer = get_quantizer(kind, pq_subvector_dim=args.pq_subvector_dim)
+    store = NumpyVectorStore(quantizer=quantizer, quantizer_train_size=len(data))
+    batch = 10_000
+    for start in range(0, len(data), batch):
+        rows = data[start : start + batch]
+        store._add(rows, [{} for _ in rows], [str(start + i) for i in range(len(rows))], None)
+    return store
+
+
+def _report(kind: str, args) -> List[dict]:
+    """Rows for one mode; runs in its own process so earlier builds do not skew the memory figures."""
+
+    data, queries = _corpus(args)
+    truth = _truth(data, queries, args.top_k)
+    rss_before = _anon_rss()
+    start = time.perf_counter()
+    store = _build(data, kind, args)
+    build_seconds = time.perf_counter() - start
+    search_bytes = data.nbytes if store._codes is None else store._codes[: len(store)].nbytes
+    prepared = store._prepare(queries)
+    rows = []
+    for rerank in args.rerank if kind != "none" else [0]:
+        store.rerank = rerank
+        latencies, recalls = [], []
+        for query, expected in zip(prepared, truth):
+            began = time.perf_counter()
+            found = store._top_rows(query, args.top_k, None)[0]
+            latencies.append(time.perf_counter() - began)
+            recalls.append(len(expected.intersection(found.tolist())) / max(len(expected), 1))
+        latency_ms = np.asarray(latencies) * 1000
+        rows.append(
+            {
+                "mode": kind,
+                "rerank": rerank,
+                "search_bytes_per_vector": search_bytes / len(store),
+                "compression": round(data.nbytes / search_bytes, 2),
+                "resident_bytes_per_vector": round(max(_anon_rss() - rss_before, 0) / len(store), 1),
+                f"recall@{args.top_k}": round(float(np.mean(recalls)), 4),
+                "p50_ms": round(float(np.percentile(latency_ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(latency_ms, 95)), 3),
+                "build_seconds": round(build_seconds, 2),
+            }
+        )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rerank", type=int, nargs="+", default=[0, 4, 16])
+    parser.add_argument("--pq-subvector-dim", type=int, default=8)
+    parser.add_argument("--modes", nargs="+", default=["none", "float16", "int8", "pq"])
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    for kind in args.modes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            for row in pool.submit(_report, kind, args).result():
+                print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()